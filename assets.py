@@ -0,0 +1,45 @@
+import os                       # Import the OS module to build file paths and check file times
+from PIL import Image, ImageTk  # Import the Image and ImageTk modules from the PIL library for image processing
+
+# Define the AssetManager class
+
+# This class loads the images of the game once and keeps them.
+# The PhotoImage of every (file, size) is cached, so going back to the home screen doesn't
+# decode and resize the big title image again. The resized image is also saved as a small thumbnail
+# in the .cache folder, so the next time the game starts it only has to read the small file
+# (the thumbnail is made again if the original image is newer).
+class AssetManager:
+    def __init__(self, cache_dir=".cache"):
+        self.cache_dir = cache_dir      # Folder for the resized thumbnails
+        self.images = {}                # (file, width, height) -> PhotoImage
+
+    # Method to get the path of the thumbnail of an image at a given size
+    def thumbnail_path(self, file_name, size):
+        name, extension = os.path.splitext(os.path.basename(file_name))
+        return os.path.join(self.cache_dir, f"{name}_{size[0]}x{size[1]}{extension}")
+
+    # Method to load an image at a given size as a PIL image, using the saved thumbnail if there is one
+    def load_scaled_image(self, file_name, size):
+        thumbnail = self.thumbnail_path(file_name, size)
+        # Use the thumbnail if it is newer than the original image
+        if os.path.exists(thumbnail) and os.path.getmtime(thumbnail) >= os.path.getmtime(file_name):
+            try:
+                return Image.open(thumbnail)
+            except OSError:
+                pass  # A broken thumbnail is made again below
+        image = Image.open(file_name)
+        image = image.resize(size, Image.Resampling.LANCZOS)
+        # LANCZOS is a resampling filter like ANTIALIAS that helps to maintain high picture quality despite decrement in dimesnions.
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            image.save(thumbnail)
+        except OSError as e:
+            print(f"Error saving thumbnail: {e}")
+        return image
+
+    # Method to get an image at a given size as a Tkinter PhotoImage (made only once per size)
+    def image(self, file_name, size):
+        key = (file_name, size[0], size[1])
+        if key not in self.images:
+            self.images[key] = ImageTk.PhotoImage(self.load_scaled_image(file_name, size))
+        return self.images[key]
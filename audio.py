@@ -0,0 +1,171 @@
+# Audio for the Memory Game.
+# The UI only puts the name of a sound in a queue (which never blocks), and a background thread plays it.
+# Sounds are decoded once into raw PCM (the format of the mixer) and the PCM is kept in the .cache folder,
+# so the MP3 doesn't have to be decoded again at the next launch.
+# The mixer has a fixed pool of channels reserved for the game. Every effect has a priority: when all
+# channels are busy, a new sound takes the channel of the oldest sound with a lower (or the same) priority,
+# or is dropped if every channel plays something more important.
+# When there is no audio device (or pygame is missing) the NullBackend is used and sounds are simply skipped.
+
+import os                       # Import the OS module to build file paths and check file times
+import queue                    # Import the queue module to pass play requests to the audio thread
+import threading                # Import the threading module to play sounds off the UI thread
+import time                     # Import the time module to drop requests that waited too long
+
+FREQUENCY = 44100   # Samples per second of the mixer
+SAMPLE_SIZE = -16   # 16-bit signed samples
+CHANNELS = 2        # Stereo
+BUFFER = 512        # Small buffer so sounds start quickly
+
+
+# Define the NullBackend class
+
+# This backend does nothing, it is used when sounds can't be played
+class NullBackend:
+    name = "null"
+
+    # Method to load a sound
+    def load(self, name, file_name, volume):
+        pass
+
+    # Method to play a sound, returns True if the sound is played
+    def play(self, name, priority):
+        return False
+
+    # Method to stop the backend
+    def close(self):
+        pass
+
+
+# Define the PygameBackend class
+
+# This backend plays the sounds with the pygame mixer on a fixed pool of reserved channels
+class PygameBackend:
+    name = "pygame"
+
+    def __init__(self, channels=8, cache_dir=".cache"):
+        import pygame  # Import pygame here, so it is only loaded on the audio thread
+        self.pygame = pygame
+        pygame.mixer.init(FREQUENCY, SAMPLE_SIZE, CHANNELS, BUFFER)  # Raises pygame.error if there is no audio device
+        pygame.mixer.set_num_channels(channels)
+        pygame.mixer.set_reserved(channels)  # pygame never picks these channels by itself, we do
+        self.channels = [pygame.mixer.Channel(i) for i in range(channels)]
+        self.playing = [(0, 0.0)] * channels  # (priority, start time) of the last sound of each channel
+        self.sounds = {}                      # Sound name -> pygame Sound made from raw PCM
+        self.cache_dir = cache_dir
+        self.format = pygame.mixer.get_init()  # The format the mixer really uses
+
+    # Method to get the path of the decoded PCM of a sound file
+    def pcm_path(self, file_name):
+        frequency, size, channels = self.format
+        name = os.path.splitext(os.path.basename(file_name))[0]
+        return os.path.join(self.cache_dir, f"{name}_{frequency}_{size}_{channels}.pcm")
+
+    # Method to get the raw PCM of a sound file, decoding it only if there is no up-to-date cached PCM
+    def decode(self, file_name):
+        pcm_file = self.pcm_path(file_name)
+        if os.path.exists(pcm_file) and os.path.getmtime(pcm_file) >= os.path.getmtime(file_name):
+            with open(pcm_file, 'rb') as file:
+                return file.read()
+        pcm = self.pygame.mixer.Sound(file_name).get_raw()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(pcm_file, 'wb') as file:
+                file.write(pcm)
+        except OSError as e:
+            print(f"Error saving decoded sound: {e}")
+        return pcm
+
+    # Method to load a sound
+    def load(self, name, file_name, volume):
+        sound = self.pygame.mixer.Sound(buffer=self.decode(file_name))
+        sound.set_volume(volume)
+        self.sounds[name] = sound
+
+    # Method to pick a channel for a sound with a given priority, returns None if the sound has to be dropped
+    def pick_channel(self, priority):
+        best = None
+        for number, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                return number
+            # Remember the oldest sound that is not more important than the new one
+            playing_priority, started = self.playing[number]
+            if playing_priority <= priority and (best is None or (playing_priority, started) < self.playing[best]):
+                best = number
+        return best
+
+    # Method to play a sound, returns True if the sound is played
+    def play(self, name, priority):
+        sound = self.sounds.get(name)
+        number = self.pick_channel(priority) if sound is not None else None
+        if number is None:
+            return False
+        self.channels[number].play(sound)  # Stops what the channel was playing
+        self.playing[number] = (priority, time.monotonic())
+        return True
+
+    # Method to stop the backend
+    def close(self):
+        self.pygame.mixer.quit()
+
+
+# Define the AudioEngine class
+
+# This class plays sounds on a background thread:
+# start() loads the sounds on the thread, play() queues a sound and returns straight away.
+class AudioEngine:
+    def __init__(self, channels=8, max_delay=0.2, backend=None):
+        self.channels = channels        # Number of mixer channels reserved for the game
+        self.max_delay = max_delay      # Requests older than this (in seconds) are dropped instead of played late
+        self.backend = backend          # Backend to use (None to use pygame if possible)
+        self.priorities = {}            # Sound name -> priority
+        self.requests = queue.Queue()   # Queue of (sound name, time requested)
+        self.thread = None
+        self.played = 0                 # Number of sounds played
+        self.dropped = 0                # Number of sounds dropped (busy channels, too late or no audio)
+
+    # Method to make the backend, the NullBackend if there is no audio device
+    def create_backend(self):
+        try:
+            return PygameBackend(self.channels)
+        except (ImportError, RuntimeError) as e:  # pygame.error is a RuntimeError
+            print(f"Sound is off: {e}")
+            return NullBackend()
+
+    # Method to start the audio thread
+    # sounds is a dictionary: name -> (file name, volume, priority)
+    def start(self, sounds):
+        self.priorities = {name: priority for name, (_, _, priority) in sounds.items()}
+        self.thread = threading.Thread(target=self.run, args=(sounds,), daemon=True)
+        self.thread.start()
+
+    # Method run by the audio thread
+    def run(self, sounds):
+        if self.backend is None:
+            self.backend = self.create_backend()
+        for name, (file_name, volume, _) in sounds.items():
+            try:
+                self.backend.load(name, file_name, volume)
+            except (RuntimeError, OSError) as e:
+                print(f"Error loading sound {file_name}: {e}")
+        while True:
+            request = self.requests.get()
+            if request is None:  # Asked to stop
+                break
+            name, requested = request
+            if time.monotonic() - requested <= self.max_delay and self.backend.play(name, self.priorities.get(name, 0)):
+                self.played += 1
+            else:
+                self.dropped += 1
+        self.backend.close()
+
+    # Method to play a sound (never blocks the caller)
+    def play(self, name):
+        self.requests.put((name, time.monotonic()))
+
+    # Method to stop the audio thread
+    def close(self, timeout=1.0):
+        if self.thread is not None:
+            self.requests.put(None)
+            self.thread.join(timeout)
+            self.thread = None
@@ -0,0 +1,669 @@
+# Benchmarks for the Memory Game.
+# Run "python benchmark.py <name>" to run one benchmark, or "python benchmark.py" to list them.
+# Add --record to append the results of the benchmark (with the current git commit) to
+# benchmark_results.jsonl, so the numbers can be compared across commits.
+
+import asyncio                  # Import the asyncio module to run the game server load test
+import json                     # Import the JSON module to record benchmark results
+import multiprocessing          # Import the multiprocessing module to write scores from many processes at once
+import os                       # Import the OS module to build file paths
+import subprocess               # Import the subprocess module to ask git for the current commit
+import sys                      # Import the sys module to read command line arguments
+import random                   # Import the random module to shuffle boards
+import socket                   # Import the socket module to wait for the game server
+import tempfile                 # Import the tempfile module to keep benchmark files out of the project
+import time                     # Import the time module to measure how long things take
+import tracemalloc              # Import the tracemalloc module to measure memory use
+from file_manager import ScoreManager, ScoreWriteQueue, HEADERS  # Import the ScoreManager class to benchmark score storage
+from game_logic import MemoryGame, VirtualClock, symbol_label  # Import the game logic to benchmark the board
+from board_factory import generate_boards, deal_symbols  # Import the board factory to benchmark board generation
+from history_view import ScoreTableModel        # Import the ScoreTableModel class to benchmark history sorting
+from simulator import PLAYERS, run_simulation, run_batch  # Import the headless simulator to benchmark game throughput
+from board_renderer import BoardRenderer, render_sprite  # Import the board renderer to benchmark redraws
+from replay import ReplayLog, benchmark_logs, record_simulated_session  # Import the replays to benchmark recorded sessions
+from instrumentation import Profiler             # Import the Profiler class to benchmark its overhead
+from assets import AssetManager                 # Import the AssetManager class to benchmark loading the title image
+from game_server import load_test, print_load_results, run_server  # Import the game server to benchmark many sessions
+
+
+# Helper to write a scores file with a given number of rows
+def write_fake_scores(file_name, rows):
+    with open(file_name, 'w', newline='') as file:
+        file.write(",".join(HEADERS) + "\n")
+        for n in range(1, rows + 1):
+            file.write(f"{n},Player{n % 50},{8 + n % 30},{20 + n % 90}.25,2024-01-01,12:00:00\n")
+
+
+# Benchmark the time needed to append one score for growing score histories, in a CSV file and a SQLite database
+# The index and the statistics cache are built first (the migration), then every append should take the same time
+def bench_score_append(sizes=(10_000, 100_000, 1_000_000), appends=200, file_types=("csv", "db")):
+    results = {}
+    print(f"{'file':>5} {'rows':>10} {'migrate (s)':>12} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        for rows in sizes:
+            csv_file = os.path.join(folder, f"scores_{rows}.csv")
+            write_fake_scores(csv_file, rows)
+            for file_type in file_types:
+                file_name = os.path.join(folder, f"scores_{rows}.{file_type}")
+                if file_type != "csv":
+                    source, target = ScoreManager(csv_file), ScoreManager(file_name)
+                    target.import_from(source)
+                    source.close()
+                    target.close()
+
+                # The first ScoreManager has to build the index and the statistics once (migration)
+                manager = ScoreManager(file_name)
+                start = time.perf_counter()
+                if file_type == "csv":
+                    manager.backend.rebuild_index()
+                manager.get_summary()
+                migrate_time = time.perf_counter() - start
+
+                # Every append after that should take the same time, whatever the size
+                append_times = []
+                for _ in range(appends):
+                    start = time.perf_counter()
+                    manager.save_score("Bench", 10, 12.5)
+                    append_times.append(time.perf_counter() - start)
+                manager.close()
+                append_times.sort()
+                p50 = append_times[len(append_times) // 2] * 1000
+                p99 = append_times[min(len(append_times) - 1, len(append_times) * 99 // 100)] * 1000
+
+                results[f"{file_type}-{rows}"] = {'migrate_s': migrate_time, 'append_p50_ms': p50, 'append_p99_ms': p99}
+                print(f"{file_type:>5} {rows:>10} {migrate_time:>12.3f} {p50:>9.3f} {p99:>9.3f}")
+    return results
+
+
+# Helper run by each process of the score-stress benchmark: saves `scores` scores named after the writer,
+# with the number of the score as the moves, directly or through the write-behind queue
+def stress_writer(file_name, writer, scores, use_queue):
+    manager = ScoreManager(file_name)
+    if use_queue:
+        write_queue = ScoreWriteQueue(manager)
+        for number in range(scores):
+            write_queue.put(f"W{writer}", number, 1.0)
+        write_queue.close()
+    else:
+        for number in range(scores):
+            manager.save_score(f"W{writer}", number, 1.0)
+    manager.close()
+
+
+# Benchmark many processes saving scores to the same file at the same time (half of them with the
+# write-behind queue), then check that no score was lost or saved twice and every game number is used once
+# Fails (exit code 1) when a check fails
+def bench_score_stress(writers=8, scores=200, file_types=("csv", "db")):
+    results = {}
+    failed = False
+    print(f"{'file':>5} {'writers':>8} {'scores':>7} {'scores/s':>9} {'ok':>4}")
+    with tempfile.TemporaryDirectory() as folder:
+        for file_type in file_types:
+            file_name = os.path.join(folder, f"scores.{file_type}")
+            ScoreManager(file_name).close()  # Create the file before the writers start
+            processes = [multiprocessing.Process(target=stress_writer, args=(file_name, writer, scores, writer % 2 == 1))
+                         for writer in range(writers)]
+            start = time.perf_counter()
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            seconds = time.perf_counter() - start
+
+            # Check the saved scores
+            manager = ScoreManager(file_name)
+            rows = list(manager.backend.iter_rows())
+            game_numbers = sorted(int(row[0]) for row in rows)
+            saved = sorted((row[1], int(row[2])) for row in rows)
+            expected = sorted((f"W{writer}", number) for writer in range(writers) for number in range(scores))
+            # The statistics cache must have been kept up to date by the writers (not rebuilt now)
+            stats_saved = manager.stats.load(manager.backend.signature())
+            ok = (all(process.exitcode == 0 for process in processes)
+                  and game_numbers == list(range(1, writers * scores + 1))
+                  and saved == expected
+                  and manager.count_scores() == len(expected)
+                  and stats_saved and manager.get_summary()['count'] == len(expected))
+            manager.close()
+            failed = failed or not ok
+            results[file_type] = {'writers': writers, 'scores': len(rows), 'scores_per_second': len(rows) / seconds, 'ok': ok}
+            print(f"{file_type:>5} {writers:>8} {len(rows):>7} {len(rows) / seconds:>9.0f} {'yes' if ok else 'NO':>4}")
+    if failed:
+        print("Scores were lost or saved twice!")
+        sys.exit(1)
+    return results
+
+
+# Benchmark opening the history screen for large histories
+# Compares reading every row (the old history screen) with the paged reads of the new one
+def bench_history_open(sizes=(100_000, 1_000_000), visible=20):
+    results = {}
+    print(f"{'rows':>10} {'all rows (s)':>13} {'open (ms)':>10} {'jump to middle (ms)':>20}")
+    with tempfile.TemporaryDirectory() as folder:
+        for rows in sizes:
+            file_name = os.path.join(folder, f"scores_{rows}.csv")
+            write_fake_scores(file_name, rows)
+            manager = ScoreManager(file_name)
+            manager.count_scores()  # Build the index once, like the first save after an upgrade
+
+            # Old way: read every row
+            start = time.perf_counter()
+            manager.get_scores()
+            all_time = time.perf_counter() - start
+
+            # New way: count the rows and read the first visible rows
+            start = time.perf_counter()
+            total = manager.count_scores()
+            manager.get_scores_page(0, visible)
+            open_time = time.perf_counter() - start
+
+            # Scrolling to the middle of the history
+            start = time.perf_counter()
+            manager.get_scores_page(total // 2, visible)
+            jump_time = time.perf_counter() - start
+
+            results[rows] = {'all_rows_s': all_time, 'open_ms': open_time * 1000, 'jump_ms': jump_time * 1000}
+            print(f"{rows:>10} {all_time:>13.3f} {open_time * 1000:>10.3f} {jump_time * 1000:>20.3f}")
+    return results
+
+
+# Benchmark analyzing a large history: the old get_scores list against the streaming iter_scores
+# (time and peak memory to find the best moves of one player, and of everyone)
+def bench_score_stream(rows=1_000_000, batch_size=10000):
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        file_name = os.path.join(folder, "scores.csv")
+        write_fake_scores(file_name, rows)
+        manager = ScoreManager(file_name)
+        print(f"{'method':<28} {'time (s)':>9} {'peak MB':>9}")
+        tests = (
+            ("get_scores, everyone", lambda: min(int(row[2]) for row in manager.get_scores())),
+            ("iter_scores, everyone", lambda: min(record.moves for record in manager.iter_scores(batch_size))),
+            ("get_scores, one player", lambda: min(int(row[2]) for row in manager.get_scores() if row[1] == "Player7")),
+            ("iter_scores, one player", lambda: min(record.moves for record in manager.iter_scores(batch_size, player_name="Player7"))),
+        )
+        for label, test in tests:
+            start = time.perf_counter()
+            test()
+            elapsed = time.perf_counter() - start
+            # Measure the memory in a second run, tracemalloc slows everything down
+            tracemalloc.start()
+            test()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[label] = {'seconds': elapsed, 'peak_bytes': peak}
+            print(f"{label:<28} {elapsed:>9.3f} {peak / 2 ** 20:>9.1f}")
+    return results
+
+
+# Code run in a new process to measure loading the scores for analysis: prints the seconds taken
+# and how much the memory of the process grew (in KB), after pandas is imported
+LOAD_SCORES_CODE = """
+import resource, sys, time
+import pandas as pd
+from score_archive import ScoreArchive
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+if sys.argv[1] == "csv":
+    frame = pd.read_csv(sys.argv[2])
+else:
+    frame = ScoreArchive(sys.argv[2]).to_pandas()
+mean = frame["Moves"].mean()
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)
+"""
+
+
+# Benchmark loading the scores into pandas: pd.read_csv of the CSV file against the memory-mapped archive
+def bench_score_archive(sizes=(100_000, 1_000_000)):
+    results = {}
+    try:
+        import resource  # Only on Linux and macOS
+    except ImportError:
+        print("skipped (needs the resource module)")
+        return None
+    print(f"{'rows':>10} {'compact (s)':>12} {'csv (s)':>9} {'csv MB':>8} {'archive (s)':>12} {'archive MB':>11}")
+    with tempfile.TemporaryDirectory() as folder:
+        for rows in sizes:
+            file_name = os.path.join(folder, f"scores_{rows}.csv")
+            write_fake_scores(file_name, rows)
+            manager = ScoreManager(file_name)
+            start = time.perf_counter()
+            manager.compact_archive()
+            compact_time = time.perf_counter() - start
+
+            measured = {}
+            for kind, path in (("csv", file_name), ("archive", file_name + ".archive")):
+                output = subprocess.run([sys.executable, "-c", LOAD_SCORES_CODE, kind, path], capture_output=True,
+                                        text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+                measured[kind] = (float(output[0]), int(output[1]) / 1024)
+            results[rows] = {'compact_s': compact_time, 'csv_s': measured['csv'][0], 'csv_mb': measured['csv'][1],
+                             'archive_s': measured['archive'][0], 'archive_mb': measured['archive'][1]}
+            print(f"{rows:>10} {compact_time:>12.3f} {measured['csv'][0]:>9.3f} {measured['csv'][1]:>8.1f} "
+                  f"{measured['archive'][0]:>12.4f} {measured['archive'][1]:>11.1f}")
+    return results
+
+
+# Benchmark sorting the history table
+def bench_history_sort(rows=100_000, visible=20):
+    columns = ("Game", "Player", "Moves", "Time Taken", "Date", "Time")
+    results = {'rows': rows}
+    with tempfile.TemporaryDirectory() as folder:
+        file_name = os.path.join(folder, "scores.csv")
+        write_fake_scores(file_name, rows)
+        manager = ScoreManager(file_name)
+
+        start = time.perf_counter()
+        model = ScoreTableModel(columns, manager.get_scores())
+        results['load_s'] = time.perf_counter() - start
+        print(f"load {rows} rows:            {results['load_s']:.3f} s")
+
+        # First sort of each column builds its keys, the second one is cached
+        for label, sort_by in (("sort by moves", [("Moves", False)]),
+                               ("sort by moves (desc)", [("Moves", True)]),
+                               ("sort by player, time", [("Player", False), ("Time Taken", False)]),
+                               ("sort by moves again", [("Moves", False)])):
+            start = time.perf_counter()
+            model.sort(sort_by)
+            model.get_rows(0, visible)
+            results[label] = time.perf_counter() - start
+            print(f"{label + ':':<27}{results[label]:.3f} s")
+    return results
+
+
+# Benchmark the headless simulator with every kind of player
+def bench_simulation(games=2000, grid_size=4, seed=1):
+    results = {}
+    print(f"{'player':>8} {'games/s':>9} {'mean moves':>11} {'p90 moves':>10} {'bytes/game':>11}")
+    for player in PLAYERS:
+        summary = run_simulation(games, player, grid_size, seed).summary()
+        results[player] = summary
+        print(f"{player:>8} {summary['games_per_second']:>9.0f} {summary['moves_mean']:>11.2f} "
+              f"{summary['moves_p90']:>10.1f} {summary['memory_per_game']:>11}")
+    return results
+
+
+# Benchmark how the batch simulator scales with the number of processes
+def bench_batch_scaling(games=40000, shard_size=2000):
+    results = {}
+    cores = os.cpu_count() or 1
+    workers = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+    print(f"{'workers':>8} {'games/s':>9} {'speedup':>8}")
+    for count in workers:
+        aggregate, seconds = run_batch(games, "perfect", 4, seed=1, workers=count, shard_size=shard_size)
+        results[count] = aggregate.count / seconds
+        print(f"{count:>8} {results[count]:>9.0f} {results[count] / results[1]:>8.2f}")
+    return results
+
+
+# The board as it used to be stored (nested lists of one-character strings and booleans),
+# with the flip rules of the old MemoryGame (bounds, processing flag, first and second click),
+# kept here only to compare against the compact board of MemoryGame
+class ListOfListsBoard:
+    def __init__(self, grid_size, rng):
+        self.grid_size = grid_size
+        symbols = [symbol_label(k) for k in range(grid_size * grid_size // 2)] * 2
+        rng.shuffle(symbols)
+        self.answer_board = [symbols[i:i + grid_size] for i in range(0, len(symbols), grid_size)]
+        self.board = [['' for _ in range(grid_size)] for _ in range(grid_size)]
+        self.flipped_tiles = [[False for _ in range(grid_size)] for _ in range(grid_size)]
+        self.first_click = None
+        self.second_click = None
+        self.is_processing = False
+
+    def flip_card(self, i, j):
+        if i < 0 or j < 0 or i >= self.grid_size or j >= self.grid_size:
+            return False
+        if self.is_processing or self.flipped_tiles[i][j]:
+            return False
+        if self.first_click is None:
+            self.first_click = (i, j)
+        elif self.second_click is None:
+            self.second_click = (i, j)
+        else:
+            return False
+        self.board[i][j] = self.answer_board[i][j]
+        self.flipped_tiles[i][j] = True
+        return True
+
+    def reset_pair(self):
+        i1, j1 = self.first_click
+        i2, j2 = self.second_click
+        self.board[i1][j1] = ''
+        self.board[i2][j2] = ''
+        self.flipped_tiles[i1][j1] = False
+        self.flipped_tiles[i2][j2] = False
+        self.first_click = None
+        self.second_click = None
+
+
+# Benchmark memory per board and the time to flip and hide a pair of cards,
+# for the compact MemoryGame board and the old list-of-lists board (both with the same flip rules)
+# The compact board does a little more work per flip (bit operations and a check for listeners)
+# in exchange for using much less memory on big boards
+def bench_board_engine(sizes=(4, 32, 100), flips=20000, repeats=5):
+    results = {}
+    print(f"{'grid':>6} {'list KB':>9} {'compact KB':>11} {'list flip (us)':>15} {'compact flip (us)':>18}")
+    for grid_size in sizes:
+        rng = random.Random(1)
+        # Memory of one board
+        tracemalloc.start()
+        old_board = ListOfListsBoard(grid_size, rng)
+        old_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        tracemalloc.start()
+        game = MemoryGame(grid_size, clock=VirtualClock(), hide_delay=0, rng=rng)
+        compact_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        # Flip two cards and hide them again, many times (the best of a few runs, to skip noise)
+        cells = [(rng.randrange(grid_size), rng.randrange(grid_size)) for _ in range(flips)]
+        times = []
+        for board in (old_board, game):
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                for n in range(0, flips - 1, 2):
+                    if board.flip_card(*cells[n]) and board.flip_card(*cells[n + 1]):
+                        board.reset_pair()
+                    elif board.first_click is not None:
+                        # Same card picked twice: put the first card back
+                        board.second_click = board.first_click
+                        board.reset_pair()
+                best = min(best, time.perf_counter() - start)
+            times.append(best / flips)
+        old_time, compact_time = times
+
+        results[grid_size] = {'list_bytes': old_memory, 'compact_bytes': compact_memory,
+                              'list_flip_us': old_time * 1e6, 'compact_flip_us': compact_time * 1e6}
+        print(f"{grid_size:>6} {old_memory / 1024:>9.1f} {compact_memory / 1024:>11.1f} "
+              f"{old_time * 1e6:>15.3f} {compact_time * 1e6:>18.3f}")
+    print("The compact board trades a slower flip (bit operations) for much less memory per board")
+    return results
+
+
+# Benchmark generating boards: one by one with random.shuffle, one by one from a deal,
+# and many at once with NumPy
+def bench_board_factory(sizes=(4, 16), count=20000):
+    results = {}
+    print(f"{'grid':>6} {'shuffle/s':>11} {'deal/s':>11} {'numpy/s':>11}")
+    for grid_size in sizes:
+        pairs = grid_size * grid_size // 2
+        rng = random.Random(1)
+        small = max(1, count // 20)  # The one-by-one methods are slow, time fewer boards
+
+        start = time.perf_counter()
+        for _ in range(small):
+            symbols = list(range(pairs)) * 2
+            rng.shuffle(symbols)
+        shuffle_rate = small / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for index in range(small):
+            deal_symbols(grid_size, 1, index)
+        deal_rate = small / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        generate_boards(count, grid_size, 1)
+        numpy_rate = count / (time.perf_counter() - start)
+
+        results[grid_size] = {'shuffle': shuffle_rate, 'deal': deal_rate, 'numpy': numpy_rate}
+        print(f"{grid_size:>6} {shuffle_rate:>11.0f} {deal_rate:>11.0f} {numpy_rate:>11.0f}")
+    return results
+
+
+# Benchmark the time needed to get the title image of the home screen ready
+# cold: first launch (full PNG decoded and resized), warm: next launch (thumbnail read from disk),
+# revisit: going back to the home screen (image already in memory, needs a display)
+def bench_startup(image="memory_game_title.png", size=(482, 246), repeats=5):
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        cold = warm = float("inf")
+        for _ in range(repeats):
+            cache_dir = os.path.join(folder, "cache")
+            for name in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+                os.remove(os.path.join(cache_dir, name))
+            start = time.perf_counter()
+            AssetManager(cache_dir).load_scaled_image(image, size).load()
+            cold = min(cold, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            AssetManager(cache_dir).load_scaled_image(image, size).load()
+            warm = min(warm, time.perf_counter() - start)
+        results['cold_ms'] = cold * 1000
+        results['warm_ms'] = warm * 1000
+        print(f"cold launch:  {cold * 1000:8.2f} ms")
+        print(f"warm launch:  {warm * 1000:8.2f} ms")
+
+        try:
+            import tkinter as tk
+            root = tk.Tk()
+        except Exception:
+            print("revisit:      skipped (no display)")
+            return results
+        try:
+            assets = AssetManager(os.path.join(folder, "cache"))
+            assets.image(image, size)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                label = tk.Label(root, image=assets.image(image, size))
+                label.pack()
+                root.update()
+                label.destroy()
+            revisit = (time.perf_counter() - start) / repeats
+        finally:
+            root.destroy()
+        results['revisit_ms'] = revisit * 1000
+        print(f"revisit:      {revisit * 1000:8.2f} ms")
+    return results
+
+
+# Benchmark the time needed to redraw the board (with the window updated) for a small and a big board
+# sprites: drawing all card faces once, reveal: showing one card, full: revealing and hiding every card
+def bench_redraw(sizes=(4, 16), card_size=40, flips=200):
+    results = {}
+    colors = {'card_back': '#16213E', 'text': '#E94560'}
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        print("skipped (no display)")
+        return None
+    try:
+        print(f"{'grid':>6} {'sprites (ms)':>13} {'reveal (ms)':>12} {'full (ms)':>10}")
+        for grid_size in sizes:
+            canvas = tk.Canvas(root, width=grid_size * card_size, height=grid_size * card_size)
+            canvas.pack()
+            game = MemoryGame(grid_size, clock=VirtualClock(), hide_delay=0, rng=random.Random(1))
+            symbols = [symbol_label(symbol) for symbol in range(game.num_pairs)]
+
+            start = time.perf_counter()
+            renderer = BoardRenderer(canvas, grid_size, card_size, colors)
+            for symbol in symbols:
+                render_sprite(symbol, card_size, colors['text'])
+            renderer.preload(symbols)
+            root.update()
+            sprites_time = time.perf_counter() - start
+
+            # Reveal and hide one card at a time
+            rng = random.Random(1)
+            start = time.perf_counter()
+            for _ in range(flips):
+                cell = (rng.randrange(grid_size), rng.randrange(grid_size))
+                renderer.draw_cell(cell, symbols[game.symbol_at(*cell)])
+                root.update_idletasks()
+                renderer.draw_cell(cell, '')
+            reveal_time = (time.perf_counter() - start) / flips
+
+            # Reveal the whole board, then hide it
+            answer = [[symbols[game.symbol_at(i, j)] for j in range(grid_size)] for i in range(grid_size)]
+            hidden = [[''] * grid_size for _ in range(grid_size)]
+            start = time.perf_counter()
+            renderer.render(answer)
+            root.update_idletasks()
+            renderer.render(hidden)
+            root.update_idletasks()
+            full_time = (time.perf_counter() - start) / 2
+            canvas.destroy()
+
+            results[grid_size] = {'sprites_ms': sprites_time * 1000, 'reveal_ms': reveal_time * 1000, 'full_ms': full_time * 1000}
+            print(f"{grid_size:>6} {sprites_time * 1000:>13.2f} {reveal_time * 1000:>12.3f} {full_time * 1000:>10.2f}")
+    finally:
+        root.destroy()
+    return results
+
+
+# Benchmark replaying sessions through MemoryGame: the recorded sessions in the replays folder if there are any,
+# otherwise sessions played by the simulator's perfect memory player
+def bench_replay(folder="replays", sessions=20, grid_size=4, repeat=50):
+    files = sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(".mgr")) if os.path.isdir(folder) else []
+    if files:
+        logs = [ReplayLog.load(file_name) for file_name in files]
+        print(f"{len(logs)} recorded sessions from {folder}")
+    else:
+        logs = [record_simulated_session(PLAYERS["perfect"](rng=random.Random(seed)), grid_size, seed) for seed in range(sessions)]
+        print(f"{len(logs)} simulated sessions ({grid_size}x{grid_size})")
+    results = benchmark_logs(logs, repeat)
+    print(f"{results['flips_per_second']:.0f} flips/s, flip latency p50 {results['flip_p50_us']:.2f} us, "
+          f"p95 {results['flip_p95_us']:.2f} us, p99 {results['flip_p99_us']:.2f} us")
+    if results['refused']:
+        print(f"{results['refused']} flips were refused: the game does not replay these sessions the same way any more")
+    return results
+
+
+# Benchmark the cost of the instrumentation: a plain call against a timed call with the profiler off and on
+def bench_instrumentation(calls=200_000):
+    results = {}
+
+    def work(value):
+        return value + 1
+
+    print(f"{'call':<22} {'ns/call':>9}")
+    for label, function in (("plain", work),
+                            ("timed, profiler off", Profiler(enabled=False).timed("work")(work)),
+                            ("timed, profiler on", Profiler(enabled=True).timed("work")(work))):
+        start = time.perf_counter()
+        for value in range(calls):
+            function(value)
+        per_call = (time.perf_counter() - start) / calls
+        results[label + ' ns'] = per_call * 1e9
+        print(f"{label:<22} {per_call * 1e9:>9.1f}")
+    # Working out the percentiles of a full ring buffer (done by the overlay every 500ms)
+    profiler = Profiler(enabled=True)
+    timed = profiler.timed("work")(work)
+    for value in range(profiler.capacity):
+        timed(value)
+    summaries = 100
+    start = time.perf_counter()
+    for _ in range(summaries):
+        profiler.summary()
+    results['summary_us'] = (time.perf_counter() - start) / summaries * 1e6
+    print(f"summary of {profiler.capacity} times: {results['summary_us']:.1f} us/call")
+    return results
+
+
+# Benchmark the game server with many sessions at the same time (the server runs in another process,
+# on a Unix socket where there are Unix sockets and on TCP port 8765 otherwise), once for every computer player
+def bench_game_server(sessions=1000, connections=50, seconds=3.0, players=tuple(PLAYERS)):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "server.sock") if hasattr(socket, "AF_UNIX") else None
+        server = multiprocessing.Process(target=run_server, kwargs={'port': 8765, 'path': path}, daemon=True)
+        server.start()
+        try:
+            # Wait until the server accepts connections
+            for _ in range(100):
+                try:
+                    if path is not None:
+                        with socket.socket(socket.AF_UNIX) as probe:
+                            probe.connect(path)
+                    else:
+                        socket.create_connection(("127.0.0.1", 8765)).close()
+                    break
+                except OSError:
+                    time.sleep(0.05)
+            results = {}
+            for player_name in players:
+                results[player_name] = asyncio.run(load_test(sessions, connections, seconds, player_name=player_name,
+                                                             port=8765, path=path))
+                print(f"{player_name:>8}: ", end="")
+                print_load_results(results[player_name])
+        finally:
+            server.terminate()
+            server.join()
+    return results
+
+
+# Helper to import a module in a new Python process with "-X importtime"
+# Returns the total import time of the module and the time of each imported module (both in ms)
+def import_times(module):
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True).stderr
+    times = {}
+    for line in output.splitlines():
+        # Lines look like "import time:       277 |      30638 |     assets"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_time, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_time) / 1000, int(cumulative) / 1000)
+    return times.get(module, (0, 0))[1], times
+
+
+# Benchmark the time needed to import the game (what runs before the first window can appear)
+# Fails (exit code 1) when the import takes longer than the budget
+def bench_import_time(module="main", budget_ms=300, repeats=3, top=10):
+    total, times = min((import_times(module) for _ in range(repeats)), key=lambda result: result[0])
+    print(f"{'module':<40} {'self ms':>9} {'total ms':>9}")
+    slowest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    for name, (self_time, cumulative) in slowest:
+        print(f"{name:<40} {self_time:>9.1f} {cumulative:>9.1f}")
+    heavy = [name for name in ("pandas", "numpy", "matplotlib", "pygame") if name in times]
+    print(f"import {module}: {total:.1f} ms (budget {budget_ms} ms)")
+    if heavy:
+        print("heavy modules imported at start: " + ", ".join(heavy))
+    results = {'module': module, 'total_ms': total, 'budget_ms': budget_ms, 'heavy_modules': heavy,
+               'slowest': {name: self_time for name, (self_time, _) in slowest}}
+    if total > budget_ms:
+        print("Over budget!")
+        if "--record" in sys.argv[2:]:
+            record_results("import-time", results)
+        sys.exit(1)
+    return results
+
+
+# Helper to append the results of a benchmark to benchmark_results.jsonl
+def record_results(name, results):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    with open("benchmark_results.jsonl", "a") as file:
+        file.write(json.dumps({'benchmark': name, 'commit': commit, 'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+                               'results': results}) + "\n")
+
+
+# All benchmarks by name
+BENCHMARKS = {
+    "score-append": bench_score_append,
+    "history-open": bench_history_open,
+    "history-sort": bench_history_sort,
+    "score-stream": bench_score_stream,
+    "score-archive": bench_score_archive,
+    "score-stress": bench_score_stress,
+    "simulation": bench_simulation,
+    "batch-scaling": bench_batch_scaling,
+    "board-engine": bench_board_engine,
+    "board-factory": bench_board_factory,
+    "startup": bench_startup,
+    "redraw": bench_redraw,
+    "import-time": bench_import_time,
+    "instrumentation": bench_instrumentation,
+    "replay": bench_replay,
+    "game-server": bench_game_server,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print("Usage: python benchmark.py <benchmark> [--record]")
+        print("Benchmarks: " + ", ".join(BENCHMARKS))
+    else:
+        results = BENCHMARKS[sys.argv[1]]()
+        if "--record" in sys.argv[2:] and results is not None:
+            record_results(sys.argv[1], results)
@@ -0,0 +1,98 @@
+# Board factory for the Memory Game.
+# Generates many boards at once with NumPy from an explicit seed, and can replay any of them exactly.
+#
+# Every board is identified by (grid size, seed, index). Each tile gets a 64-bit random key computed
+# with the SplitMix64 hash from the seed, the board index and the tile position, and the board is the
+# list of pairs [0, 1, ..., pairs-1, 0, 1, ..., pairs-1] ordered by those keys.
+# Because the keys are a hash (not a stream of random numbers), board number 5000 can be
+# rebuilt on its own without generating boards 0 to 4999, and the NumPy (bulk) and plain Python
+# (one board) versions give exactly the same boards.
+# A deal is written as a short token "<grid>x<grid>-<seed in hex>-<index>", e.g. "4x4-2a-0".
+
+from game_logic import MemoryGame   # Import the MemoryGame class to replay deals
+
+MASK = (1 << 64) - 1                # Keep numbers to 64 bits
+GOLDEN = 0x9E3779B97F4A7C15         # Constants of the SplitMix64 hash
+MIX1 = 0xBF58476D1CE4E5B9
+MIX2 = 0x94D049BB133111EB
+
+
+# SplitMix64 hash of one number (plain Python)
+def splitmix64(x):
+    x = (x + GOLDEN) & MASK
+    x = ((x ^ (x >> 30)) * MIX1) & MASK
+    x = ((x ^ (x >> 27)) * MIX2) & MASK
+    return x ^ (x >> 31)
+
+
+# SplitMix64 hash of a NumPy array of uint64 (numbers wrap around at 64 bits like in the plain version)
+def splitmix64_array(np, x):
+    x = x + np.uint64(GOLDEN)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(MIX1)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(MIX2)
+    return x ^ (x >> np.uint64(31))
+
+
+# Helper to turn a seed or a NumPy Generator into a 64-bit seed
+def to_seed(seed):
+    if hasattr(seed, "integers"):   # A numpy.random.Generator
+        return int(seed.integers(0, 2 ** 63))
+    return int(seed) & MASK
+
+
+# Method to get the symbols of one board (row by row), without NumPy
+def deal_symbols(grid_size, seed, index=0):
+    tiles = grid_size * grid_size
+    pairs = tiles // 2
+    base = splitmix64(to_seed(seed) ^ splitmix64(index))
+    keys = [splitmix64((base + tile) & MASK) for tile in range(tiles)]
+    order = sorted(range(tiles), key=keys.__getitem__)
+    return [order_tile % pairs for order_tile in order]
+
+
+# Method to generate `count` boards at once with NumPy
+# Returns an array with one row of symbols per board (board `start` is the first row)
+def generate_boards(count, grid_size, seed, start=0, chunk_tiles=1 << 22):
+    import numpy as np  # NumPy is only needed for bulk generation
+
+    tiles = grid_size * grid_size
+    pairs = tiles // 2
+    seed = np.uint64(to_seed(seed))
+    dtype = np.uint16 if pairs <= 65536 else np.uint32
+    boards = np.empty((count, tiles), dtype=dtype)
+    tile_numbers = np.arange(tiles, dtype=np.uint64)
+    # Generate the boards in chunks so the keys never take too much memory
+    per_chunk = max(1, chunk_tiles // tiles)
+    with np.errstate(over="ignore"):
+        for first in range(0, count, per_chunk):
+            last = min(count, first + per_chunk)
+            indexes = np.arange(start + first, start + last, dtype=np.uint64)
+            base = splitmix64_array(np, seed ^ splitmix64_array(np, indexes))
+            keys = splitmix64_array(np, base[:, None] + tile_numbers[None, :])
+            order = np.argsort(keys, axis=1, kind="stable")
+            boards[first:last] = order % pairs
+    return boards
+
+
+# Method to write a deal as a token (the seed must be a number here, so the token can be replayed)
+def deal_token(grid_size, seed, index=0):
+    return f"{grid_size}x{grid_size}-{int(seed) & MASK:x}-{index}"
+
+
+# Method to read a token, returns (grid size, seed, index)
+def parse_deal_token(token):
+    try:
+        size, seed, index = token.split("-")
+        rows, columns = size.split("x")
+        if rows != columns:
+            raise ValueError
+        return int(rows), int(seed, 16), int(index)
+    except ValueError:
+        raise ValueError(f"Not a deal token: {token!r}") from None
+
+
+# Method to start a game with exactly the board of a deal
+# Any extra arguments (clock, hide_delay, ...) are passed to MemoryGame
+def replay_deal(token, **game_options):
+    grid_size, seed, index = parse_deal_token(token)
+    return MemoryGame(grid_size=grid_size, symbols=deal_symbols(grid_size, seed, index), **game_options)
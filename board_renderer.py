@@ -0,0 +1,296 @@
+import time     # Import the time module to measure how long drawing takes
+from PIL import Image, ImageDraw, ImageFont, ImageTk  # Import Pillow to draw the card faces once as images
+from game_logic import symbol_label  # Import symbol_label to name the symbols of the emoji table
+
+# Emoji drawn for each symbol of the game board, in the order of the symbols ('A' gets the first one)
+# Boards with more symbols than emoji show the name of the symbol ('CA', 'CB', ...) instead
+GLYPHS = [
+    '👽', '💗', '🦄', '🍭', '🌷', '🧩', '💡', '💖', '🍀', '🌈', '🎈', '🐙', '🍉', '🚀', '🎲', '🦋',
+    '🍩', '🐢', '🌵', '🎸', '🍄', '🐝', '🌙', '🔔', '🍒', '🐧', '🎁', '🦊', '🍋', '⚽', '🐳', '🌻',
+    '🎨', '🦀', '🍇', '🐼', '🔑', '🍓', '🐸', '🌍', '🎃', '🦉', '🍕', '🐞', '💎', '🍪', '🐬', '⭐',
+    '🎺', '🦁', '🍔', '🐠', '🌶', '🎯', '🦜', '🥝', '🐨', '🧲', '🍦', '🦒', '🎻', '🐿', '🥥', '🌋',
+]
+SYMBOL_GLYPHS = {symbol_label(number): glyph for number, glyph in enumerate(GLYPHS)}
+
+# Fonts tried to draw the emoji (Windows, Linux, macOS) and the names of symbols without an emoji
+EMOJI_FONTS = ("seguiemj.ttf", "NotoColorEmoji.ttf", "Apple Color Emoji.ttc")
+TEXT_FONTS = ("arial.ttf", "DejaVuSans.ttf")
+FONTS = {}          # (font names, size) -> (font, size it was loaded at)
+SPRITES = {}        # (symbol, card size, color) -> PIL image of the card face
+PHOTO_SPRITES = {}  # (Tk interpreter, symbol, card size, color) -> PhotoImage of the card face
+# Zooming and resizing the window make new card sizes, so only the images of the last few sizes are kept
+CARD_SIZES_KEPT = 3
+CARD_SIZES = []     # Card sizes with images in the caches, the most recently used last
+
+
+# Helper to note that a card size is being drawn, and drop the images and fonts of the card sizes
+# not used for the longest time (the board always draws with one size, see BoardRenderer.zoom)
+def use_card_size(card_size):
+    if CARD_SIZES and CARD_SIZES[-1] == card_size:
+        return
+    if card_size in CARD_SIZES:
+        CARD_SIZES.remove(card_size)
+    CARD_SIZES.append(card_size)
+    while len(CARD_SIZES) > CARD_SIZES_KEPT:
+        old_size = CARD_SIZES.pop(0)
+        for key in [key for key in SPRITES if key[1] == old_size]:
+            del SPRITES[key]
+        for key in [key for key in PHOTO_SPRITES if key[2] == old_size]:
+            del PHOTO_SPRITES[key]
+        font_sizes = {glyph_size(size) for size in CARD_SIZES}
+        for key in [key for key in FONTS if key[1] == glyph_size(old_size) and key[1] not in font_sizes]:
+            del FONTS[key]
+
+
+# Helper to get the size of the emoji or name drawn on a card
+def glyph_size(card_size):
+    return int(card_size * 0.55)  # About the size of the old Arial 54 text on 130 pixel cards
+
+
+# Helper to get the emoji of a symbol (or the name of the symbol if it has no emoji)
+def symbol_glyph(symbol):
+    return SYMBOL_GLYPHS.get(symbol, symbol)
+
+
+# Helper to load the first font that exists, returns (font, size it was loaded at) or (None, 0)
+def load_font(names, size):
+    if (names, size) not in FONTS:
+        FONTS[(names, size)] = (None, 0)
+        for name in names:
+            try:
+                FONTS[(names, size)] = (ImageFont.truetype(name, size), size)
+                break
+            except OSError:
+                try:
+                    # Color emoji fonts made of bitmaps only have some sizes (Noto Color Emoji only has 109)
+                    FONTS[(names, size)] = (ImageFont.truetype(name, 109), 109)
+                    break
+                except OSError:
+                    pass
+    return FONTS[(names, size)]
+
+
+# Helper to draw the face of a card (the emoji or name of the symbol on a transparent square) with Pillow
+def render_sprite(symbol, card_size, color):
+    use_card_size(card_size)
+    if (symbol, card_size, color) in SPRITES:
+        return SPRITES[(symbol, card_size, color)]
+    size = glyph_size(card_size)
+    glyph = symbol_glyph(symbol)
+    font, font_size = load_font(EMOJI_FONTS, size) if glyph != symbol else (None, 0)
+    emoji = font is not None
+    if not emoji:
+        # No emoji (or no emoji font): write the name of the symbol
+        glyph = symbol
+        font, font_size = load_font(TEXT_FONTS, size)
+        if font is None:
+            try:
+                font = ImageFont.load_default(size)
+            except TypeError:
+                font = ImageFont.load_default()  # Pillow older than 10.1 only has the small bitmap font (it is scaled below)
+
+    # Draw the glyph on an image just big enough for it
+    left, top, right, bottom = ImageDraw.Draw(Image.new("RGBA", (1, 1))).textbbox((0, 0), glyph, font=font, embedded_color=emoji)
+    glyph_image = Image.new("RGBA", (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+    ImageDraw.Draw(glyph_image).text((-left, -top), glyph, font=font, fill=color, embedded_color=emoji)
+
+    # Scale it to fit in the card (long names get smaller) and put it in the middle of the card
+    scale = min(size / max(glyph_image.size), card_size * 0.8 / glyph_image.width)
+    width, height = max(1, int(glyph_image.width * scale)), max(1, int(glyph_image.height * scale))
+    glyph_image = glyph_image.resize((width, height), Image.Resampling.LANCZOS)
+    sprite = Image.new("RGBA", (card_size, card_size), (0, 0, 0, 0))
+    sprite.paste(glyph_image, ((card_size - width) // 2, (card_size - height) // 2), glyph_image)
+    SPRITES[(symbol, card_size, color)] = sprite
+    return sprite
+
+
+# Helper to get the face of a card as a Tkinter PhotoImage (made only once for each symbol, card size and color)
+def photo_sprite(canvas, symbol, card_size, color):
+    use_card_size(card_size)
+    key = (canvas.tk, symbol, card_size, color)  # PhotoImages belong to one Tk interpreter
+    if key not in PHOTO_SPRITES:
+        PHOTO_SPRITES[key] = ImageTk.PhotoImage(render_sprite(symbol, card_size, color), master=canvas)
+    return PHOTO_SPRITES[key]
+
+
+MIN_CARD_SIZE = 32     # Smallest card (at 96 DPI); bigger boards scroll instead of getting smaller cards
+MAX_CARD_SIZE = 130    # Biggest card (at 96 DPI), the size of the cards of the 4x4 board
+
+
+# Helper to get the size of the cards so the board fits in the space (width x height pixels),
+# but never smaller than min_size (the board then has to scroll) or bigger than max_size
+def fit_card_size(width, height, grid_size, min_size=MIN_CARD_SIZE, max_size=MAX_CARD_SIZE):
+    return max(min_size, min(max_size, min(width, height) // grid_size))
+
+
+# Define the BoardRenderer class
+
+# This class draws the game board on a Tkinter canvas.
+# Instead of deleting and redrawing everything after every click, the canvas items (one rectangle
+# and one image item per card) are kept in a dictionary (cell -> item ids) and only changed with itemconfig.
+# Only the cards in the visible part of the canvas (the viewport) have canvas items: when the board
+# is bigger than the canvas and is scrolled, the items of cards that leave the viewport are moved to
+# the cards that come in, so a 64x64 board doesn't need thousands of canvas items.
+# The symbols of the face-up cards are kept in a dictionary (cell -> symbol) for the whole board,
+# so a card coming into the viewport is drawn right away.
+# The faces of the cards are drawn once with Pillow (see render_sprite) and kept as images, so revealing
+# a card only puts an image on the canvas instead of asking Tk to draw a big emoji every time.
+# The renderer counts how many redraws it did, how many cards each redraw changed and how long
+# it took, so we can check that flipping a card only touches that card.
+class BoardRenderer:
+    def __init__(self, canvas, grid_size, card_size, colors):
+        self.canvas = canvas            # The canvas to draw on
+        self.grid_size = grid_size      # Number of rows and columns
+        self.card_size = card_size      # Size of one card in pixels
+        self.colors = colors            # Color palette of the game
+        self.items = {}                 # (row, column) -> (rectangle id, image id) of the cards in the viewport
+        self.free_items = []            # (rectangle id, image id) not used by any card
+        self.shown = {}                 # (row, column) -> symbol drawn on a card in the viewport ('' if hidden)
+        self.face_up = {}               # (row, column) -> symbol of every face-up card of the board
+
+        # Counters to check the drawing work
+        self.render_count = 0           # Number of redraws
+        self.cells_updated = 0          # Number of cards changed by the last redraw
+        self.total_cells_updated = 0    # Number of cards changed by all redraws
+        self.last_render_time = 0.0     # Time taken by the last redraw (seconds)
+
+        self.create_items()
+
+    # Method to start drawing a new board (done once per game, and when zooming)
+    def create_items(self):
+        self.canvas.delete("all")  # Clear the canvas
+        self.items = {}
+        self.free_items = []
+        self.shown = {}
+        board_size = self.grid_size * self.card_size
+        self.canvas.config(scrollregion=(0, 0, board_size, board_size))
+        self.update_viewport()
+
+    # Method to get the rows and columns in the viewport (as two ranges)
+    def visible_cells(self):
+        # winfo_width is 1 until the canvas is shown, use the size it was asked to have until then
+        width = self.canvas.winfo_width() if self.canvas.winfo_width() > 1 else int(self.canvas.cget('width'))
+        height = self.canvas.winfo_height() if self.canvas.winfo_height() > 1 else int(self.canvas.cget('height'))
+        left, top = int(self.canvas.canvasx(0)), int(self.canvas.canvasy(0))
+        rows = range(max(0, top // self.card_size), min(self.grid_size, (top + height - 1) // self.card_size + 1))
+        columns = range(max(0, left // self.card_size), min(self.grid_size, (left + width - 1) // self.card_size + 1))
+        return rows, columns
+
+    # Method to give canvas items to the cards that came into the viewport and take them from the cards that left
+    # Call it whenever the canvas is scrolled or resized
+    def update_viewport(self):
+        rows, columns = self.visible_cells()
+        # Free the items of the cards that are not visible any more
+        for cell in [cell for cell in self.items if cell[0] not in rows or cell[1] not in columns]:
+            rectangle, image = self.items.pop(cell)
+            del self.shown[cell]
+            self.canvas.itemconfig(rectangle, state='hidden')
+            self.canvas.itemconfig(image, state='hidden')
+            self.free_items.append((rectangle, image))
+        # Give items to the cards that became visible
+        for i in rows:
+            for j in columns:
+                if (i, j) not in self.items:
+                    self.place_cell((i, j))
+
+    # Method to put a card of the viewport on the canvas (reusing free items if there are any)
+    def place_cell(self, cell):
+        x1, y1 = cell[1] * self.card_size, cell[0] * self.card_size # Top-left corner of the card
+        x2, y2 = x1 + self.card_size, y1 + self.card_size # Bottom-right corner of the card
+        if self.free_items:
+            rectangle, image = self.free_items.pop()
+            self.canvas.coords(rectangle, x1, y1, x2, y2)
+            self.canvas.coords(image, x1 + self.card_size/2, y1 + self.card_size/2)
+            self.canvas.itemconfig(rectangle, state='normal')
+        else:
+            rectangle = self.canvas.create_rectangle(x1, y1, x2, y2, fill=self.colors['card_back'], outline=self.colors['text'])
+            # The image item is hidden until the card is revealed
+            # anchor is used to align the image to the center
+            image = self.canvas.create_image(x1 + self.card_size/2, y1 + self.card_size/2, anchor='center', state='hidden')
+        self.items[cell] = (rectangle, image)
+        self.shown[cell] = ''
+        self.draw_cell(cell, self.face_up.get(cell, ''))
+
+    # Method to change the size of the cards, keeping the same part of the board in the middle of the view
+    def zoom(self, card_size):
+        if card_size == self.card_size:
+            return
+        # Middle of the view, as a fraction of the board
+        middles = [(first + last) / 2 for first, last in (self.canvas.xview(), self.canvas.yview())]
+        self.card_size = card_size
+        self.create_items()
+        # Scroll so the middle of the view stays where it was
+        for middle, view, moveto in zip(middles, (self.canvas.xview(), self.canvas.yview()),
+                                        (self.canvas.xview_moveto, self.canvas.yview_moveto)):
+            moveto(middle - (view[1] - view[0]) / 2)
+        self.update_viewport()
+
+    # Method to get the cell (row, column) at a point of the canvas window (e.g. a mouse click), or None
+    # Works at any board size: the position is just divided by the card size
+    def cell_at(self, x, y):
+        i = int(self.canvas.canvasy(y) // self.card_size)
+        j = int(self.canvas.canvasx(x) // self.card_size)
+        if 0 <= i < self.grid_size and 0 <= j < self.grid_size:
+            return i, j
+        return None
+
+    # Method to get the image of a card face
+    def sprite(self, symbol):
+        return photo_sprite(self.canvas, symbol, self.card_size, self.colors['text'])
+
+    # Method to draw the faces of the given symbols now, so revealing a card later doesn't have to
+    def preload(self, symbols):
+        for symbol in symbols:
+            self.sprite(symbol)
+
+    # Method to set the symbol of one card ('' for a hidden card), and draw it if it is in the viewport
+    def draw_cell(self, cell, symbol):
+        if symbol:
+            self.face_up[cell] = symbol
+        else:
+            self.face_up.pop(cell, None)
+        if cell not in self.items:
+            return
+        if symbol:
+            self.canvas.itemconfig(self.items[cell][1], image=self.sprite(symbol), state='normal')
+        else:
+            self.canvas.itemconfig(self.items[cell][1], state='hidden')
+        self.shown[cell] = symbol
+
+    # Method to redraw the cards listed in a ChangeSet sent by the game
+    def render_changes(self, changes):
+        start = time.perf_counter()
+        updated = 0
+        for i, j, symbol in changes.revealed:
+            self.draw_cell((i, j), symbol)
+            updated += 1
+        for cell in changes.hidden:
+            self.draw_cell(cell, '')
+            updated += 1
+
+        # Update the counters
+        self.render_count += 1
+        self.cells_updated = updated
+        self.total_cells_updated += updated
+        self.last_render_time = time.perf_counter() - start
+        return updated
+
+    # Method to redraw the cards that changed
+    # If `cells` is given, only those cards are checked, otherwise the whole board is compared
+    def render(self, board, cells=None):
+        start = time.perf_counter()
+        if cells is None:
+            cells = ((i, j) for i in range(self.grid_size) for j in range(self.grid_size))
+        updated = 0
+        for cell in cells:
+            symbol = board[cell[0]][cell[1]]
+            if self.face_up.get(cell, '') != symbol:
+                self.draw_cell(cell, symbol)
+                updated += 1
+
+        # Update the counters
+        self.render_count += 1
+        self.cells_updated = updated
+        self.total_cells_updated += updated
+        self.last_render_time = time.perf_counter() - start
+        return updated
@@ -1,58 +1,1135 @@
 import csv                      # Import the CSV module to read and write CSV files
+import glob                     # Import the glob module to find the journals left by other games
+import io                       # Import the io module to read text from a position in a binary file
+import itertools                # Import the itertools module to take a slice of the rows
+import heapq                    # Import the heapq module to pick the best scores without sorting everything
+import json                     # Import the JSON module to save the statistics cache
+import math                     # Import the math module for square roots (standard deviation)
 import os                       # Import the OS module to check if a file exists
+import queue                    # Import the queue module for the write-behind queue
+import sqlite3                  # Import the sqlite3 module for the SQLite score backend
+import sys                      # Import the sys module to read command line arguments
+import threading                # Import the threading module for the write-behind thread
+import time                     # Import the time module to wait for a batch of scores
+import uuid                     # Import the uuid module to give every queued score its own id
+from array import array         # Import the array module for a compact list of file positions
 from datetime import datetime   # Import the datetime module to get the current date and time
+from typing import NamedTuple   # Import NamedTuple to define the typed score record
+from score_archive import ScoreArchive  # Import the ScoreArchive class for the columnar copy of the scores
+from instrumentation import PROFILER    # Import the profiler to measure how long saving a score takes
+try:
+    import fcntl                # Import the fcntl module to lock files on Linux and macOS
+except ImportError:
+    fcntl = None
+    import msvcrt               # Import the msvcrt module to lock files on Windows
 
-# Define the ScoreManager class
+# Headers of the scores CSV file
+HEADERS = ["Game Number", "Player Name", "Moves", "Time Taken", "Date", "Time"]
 
-# This class will handle saving and retrieving scores from a CSV file
-# It will save the player name, number of moves, time taken, date, and time for each game
-# It will also read all scores from the CSV file
+
+# Define the ScoreRecord class
+
+# One score with its values already converted (numbers as int/float, date and time as one datetime)
+# Returned by ScoreManager.iter_scores, so code reading many scores doesn't have to convert the strings itself
+class ScoreRecord(NamedTuple):
+    game_number: int
+    player_name: str
+    moves: int
+    time_taken: float
+    played_at: datetime
+
+    # Method to make a ScoreRecord from a row of strings (as stored in the CSV file)
+    @classmethod
+    def from_row(cls, row):
+        return cls(int(row[0]), row[1], int(row[2]), float(row[3]), datetime.fromisoformat(f"{row[4]} {row[5]}"))
+
+    # Method to turn the record back into a row (as stored in the CSV file)
+    def to_row(self):
+        return [self.game_number, self.player_name, self.moves, f"{self.time_taken:.2f}",
+                self.played_at.strftime("%Y-%m-%d"), self.played_at.strftime("%H:%M:%S")]
+
+
+# Helper to keep only the rows of a batch that match the filters (None means no filter)
+# Dates are YYYY-MM-DD strings, so they can be compared as text without converting them
+def filter_rows(rows, player_name=None, start_date=None, end_date=None):
+    if player_name is not None:
+        rows = [row for row in rows if row[1] == player_name]
+    if start_date is not None:
+        rows = [row for row in rows if row[4] >= start_date]
+    if end_date is not None:
+        rows = [row for row in rows if row[4] <= end_date]
+    return rows
+
+
+# Helper to work out the average and best moves/time of some score rows
+# Returns a dictionary with count, avg_moves, avg_time, best_moves and best_time
+def summarize_scores(rows):
+    count = 0
+    total_moves = total_time = 0.0
+    best_moves = best_time = None
+    for row in rows:
+        moves, time_taken = float(row[2]), float(row[3])
+        count += 1
+        total_moves += moves
+        total_time += time_taken
+        best_moves = moves if best_moves is None else min(best_moves, moves)
+        best_time = time_taken if best_time is None else min(best_time, time_taken)
+    return {
+        'count': count,
+        'avg_moves': total_moves / count if count else 0.0,
+        'avg_time': total_time / count if count else 0.0,
+        'best_moves': best_moves or 0.0,
+        'best_time': best_time or 0.0,
+    }
+
+
+# Define the FileLock class
+
+# An advisory lock on a lock file (e.g. scores.csv.lock) shared by every game using the same scores file,
+# so only one process (and one thread) at a time can add scores. The others wait for their turn.
+# Uses fcntl.flock on Linux and macOS and msvcrt.locking on Windows.
+# The thread holding the lock can enter it again (it keeps a depth count).
+class FileLock:
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.file = None
+        self.depth = 0
+        self.thread_lock = threading.RLock()  # Threads of the same process wait here
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exception):
+        self.release()
+
+    # Method to take the lock, returns False if blocking is False and another game holds it
+    def acquire(self, blocking=True):
+        if not self.thread_lock.acquire(blocking):
+            return False
+        if self.depth == 0:
+            try:
+                self.file = open(self.file_name, 'a+b')
+                if fcntl is not None:
+                    fcntl.flock(self.file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    self.file.seek(0)
+                    while True:
+                        try:
+                            msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                            break
+                        except OSError:
+                            if not blocking:
+                                raise
+                            # LK_LOCK gives up after 10 seconds, keep waiting
+            except BaseException as e:
+                if self.file is not None:
+                    self.file.close()
+                    self.file = None
+                self.thread_lock.release()
+                if not blocking and isinstance(e, OSError):
+                    return False
+                raise
+        self.depth += 1
+        return True
+
+    # Method to give the lock back
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+            self.file.close()
+            self.file = None
+        self.thread_lock.release()
+
+
+# Define the CSVScoreBackend class
+
+# This class stores the scores in a CSV file (the default storage)
 # The CSV file will have the following headers: Game Number, Player Name, Moves, Time Taken, Date, Time
-# The save_score method will append a new score entry to the CSV file
 
-# The ScoreManager class will have the following methods:
-class ScoreManager:
-    def __init__(self):
+# Next to the CSV file we keep a small index file (scores.csv.idx) holding the number of rows
+# and the size of the CSV file in bytes when the index was last written.
+# This lets us work out the next game number without reading the whole history again.
+# If the CSV file was changed by someone else (the sizes don't match), the index is rebuilt once.
+
+# A second file (scores.csv.offsets) keeps the position in the file of every 1024th row,
+# so a page of rows anywhere in the history can be read without going through the rows before it.
+
+# Several games can share the same scores file: adding scores and rebuilding the index hold the
+# lock file (scores.csv.lock), so game numbers are never given twice and rows are never mixed up.
+class CSVScoreBackend:
+    # Number of rows between two saved file positions
+    CHECKPOINT_ROWS = 1024
+
+    def __init__(self, file_name="scores.csv"):
         # Initialize the file name
-        self.file_name = "scores.csv"
+        self.file_name = file_name
+        # Initialize the index file names (stored next to the CSV file)
+        self.index_file = file_name + ".idx"
+        self.offsets_file = file_name + ".offsets"
+        # Lock shared with the other processes writing this file
+        self.lock = FileLock(file_name + ".lock")
         # Create the CSV file with headers if it doesn't exist
         if not os.path.exists(self.file_name):
             # Exception handling for file creation
             try:
                 with open(self.file_name, 'w', newline='') as file: # Open the file in write mode
                     writer = csv.writer(file) # Create a CSV writer object
-                    writer.writerow(["Game Number", "Player Name", "Moves", "Time Taken", "Date", "Time"]) # Write the headers
-            except IOError as e: 
+                    writer.writerow(HEADERS) # Write the headers
+            except IOError as e:
                 print(f"Error creating file: {e}") # Print an error message if file creation fails
 
-    # Method to save the score of a game
-    def save_score(self, player_name, moves, time_taken):
-        # Exception handling for appending to the file
+    # Method to read the index file, returns (rows, size) or None if it is missing or broken
+    def _read_index(self):
+        try:
+            with open(self.index_file, 'r') as file:
+                rows, size = file.read().split()
+                return int(rows), int(size)
+        except (IOError, ValueError):
+            return None
+
+    # Method to write the index file
+    def _write_index(self, rows, size):
+        # Write to a temporary file first and then replace the old one,
+        # so a crash never leaves a half written index behind
+        temp_file = f"{self.index_file}.{os.getpid()}.tmp"
+        with open(temp_file, 'w') as file:
+            file.write(f"{rows} {size}\n")
+        os.replace(temp_file, self.index_file)
+
+    # Method to rebuild the index by counting the rows of the CSV file once
+    # This is also the migration path for score files created before the index existed
+    def rebuild_index(self):
+        try:
+            with self.lock:
+                return self._rebuild_index()
+        except IOError as e:
+            print(f"Error rebuilding index: {e}")
+            return 0
+
+    # Method to rebuild the index (the lock must be held)
+    def _rebuild_index(self):
+        rows = 0
+        checkpoints = array('Q')
+        with open(self.file_name, 'rb') as file:
+            # Skip the header
+            file.readline()
+            position = file.tell()
+            line = file.readline()
+            while line:
+                # A quoted player name can contain a line break, so a row only ends
+                # when the number of quote characters read so far is even
+                while line.count(b'"') % 2:
+                    more = file.readline()
+                    if not more:
+                        break
+                    line += more
+                if rows % self.CHECKPOINT_ROWS == 0:
+                    checkpoints.append(position)
+                rows += 1
+                position = file.tell()
+                line = file.readline()
+        with open(self.offsets_file, 'wb') as file:
+            checkpoints.tofile(file)
+        # Record the size that was read (not the size now), so rows added meanwhile are counted next time
+        self._write_index(rows, position)
+        return rows
+
+    # Method to read the saved file positions, rebuilding the index if they don't match it
+    def _read_checkpoints(self, count):
+        checkpoints = array('Q')
+        expected = -(-count // self.CHECKPOINT_ROWS)  # Round up
         try:
+            with open(self.offsets_file, 'rb') as file:
+                checkpoints.frombytes(file.read())
+        except IOError:
+            pass
+        if len(checkpoints) != expected:
+            self.rebuild_index()
+            checkpoints = array('Q')
+            with open(self.offsets_file, 'rb') as file:
+                checkpoints.frombytes(file.read())
+        return checkpoints
+
+    # Method to get the number of saved scores
+    def count(self):
+        index = self._read_index()
+        # Only trust the index if the CSV file still has the size we recorded
+        if index is None or index[1] != os.path.getsize(self.file_name):
+            return self.rebuild_index()
+        return index[0]
+
+    # Method to get the game number of the next game
+    def next_game_number(self):
+        return self.count() + 1
+
+    # Method to append score rows to the CSV file
+    # With fsync=True the rows are on the disk (not just in the system's cache) when the method returns
+    def append_rows(self, rows, fsync=False):
+        with self.lock:
+            count = self.count()
+            checkpoints = array('Q')
             with open(self.file_name, 'a', newline='') as file: # Open the file in append mode
                 writer = csv.writer(file)
-                # Count existing games
-                game_number = sum(1 for _ in open(self.file_name))
-                # Get the current time
-                current_time = datetime.now()
-                # Format time taken to 2 decimal places
-                formatted_time_taken = f"{time_taken:.2f}"
-                # Write the new score entry
-                writer.writerow([game_number, player_name, moves, formatted_time_taken, current_time.strftime("%Y-%m-%d"), current_time.strftime("%H:%M:%S")])
+                for number, row in enumerate(rows, count):
+                    # Remember where every 1024th row starts
+                    if number % self.CHECKPOINT_ROWS == 0:
+                        checkpoints.append(file.tell())
+                    writer.writerow(row)
+                # Remember the new size of the file
+                file.flush()
+                if fsync:
+                    os.fsync(file.fileno())
+                size = file.tell()
+            # Update the index with the new rows
+            if checkpoints:
+                with open(self.offsets_file, 'ab') as file:
+                    checkpoints.tofile(file)
+            self._write_index(count + len(rows), size)
+
+    # Method to add new scores, giving them the next game numbers
+    # scores are rows without the game number; returns the rows with their game numbers
+    def add_scores(self, scores, fsync=False):
+        with self.lock:
+            first = self.next_game_number()
+            rows = [[number] + list(score) for number, score in enumerate(scores, first)]
+            self.append_rows(rows, fsync)
+            return rows
+
+    # Method to go through all score rows one by one
+    def iter_rows(self):
+        with open(self.file_name, 'r', newline='') as file: # Open the file in read mode
+            reader = csv.reader(file)
+            # Skip the header
+            next(reader, None)
+            yield from reader
+
+    # Method to go through the score rows in lists of at most batch_size rows,
+    # keeping only the rows that match the filters (rows are filtered before they are converted)
+    def iter_batches(self, batch_size=10000, player_name=None, start_date=None, end_date=None):
+        with open(self.file_name, 'r', newline='') as file: # Open the file in read mode
+            reader = csv.reader(file)
+            # Skip the header
+            next(reader, None)
+            while True:
+                batch = list(itertools.islice(reader, batch_size))
+                if not batch:
+                    break
+                batch = filter_rows(batch, player_name, start_date, end_date)
+                if batch:
+                    yield batch
+
+    # Method to read `limit` rows starting at row number `offset` (0 is the first score)
+    def read_rows(self, offset, limit):
+        count = self.count()
+        if offset >= count or limit <= 0:
+            return []
+        checkpoints = self._read_checkpoints(count)
+        with open(self.file_name, 'rb') as binary_file:
+            # Jump to the saved position just before the first row we want
+            binary_file.seek(checkpoints[offset // self.CHECKPOINT_ROWS])
+            reader = csv.reader(io.TextIOWrapper(binary_file, newline=''))
+            # Skip the few rows between the saved position and the first row we want
+            start = offset % self.CHECKPOINT_ROWS
+            return list(itertools.islice(reader, start, start + limit))
+
+    # Method to get the scores of one player
+    def scores_for_player(self, player_name):
+        return [row for row in self.iter_rows() if row[1] == player_name]
+
+    # Method to get the n scores with the fewest moves
+    def top_by_moves(self, n):
+        return heapq.nsmallest(n, self.iter_rows(), key=lambda row: (int(row[2]), float(row[3])))
+
+    # Method to get the scores played between two dates (YYYY-MM-DD, both included)
+    def scores_between(self, start_date, end_date):
+        return [row for row in self.iter_rows() if start_date <= row[4] <= end_date]
+
+    # Method to get the names of all players
+    def players(self):
+        # A dictionary keeps the order in which the players first appear
+        return list(dict.fromkeys(row[1] for row in self.iter_rows()))
+
+    # Method to get the average and best moves/time, for everyone or for one player
+    def summary(self, player_name=None):
+        if player_name is None:
+            return summarize_scores(self.iter_rows())
+        return summarize_scores(self.scores_for_player(player_name))
+
+    # Method to get a value that changes whenever the CSV file changes
+    def signature(self):
+        stat = os.stat(self.file_name)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    # Nothing to close for a CSV file
+    def close(self):
+        pass
+
+
+# Define the SQLiteScoreBackend class
+
+# This class stores the scores in a SQLite database
+# The database uses WAL mode so reading the history never blocks saving a new score,
+# and has indexes on player name, date, moves and time taken, so the history and stats screens
+# can ask for only the rows they show instead of reading every score.
+class SQLiteScoreBackend:
+    # Columns read for a score row, as text like the CSV rows, so both backends give the same rows
+    ROW_COLUMNS = "CAST(game_number AS TEXT), player_name, CAST(moves AS TEXT), printf('%.2f', time_taken), date, time"
+
+    def __init__(self, file_name="scores.db"):
+        # Initialize the file name
+        self.file_name = file_name
+        # Every thread has its own connection (see the connection property), so a thread reading the scores
+        # never runs inside the write transaction of the background writer thread
+        self.local = threading.local()
+        self.connections = []                       # All connections opened, to close them in close()
+        self.connections_lock = threading.Lock()
+        # Lock shared with the other processes, so the statistics cache is updated by one game at a time
+        self.lock = FileLock(file_name + ".lock")
+        # Create the table and indexes if they don't exist
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                "game_number INTEGER PRIMARY KEY, player_name TEXT NOT NULL, moves INTEGER NOT NULL, "
+                "time_taken REAL NOT NULL, date TEXT NOT NULL, time TEXT NOT NULL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS scores_player ON scores (player_name)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS scores_date ON scores (date, time)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS scores_moves ON scores (moves, time_taken)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS scores_time_taken ON scores (time_taken)")
+            # Count every change to the scores, so the signature doesn't have to count the rows
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self.connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('changes', 0)")
+            for action in ("INSERT", "UPDATE", "DELETE"):
+                self.connection.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS scores_{action.lower()} AFTER {action} ON scores "
+                    "BEGIN UPDATE meta SET value = value + 1 WHERE key = 'changes'; END")
+
+    # The database connection of the current thread (opened the first time the thread uses the database)
+    @property
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            # Open (or create) the database (waiting up to 30 seconds for other games that are writing)
+            # check_same_thread is off only so that close() can close the connections of other threads
+            connection = sqlite3.connect(self.file_name, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+            with self.connections_lock:
+                self.connections.append(connection)
+        return connection
+
+    # Helper to run a query and return rows in the same shape as the CSV rows
+    def _query(self, sql, parameters=()):
+        cursor = self.connection.execute(
+            "SELECT " + self.ROW_COLUMNS + " FROM scores " + sql,
+            parameters)
+        return [list(row) for row in cursor]
+
+    # Method to get the number of saved scores
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    # Method to get the game number of the next game
+    def next_game_number(self):
+        return self.connection.execute("SELECT COALESCE(MAX(game_number), 0) + 1 FROM scores").fetchone()[0]
+
+    # Method to append score rows to the database
+    # With fsync=True the rows are on the disk when the method returns (synchronous=FULL for this write)
+    def append_rows(self, rows, fsync=False):
+        self._write(lambda: rows, fsync)
+
+    # Method to add new scores, giving them the next game numbers
+    # scores are rows without the game number; returns the rows with their game numbers
+    def add_scores(self, scores, fsync=False):
+        def numbered_rows():
+            # Runs inside the write transaction, so no other game can take the same numbers
+            first = self.next_game_number()
+            return [[number] + list(score) for number, score in enumerate(scores, first)]
+        return self._write(numbered_rows, fsync)
+
+    # Helper to insert rows in one write transaction (BEGIN IMMEDIATE takes the write lock at the start)
+    def _write(self, make_rows, fsync):
+        with self.lock:
+            if fsync:
+                self.connection.execute("PRAGMA synchronous=FULL")
+            try:
+                self.connection.execute("BEGIN IMMEDIATE")
+                try:
+                    rows = make_rows()
+                    self.connection.executemany(
+                        "INSERT INTO scores (game_number, player_name, moves, time_taken, date, time) VALUES (?, ?, ?, ?, ?, ?)",
+                        [(int(row[0]), row[1], int(row[2]), float(row[3]), row[4], row[5]) for row in rows])
+                    self.connection.commit()
+                except BaseException:
+                    self.connection.rollback()
+                    raise
+            finally:
+                if fsync:
+                    self.connection.execute("PRAGMA synchronous=NORMAL")
+            return rows
+
+    # Method to go through all score rows one by one
+    def iter_rows(self):
+        cursor = self.connection.execute(
+            "SELECT " + self.ROW_COLUMNS + " FROM scores ORDER BY game_number")
+        for row in cursor:
+            yield list(row)
+
+    # Method to go through the score rows in lists of at most batch_size rows,
+    # keeping only the rows that match the filters (the filters are part of the query, so they can use the indexes)
+    def iter_batches(self, batch_size=10000, player_name=None, start_date=None, end_date=None):
+        conditions, parameters = [], []
+        for condition, value in (("player_name = ?", player_name), ("date >= ?", start_date), ("date <= ?", end_date)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        sql = ("SELECT " + self.ROW_COLUMNS + " FROM scores"
+               + (" WHERE " + " AND ".join(conditions) if conditions else "") + " ORDER BY game_number")
+        cursor = self.connection.execute(sql, parameters)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield [list(row) for row in batch]
+
+    # Method to read `limit` rows starting at row number `offset` (0 is the first score)
+    def read_rows(self, offset, limit):
+        return self._query("ORDER BY game_number LIMIT ? OFFSET ?", (limit, offset))
+
+    # Method to get the scores of one player
+    def scores_for_player(self, player_name):
+        return self._query("WHERE player_name = ? ORDER BY game_number", (player_name,))
+
+    # Method to get the n scores with the fewest moves
+    def top_by_moves(self, n):
+        return self._query("ORDER BY moves, time_taken LIMIT ?", (n,))
+
+    # Method to get the scores played between two dates (YYYY-MM-DD, both included)
+    def scores_between(self, start_date, end_date):
+        return self._query("WHERE date BETWEEN ? AND ? ORDER BY date, time", (start_date, end_date))
+
+    # Method to get the names of all players
+    def players(self):
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT player_name FROM scores")]
+
+    # Method to get the average and best moves/time, for everyone or for one player
+    def summary(self, player_name=None):
+        sql = "SELECT COUNT(*), AVG(moves), AVG(time_taken), MIN(moves), MIN(time_taken) FROM scores"
+        if player_name is None:
+            row = self.connection.execute(sql).fetchone()
+        else:
+            row = self.connection.execute(sql + " WHERE player_name = ?", (player_name,)).fetchone()
+        return {
+            'count': row[0],
+            'avg_moves': row[1] or 0.0,
+            'avg_time': row[2] or 0.0,
+            'best_moves': row[3] or 0.0,
+            'best_time': row[4] or 0.0,
+        }
+
+    # Method to get a value that changes whenever scores are added or removed
+    def signature(self):
+        # Both are single lookups (the change counter and the end of the primary key), whatever the number of rows
+        return list(self.connection.execute(
+            "SELECT (SELECT value FROM meta WHERE key = 'changes'), (SELECT COALESCE(MAX(game_number), 0) FROM scores)").fetchone())
+
+    # Method to close the database (the connections of all threads)
+    def close(self):
+        with self.connections_lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections.clear()
+        self.local = threading.local()
+
+
+# Helper to pick a backend from the file name (.db/.sqlite files use SQLite, everything else CSV)
+def open_backend(file_name):
+    if file_name.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteScoreBackend(file_name)
+    return CSVScoreBackend(file_name)
+
+
+# Define the RunningStats class
+
+# This class keeps the count, mean, minimum, maximum and variance of a stream of numbers
+# Adding a number is O(1): the mean and variance are updated with Welford's method,
+# so we never need to keep (or re-read) the numbers themselves
+class RunningStats:
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None):
+        self.count = count          # How many numbers were added
+        self.mean = mean            # Mean of the numbers
+        self.m2 = m2                # Sum of squared differences from the mean (for the variance)
+        self.minimum = minimum      # Smallest number
+        self.maximum = maximum      # Largest number
+
+    # Method to add one number
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    # Method to get the variance of the numbers
+    def variance(self):
+        return self.m2 / self.count if self.count else 0.0
+
+    # Methods to save and load the stats as a list (for the JSON cache file)
+    def to_list(self):
+        return [self.count, self.mean, self.m2, self.minimum, self.maximum]
+
+    @classmethod
+    def from_list(cls, values):
+        return cls(*values)
+
+
+# Define the ScoreStatsCache class
+
+# This class keeps running statistics of moves and time taken, for all games and for each player
+# It is saved to a JSON file next to the score file (e.g. scores.csv.stats) together with the
+# signature of the score file, so the cache is rebuilt if the score file was changed by someone else
+# Saving after a game doesn't write the whole file again: the new games are appended to a log
+# (e.g. scores.csv.stats.log) with the signatures before and after them, and the whole file is only
+# written again once the log has LOG_LIMIT entries
+class ScoreStatsCache:
+    # Number of log entries before the whole cache is written again
+    LOG_LIMIT = 1000
+
+    def __init__(self, file_name):
+        self.file_name = file_name      # The JSON file of the cache
+        self.log_file = file_name + ".log"
+        self.signature = None           # Signature of the score file the cache belongs to
+        self.total = {'moves': RunningStats(), 'time': RunningStats()}  # Stats of all games
+        self.players = {}               # Stats of each player
+        self.pending = []               # Games added since the last save, as (player name, moves, time taken)
+        self.log_entries = 0            # Number of entries in the log
+        self.log_position = 0           # Where the log entries not read yet start
+
+    # Method to load the cache from its file and log, returns True if it belongs to the given signature
+    def load(self, signature):
+        # When other games only added scores since we last looked, reading their log entries is enough
+        if self.signature is not None and self._read_log(self.signature, self.log_position) == signature:
+            self.signature = signature
+            return True
+        try:
+            with open(self.file_name, 'r') as file:
+                data = json.load(file)
+        except (IOError, ValueError):
+            return False
+        self.total = {key: RunningStats.from_list(values) for key, values in data['total'].items()}
+        self.players = {name: {key: RunningStats.from_list(values) for key, values in stats.items()}
+                        for name, stats in data['players'].items()}
+        # Add the games of the log entries that follow on from the saved file
+        self.log_entries = 0
+        current = self._read_log(data.get('signature'), 0)
+        self.pending = []
+        if current != signature:
+            self.signature = None
+            return False
+        self.signature = signature
+        return True
+
+    # Helper to add the games of the log entries from a position on that follow on from a signature
+    # Returns the signature the statistics belong to afterwards
+    def _read_log(self, current, position):
+        try:
+            with open(self.log_file, 'rb') as file:
+                file.seek(position)
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # An entry being written by another game (or a log that was started again)
+                    if entry['from'] == current:
+                        for player_name, moves, time_taken in entry['games']:
+                            self._add(player_name, moves, time_taken)
+                        current = entry['to']
+                    self.log_entries += 1
+                    position += len(line)
+                self.log_position = position
+        except IOError:
+            pass
+        return current
+
+    # Method to save the cache: the games added since the last save go to the log,
+    # the whole cache is only written when there is no saved cache to follow on from or the log is full
+    def save(self, signature):
+        previous, self.signature = self.signature, signature
+        games, self.pending = self.pending, []
+        if previous is not None and self.log_entries < self.LOG_LIMIT:
+            try:
+                with open(self.log_file, 'ab') as file:
+                    file.write(json.dumps({'from': previous, 'to': signature, 'games': games}).encode() + b"\n")
+                    self.log_position = file.tell()
+                self.log_entries += 1
+                return
+            except IOError as e:
+                print(f"Error saving statistics: {e}")
+        data = {
+            'signature': signature,
+            'total': {key: stats.to_list() for key, stats in self.total.items()},
+            'players': {name: {key: value.to_list() for key, value in stats.items()}
+                        for name, stats in self.players.items()},
+        }
+        try:
+            # Write to a temporary file first and then replace the old one
+            temp_file = f"{self.file_name}.{os.getpid()}.tmp"
+            with open(temp_file, 'w') as file:
+                json.dump(data, file)
+            os.replace(temp_file, self.file_name)
+            # The log entries are in the saved file now
+            if os.path.exists(self.log_file):
+                os.remove(self.log_file)
+            self.log_entries = 0
+            self.log_position = 0
         except IOError as e:
+            print(f"Error saving statistics: {e}")
+
+    # Method to add one game to the statistics (it is written to the log at the next save)
+    def add(self, player_name, moves, time_taken):
+        self._add(player_name, moves, time_taken)
+        self.pending.append((player_name, moves, time_taken))
+
+    # Helper to add one game to the statistics only
+    def _add(self, player_name, moves, time_taken):
+        if player_name not in self.players:
+            self.players[player_name] = {'moves': RunningStats(), 'time': RunningStats()}
+        for stats in (self.total, self.players[player_name]):
+            stats['moves'].add(float(moves))
+            stats['time'].add(float(time_taken))
+
+    # Method to rebuild the statistics from all score rows
+    def rebuild(self, rows, signature):
+        self.total = {'moves': RunningStats(), 'time': RunningStats()}
+        self.players = {}
+        for row in rows:
+            self._add(row[1], row[2], row[3])
+        # Write the whole cache (not a log entry)
+        self.pending = []
+        self.signature = None
+        self.save(signature)
+
+    # Method to get the average, best and worst moves/time, for everyone or for one player
+    def summary(self, player_name=None):
+        stats = self.total if player_name is None else self.players.get(player_name)
+        if stats is None:
+            stats = {'moves': RunningStats(), 'time': RunningStats()}
+        moves, time_taken = stats['moves'], stats['time']
+        return {
+            'count': moves.count,
+            'avg_moves': moves.mean,
+            'avg_time': time_taken.mean,
+            'best_moves': moves.minimum or 0.0,
+            'best_time': time_taken.minimum or 0.0,
+            'worst_moves': moves.maximum or 0.0,
+            'worst_time': time_taken.maximum or 0.0,
+            'std_moves': math.sqrt(moves.variance()),
+            'std_time': math.sqrt(time_taken.variance()),
+        }
+
+
+# Define the ScoreManager class
+
+# This class will handle saving and retrieving scores
+# It will save the player name, number of moves, time taken, date, and time for each game
+# The actual storage is done by a backend: CSVScoreBackend (the default) or SQLiteScoreBackend
+# Every backend has the same methods (count, next_game_number, append_rows, iter_rows, iter_batches, read_rows,
+# scores_for_player, top_by_moves, scores_between, players, summary, signature and close)
+# To go through a long history without loading it all, use iter_scores (typed ScoreRecords, read in batches)
+# For analysis with NumPy/pandas, get_archive gives a columnar, memory-mapped copy of the scores (scores.csv.archive)
+# The player statistics are kept up to date in a ScoreStatsCache, so the stats screen
+# does not have to read the scores at all
+
+# The ScoreManager class will have the following methods:
+class ScoreManager:
+    def __init__(self, file_name="scores.csv", backend=None):
+        # Use the given backend, or pick one from the file name
+        self.backend = backend if backend is not None else open_backend(file_name)
+        # Initialize the file name
+        self.file_name = self.backend.file_name
+        # Initialize the statistics cache (loaded the first time it is needed)
+        self.stats = ScoreStatsCache(self.file_name + ".stats")
+
+    # Method to make sure the statistics cache matches the scores, rebuilding it if needed
+    def _current_stats(self):
+        signature = self.backend.signature()
+        if self.stats.signature != signature and not self.stats.load(signature):
+            self.stats.rebuild(self.backend.iter_rows(), signature)
+        return self.stats
+
+    # Method to get the number of saved scores
+    def count_scores(self):
+        return self.backend.count()
+
+    # Method to save the score of a game, returns its game number (None if it could not be saved)
+    @PROFILER.timed("save_score")
+    def save_score(self, player_name, moves, time_taken):
+        # Exception handling for appending to the file
+        try:
+            return self.save_scores([(player_name, moves, time_taken)])[0]
+        except (IOError, sqlite3.Error) as e:
             print(f"Error appending to file: {e}")
+            return None
+
+    # Method to save the scores of several games in one write, returns their game numbers
+    # scores is a list of (player name, moves, time taken) or (player name, moves, time taken, date and time played)
+    # Other games sharing the file wait for the lock, so the game numbers are always new
+    @PROFILER.timed("save_scores")
+    def save_scores(self, scores, fsync=False):
+        rows = []
+        for player_name, moves, time_taken, *played_at in scores:
+            # Get the time the game was played (now if it is not given)
+            current_time = played_at[0] if played_at else datetime.now()
+            # Format time taken to 2 decimal places
+            rows.append([player_name, moves, f"{time_taken:.2f}", current_time.strftime("%Y-%m-%d"), current_time.strftime("%H:%M:%S")])
+        with self.backend.lock:
+            # Make sure the statistics are up to date before adding to them
+            stats = self._current_stats()
+            # Write the new score entries, the backend gives them the next game numbers
+            rows = self.backend.add_scores(rows, fsync)
+            # Add the games to the statistics
+            for row in rows:
+                stats.add(row[1], row[2], row[3])
+            stats.save(self.backend.signature())
+        return [row[0] for row in rows]
 
-    # Method to get all scores from the CSV file
+    # Method to get all scores
     def get_scores(self):
         # Exception handling for reading the file
         try:
-            with open(self.file_name, 'r') as file: # Open the file in read mode
-                reader = csv.reader(file)
-                # Skip the header
-                next(reader)
-                # Return all score records
-                return list(reader)
-        except IOError as e:
+            # Return all score records
+            return list(self.backend.iter_rows())
+        except (IOError, sqlite3.Error) as e:
             print(f"Error reading file: {e}")
             # Return an empty list if there is an error
-            return [] 
+            return []
+
+    # Method to go through the scores in lists of at most batch_size ScoreRecords
+    # The filters (player name, first and last date as YYYY-MM-DD) are applied while reading,
+    # so only the matching scores are converted and only one batch is in memory at a time
+    def iter_score_batches(self, batch_size=10000, player_name=None, start_date=None, end_date=None):
+        for batch in self.backend.iter_batches(batch_size, player_name, start_date, end_date):
+            yield [ScoreRecord.from_row(row) for row in batch]
+
+    # Method to go through the scores one ScoreRecord at a time (see iter_score_batches)
+    def iter_scores(self, batch_size=10000, player_name=None, start_date=None, end_date=None):
+        for batch in self.iter_score_batches(batch_size, player_name, start_date, end_date):
+            yield from batch
+
+    # Method to get one page of scores (used by the history screen)
+    def get_scores_page(self, offset, limit):
+        # Exception handling for reading the file
+        try:
+            return self.backend.read_rows(offset, limit)
+        except (IOError, sqlite3.Error) as e:
+            print(f"Error reading file: {e}")
+            return []
+
+    # Method to get the scores of one player
+    def get_player_scores(self, player_name):
+        return self.backend.scores_for_player(player_name)
+
+    # Method to get the n scores with the fewest moves
+    def get_top_scores(self, n=10):
+        return self.backend.top_by_moves(n)
+
+    # Method to get the scores played between two dates (YYYY-MM-DD, both included)
+    def get_scores_between(self, start_date, end_date):
+        return self.backend.scores_between(start_date, end_date)
+
+    # Method to get the names of all players
+    def get_players(self):
+        return list(self._current_stats().players)
+
+    # Method to get the average and best moves/time, for everyone or for one player
+    def get_summary(self, player_name=None):
+        return self._current_stats().summary(player_name)
+
+    # Method to write the columnar archive of the scores (only the scores added since the last time are read)
+    # Returns the number of scores in the archive
+    def compact_archive(self, batch_size=10000):
+        return ScoreArchive.compact(self.file_name + ".archive", self.backend, batch_size)
+
+    # Method to get the columnar archive of the scores, updating it first if there are new scores (or the scores were rewritten)
+    # Close the archive when done (or use it in a with block)
+    def get_archive(self):
+        archive_file = self.file_name + ".archive"
+        if os.path.exists(archive_file):
+            archive = ScoreArchive(archive_file)
+            if len(archive) == self.count_scores() and archive.matches(self.backend):
+                return archive
+            archive.close()
+        self.compact_archive()
+        return ScoreArchive(archive_file)
+
+    # Method to copy all scores into another ScoreManager (for example from CSV to SQLite)
+    # The game numbers are kept as they are, so the other file must not have any scores yet (ValueError otherwise)
+    def export_to(self, other, batch_size=10000):
+        copied = 0
+        # Hold the lock of the other file, so no game adds a score to it while the scores are copied
+        with other.backend.lock:
+            existing = other.count_scores()
+            if existing:
+                raise ValueError(f"{other.file_name} already has {existing} scores, the scores can only be copied into an empty file")
+            for batch in self.backend.iter_batches(batch_size):
+                other.backend.append_rows(batch)
+                copied += len(batch)
+        return copied
+
+    # Method to copy all scores from another ScoreManager into this one
+    def import_from(self, other, batch_size=10000):
+        return other.export_to(self, batch_size)
+
+    # Method to close the backend
+    def close(self):
+        self.backend.close()
+
+
+# Define the ScoreJournal class
+
+# A journal of the scores waiting in a ScoreWriteQueue, so they are not lost if the game crashes (or is killed)
+# before the background thread saved them. Every game has its own journal next to the score file
+# (scores.csv.journal.<process id>-<random>), locked while the game runs. A journal whose game is not
+# running any more is replayed by the next game that opens the score file (see recover_journals).
+# Each line is a JSON object: a queued score with its unique id, or the ids of scores that were saved.
+class ScoreJournal:
+    def __init__(self, score_file):
+        self.file_name = f"{score_file}.journal.{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lock = FileLock(self.file_name + ".lock")
+        self.lock.acquire()  # Held until close(), so other games know this journal is in use
+        self.file = open(self.file_name, 'a', encoding='utf-8')
+        self.write_lock = threading.Lock()  # The game and the background thread both write lines
+        self.pending = 0                    # Number of scores in the journal that are not saved yet
+
+    # Method to add a queued score (written to the system straight away, so a crash of the game doesn't lose it)
+    def add(self, score_id, player_name, moves, time_taken, played_at):
+        self._write({'id': score_id, 'player_name': player_name, 'moves': moves,
+                     'time_taken': time_taken, 'played_at': played_at.isoformat()}, 1)
+
+    # Method to note that some queued scores were saved
+    def done(self, score_ids):
+        self._write({'done': list(score_ids)}, -len(score_ids))
+
+    # Helper to write a line
+    def _write(self, entry, pending):
+        with self.write_lock:
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+            self.pending += pending
+
+    # Method to close the journal, it is deleted if every score in it was saved
+    def close(self):
+        with self.write_lock:
+            if self.file.closed:
+                return
+            self.file.close()
+            if self.pending == 0:
+                os.remove(self.file_name)
+        self.lock.release()
+        if self.pending == 0:
+            try:
+                os.remove(self.lock.file_name)
+            except OSError:
+                pass  # Another game is just looking at it, it deletes it
+
+
+# Helper to read the scores of a journal that were not saved, as (id, player name, moves, time taken, played at)
+# A line cut short by a crash is skipped
+def read_journal(file_name):
+    scores, saved = {}, set()
+    with open(file_name, 'r', encoding='utf-8') as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+                if 'done' in entry:
+                    saved.update(entry['done'])
+                else:
+                    scores[entry['id']] = (entry['id'], entry['player_name'], entry['moves'], entry['time_taken'],
+                                           datetime.fromisoformat(entry['played_at']))
+            except (ValueError, KeyError, TypeError):
+                continue
+    return [score for score_id, score in scores.items() if score_id not in saved]
+
+
+# Helper to save the scores left in the journals of games that stopped before saving them
+# Scores that are already in the score file (the game stopped between saving them and writing "done") are skipped
+# Returns the number of scores saved
+def recover_journals(manager, skip=()):
+    recovered = 0
+    with manager.backend.lock:
+        for journal_file in sorted(glob.glob(glob.escape(manager.file_name) + ".journal.*")):
+            if journal_file.endswith(".lock") or journal_file in skip:
+                continue
+            lock = FileLock(journal_file + ".lock")
+            if not lock.acquire(blocking=False):
+                continue  # That game is still running
+            try:
+                scores = read_journal(journal_file)
+                if scores:
+                    # Look for the scores in the rows of the same days
+                    dates = [played_at.strftime("%Y-%m-%d") for *_, played_at in scores]
+                    saved = {(row[1], int(row[2]), f"{float(row[3]):.2f}", row[4], row[5])
+                             for row in manager.backend.scores_between(min(dates), max(dates))}
+                    scores = [score for score in scores
+                              if (score[1], int(score[2]), f"{score[3]:.2f}", score[4].strftime("%Y-%m-%d"),
+                                  score[4].strftime("%H:%M:%S")) not in saved]
+                    manager.save_scores([score[1:] for score in scores], fsync=True)
+                    recovered += len(scores)
+                os.remove(journal_file)
+            except (IOError, sqlite3.Error) as e:
+                print(f"Error recovering scores from {journal_file}: {e}")
+            finally:
+                lock.release()
+                try:
+                    os.remove(lock.file_name)
+                except OSError:
+                    pass
+    return recovered
+
+
+# Define the ScoreWriteQueue class
+
+# Write-behind queue for scores: put() returns straight away and a background thread saves the scores,
+# so a slow disk never holds up the game.
+# Scores that arrive close together (within max_delay seconds, up to batch_size of them) are saved
+# with one locked, fsync'd append (group commit), which is much cheaper than one fsync per score.
+# With journal=True the queued scores are also written to a ScoreJournal, and the thread first saves
+# the scores that earlier games queued but never saved.
+# put() can be given a callback, which the background thread calls with the game number (None if saving failed).
+class ScoreWriteQueue:
+    def __init__(self, manager, batch_size=32, max_delay=0.2, journal=False):
+        self.manager = manager          # The ScoreManager the scores are saved with
+        self.batch_size = batch_size    # Largest number of scores saved in one write
+        self.max_delay = max_delay      # Longest time (seconds) a score waits for others to join its batch
+        self.journal = ScoreJournal(manager.file_name) if journal else None
+        self.queue = queue.Queue()
+        self.batches = 0                # Number of writes done
+        self.saved = 0                  # Number of scores saved
+        self.recovered = 0              # Number of scores saved from the journals of earlier games
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # Method to queue the score of a game (the time it was played is taken now)
+    def put(self, player_name, moves, time_taken, callback=None):
+        score_id, played_at = uuid.uuid4().hex, datetime.now()
+        if self.journal is not None:
+            try:
+                self.journal.add(score_id, player_name, moves, time_taken, played_at)
+            except IOError as e:
+                print(f"Error writing the score journal: {e}")
+        self.queue.put((score_id, player_name, moves, time_taken, played_at, callback))
+
+    # Method run by the background thread
+    def run(self):
+        if self.journal is not None:
+            try:
+                self.recovered = recover_journals(self.manager, skip=(self.journal.file_name,))
+            except Exception as e:  # The thread must keep going, the scores stay in the journals
+                print(f"Error recovering scores: {e}")
+        stopping = False
+        while not stopping:
+            score = self.queue.get()
+            if score is None:
+                self.queue.task_done()
+                break
+            batch = [score]
+            # Wait a little for more scores to save them together
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                try:
+                    score = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if score is None:
+                    self.queue.task_done()
+                    stopping = True
+                    break
+                batch.append(score)
+            self.write(batch)
+
+    # Method to save a batch of scores
+    def write(self, batch):
+        game_numbers = [None] * len(batch)
+        try:
+            with self.manager.backend.lock:
+                game_numbers = self.manager.save_scores([score[1:5] for score in batch], fsync=True)
+                # Written while still holding the lock, so a game recovering the journal sees the scores saved
+                if self.journal is not None:
+                    self.journal.done([score[0] for score in batch])
+            self.batches += 1
+            self.saved += len(batch)
+        except Exception as e:  # Any error: the thread must keep going (the scores stay in the journal)
+            print(f"Error appending to file: {e}")
+        finally:
+            for score, game_number in zip(batch, game_numbers):
+                try:
+                    if score[5] is not None:
+                        score[5](game_number)
+                except Exception as e:
+                    print(f"Error in score callback: {e}")
+                finally:
+                    self.queue.task_done()
+
+    # Method to wait until every queued score is handled (saved or failed)
+    # Returns False if that takes longer than timeout seconds (None waits as long as needed)
+    def flush(self, timeout=None):
+        with self.queue.all_tasks_done:
+            return self.queue.all_tasks_done.wait_for(lambda: not self.queue.unfinished_tasks, timeout)
+
+    # Method to save the queued scores and stop the thread, waiting at most timeout seconds (None waits as long as needed)
+    # Scores that could not be saved stay in the journal and are saved by the next game. If the thread is still
+    # writing after timeout (a stalled disk or a lock held by another game), the journal is left locked until
+    # this game exits, and the next game saves what is left in it (see recover_journals)
+    # Returns False if the thread did not finish in time
+    def close(self, timeout=None):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                print(f"Scores still being saved after {timeout} seconds, the next game will save them from the journal")
+                return False
+        if self.journal is not None:
+            self.journal.close()
+        return True
+
+
+# Run "python file_manager.py migrate [scores.csv]" to build the index of an existing score file
+# Run "python file_manager.py convert scores.csv scores.db" to copy scores between backends
+# Run "python file_manager.py compact [scores.csv]" to write the columnar archive of the scores
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
+        file_name = sys.argv[2] if len(sys.argv) > 2 else "scores.csv"
+        # Don't create an empty score file if the name is wrong
+        if not os.path.exists(file_name):
+            print(f"Error: {file_name} does not exist")
+            sys.exit(1)
+        backend = CSVScoreBackend(file_name)
+        print(f"Indexed {backend.rebuild_index()} scores in {backend.file_name}")
+    elif len(sys.argv) == 4 and sys.argv[1] == "convert":
+        if not os.path.exists(sys.argv[2]):
+            print(f"Error: {sys.argv[2]} does not exist")
+            sys.exit(1)
+        source, target = ScoreManager(sys.argv[2]), ScoreManager(sys.argv[3])
+        try:
+            print(f"Copied {source.export_to(target)} scores from {source.file_name} to {target.file_name}")
+        except (IOError, ValueError, sqlite3.Error) as e:
+            print(f"Error copying scores: {e}")
+            sys.exit(1)
+        finally:
+            source.close()
+            target.close()
+    elif len(sys.argv) >= 2 and sys.argv[1] == "compact":
+        manager = ScoreManager(sys.argv[2] if len(sys.argv) > 2 else "scores.csv")
+        print(f"Archived {manager.compact_archive()} scores in {manager.file_name}.archive")
+        manager.close()
+    else:
+        print("Usage: python file_manager.py migrate [scores.csv]")
+        print("       python file_manager.py convert <from file> <to file>")
+        print("       python file_manager.py compact [scores.csv]")
@@ -1,5 +1,74 @@
 import random   # Import the random module to shuffle the symbols(letters) for the game
-import time     # Import the time module to add a delay when flipping unmatched tiles
+import time     # Import the time module to know when unmatched tiles should be hidden again
+from array import array  # Import the array module to store the board compactly
+
+# Define the clock classes
+
+# The game never waits (sleeps) by itself. When two tiles don't match, it remembers when they
+# should be hidden again (a deadline), and whoever drives the game (the UI or a headless simulation)
+# calls advance() once that time has come. The game asks a clock what time it is:
+# SystemClock uses the real time, VirtualClock only moves when it is told to,
+# so simulations can play many games without waiting.
+class SystemClock:
+    # Method to get the current time in seconds
+    def now(self):
+        return time.monotonic()
+
+
+class VirtualClock:
+    def __init__(self, start=0.0):
+        self.time = start   # The current (virtual) time in seconds
+
+    # Method to get the current time in seconds
+    def now(self):
+        return self.time
+
+    # Method to move the clock forward
+    def advance(self, seconds):
+        self.time += seconds
+
+
+# Define the ChangeSet class
+
+# A ChangeSet describes what changed on the board after one action of the game
+# revealed: list of (row, column, symbol) of the cards that were turned face up
+# hidden:   list of (row, column) of the cards that were turned face down again
+# matched:  list of pairs of cells ((row, column), (row, column)) that were matched
+# finished: True if this action finished the game
+# moves:    number of moves made so far
+class ChangeSet:
+    def __init__(self, revealed=(), hidden=(), matched=(), finished=False, moves=0):
+        self.revealed = list(revealed)
+        self.hidden = list(hidden)
+        self.matched = list(matched)
+        self.finished = finished
+        self.moves = moves
+
+    # Method to get all cells that changed
+    def cells(self):
+        return [(i, j) for i, j, _ in self.revealed] + list(self.hidden)
+
+    def __repr__(self):
+        return (f"ChangeSet(revealed={self.revealed}, hidden={self.hidden}, matched={self.matched}, "
+                f"finished={self.finished}, moves={self.moves})")
+
+
+# Names of the symbols worked out so far (shared by all games)
+SYMBOL_LABELS = []
+
+
+# Helper to get the name of a symbol from its number: 0 -> 'A', 25 -> 'Z', 26 -> 'AA', 27 -> 'AB', ...
+# (like spreadsheet columns), so there is a name for any number of symbols
+def symbol_label(symbol):
+    while len(SYMBOL_LABELS) <= symbol:
+        number = len(SYMBOL_LABELS) + 1
+        label = ''
+        while number:
+            number, remainder = divmod(number - 1, 26)
+            label = chr(ord('A') + remainder) + label
+        SYMBOL_LABELS.append(label)
+    return SYMBOL_LABELS[symbol]
+
 
 # Define the MemoryGame class
 
@@ -7,90 +76,186 @@ import time     # Import the time module to add a delay when flipping unmatched
 # It will keep track of the game board, the moves made, and the state of the game
 # It will also handle flipping tiles, checking for matches, and determining when the game is over
 # The game board will consist of symbols that need to be matched
-# The answer board will contain the correct matches
-# The flipped_tiles list will track which tiles are currently flipped
+
+# To support big boards (e.g. 32x32 or 100x100) the board is stored compactly:
+# the symbols are numbers (0, 1, 2, ...) kept in one flat array with one entry per tile
+# (tile (i, j) is at position i * grid_size + j), and which tiles are flipped or matched is kept
+# in bitsets (one bit per tile in a bytearray). Any square board with an even number of tiles works,
+# with as many symbols as needed. The symbol numbers are shown as names 'A', 'B', ... (symbol_label).
+# The old list-of-lists views (board, answer_board, flipped_tiles) are still available as properties.
+
 # The is_processing flag will be used to prevent multiple moves from being made simultaneously
+# When two tiles don't match they stay visible until hide_deadline, and advance() hides them
+# Listeners (the UI, recorders, bots) can subscribe to the game: every flip, match and reset
+# sends them a ChangeSet, so they don't have to read the whole board to find out what changed
+# The number of matched pairs is counted, so checking if the game is over doesn't scan the board
 
 # The MemoryGame class will have the following methods:
 class MemoryGame:
-    def __init__(self, grid_size=4):        # Initialize the game with a default grid size of 4x4
+    def __init__(self, grid_size=4, clock=None, hide_delay=0.5, rng=None, symbols=None):  # Initialize the game with a default grid size of 4x4
+        # The board needs an even number of tiles to be made of pairs
+        if grid_size < 1 or (grid_size * grid_size) % 2:
+            raise ValueError(f"A {grid_size}x{grid_size} board does not have an even number of tiles")
         self.grid_size = grid_size          # Set the size of the game grid
+        self.rng = rng or random            # Random number generator used to shuffle the board (e.g. random.Random(seed))
+        self.clock = clock or SystemClock() # Clock used for the delay before unmatched tiles are hidden
+        self.hide_delay = hide_delay        # Time (seconds) unmatched tiles stay visible
+        self.hide_deadline = None           # Time at which the unmatched tiles should be hidden (None if there are none)
         self.moves = 0                      # Initialize the number of moves made
         self.first_click = None             # Track the first card clicked
         self.second_click = None            # Track the second card clicked
-        self.board = []                     # Initialize the game board
-        self.answer_board = []              # Initialize the answer board with correct matches
-        self.flipped_tiles = []             # Track which tiles are currently flipped
+        self.symbols = array('I')           # Symbol number of every tile (the answer board)
+        self.flipped = bytearray()          # Bitset of the tiles that are face up
+        self.matched = bytearray()          # Bitset of the tiles that have been matched
         self.is_processing = False          # Flag to check if the game is currently processing a move
+        self.num_pairs = 0                  # Number of pairs on the board
+        self.matched_pairs = 0              # Number of pairs found so far
+        self.listeners = []                 # Functions called with a ChangeSet after every change
 
-        self.create_board()                 # Call the method to create the game board
+        if symbols is None:
+            self.create_board()             # Call the method to create the game board
+        else:
+            self.set_symbols(symbols)       # Use the given board (e.g. a replayed deal)
 
     # Method to create the game board
     def create_board(self):
         # Calculate the number of pairs needed for the game
         num_pairs = (self.grid_size * self.grid_size) // 2
-        # Select symbols for the game board
-        symbols = list('ABCDEFGH')[:num_pairs] * 2
+        # Select symbols for the game board (every symbol number twice)
+        symbols = list(range(num_pairs)) * 2
         # Shuffle the symbols to randomize their positions every new game
-        random.shuffle(symbols)
-
-        # Create the answer board with the shuffled symbols
-        self.answer_board = [symbols[i:i + self.grid_size] for i in range(0, len(symbols), self.grid_size)]
-        # Initialize the game board with empty strings
-        self.board = [['' for _ in range(self.grid_size)] for _ in range(self.grid_size)]
-        # Initialize the flipped tiles tracker with all tiles initially unflipped
-        self.flipped_tiles = [[False for _ in range(self.grid_size)] for _ in range(self.grid_size)]
-        # Reset moves and click trackers
+        self.rng.shuffle(symbols)
+        self.set_symbols(symbols)
+
+    # Method to put the given symbol numbers (one per tile, row by row) on the board and reset the game
+    def set_symbols(self, symbols):
+        tiles = self.grid_size * self.grid_size
+        num_pairs = tiles // 2
+        # Two bytes per tile are enough for up to 65536 symbols
+        self.symbols = array('H' if num_pairs <= 65536 else 'I', symbols)
+        if len(self.symbols) != tiles:
+            raise ValueError(f"Expected {tiles} symbols, got {len(self.symbols)}")
+        symbol_label(num_pairs - 1)  # Make sure every symbol has a name
+        # Initialize the bitsets with all tiles face down and unmatched
+        self.flipped = bytearray((tiles + 7) // 8)
+        self.matched = bytearray((tiles + 7) // 8)
+        # Reset moves, matched pairs and click trackers
+        self.num_pairs = num_pairs
+        self.matched_pairs = 0
         self.moves = 0
         self.first_click = None
         self.second_click = None
+        self.hide_deadline = None
+        self.is_processing = False
+
+    # Methods to read and change one bit of a bitset (k is the position of the tile)
+    @staticmethod
+    def get_bit(bits, k):
+        return bits[k >> 3] >> (k & 7) & 1
+
+    @staticmethod
+    def set_bit(bits, k, value):
+        if value:
+            bits[k >> 3] |= 1 << (k & 7)
+        else:
+            bits[k >> 3] &= ~(1 << (k & 7))
+
+    # Method to get the symbol number of a tile
+    def symbol_at(self, i, j):
+        return self.symbols[i * self.grid_size + j]
+
+    # Method to check if a tile is face up
+    def is_flipped(self, i, j):
+        return bool(self.get_bit(self.flipped, i * self.grid_size + j))
+
+    # Method to check if a tile has been matched
+    def is_matched(self, i, j):
+        return bool(self.get_bit(self.matched, i * self.grid_size + j))
+
+    # List-of-lists views of the board (built when asked for, so avoid them on big boards)
+    @property
+    def answer_board(self):
+        n = self.grid_size
+        return [[SYMBOL_LABELS[self.symbols[i * n + j]] for j in range(n)] for i in range(n)]
+
+    @property
+    def flipped_tiles(self):
+        n = self.grid_size
+        return [[self.get_bit(self.flipped, i * n + j) == 1 for j in range(n)] for i in range(n)]
+
+    @property
+    def board(self):
+        n = self.grid_size
+        return [[SYMBOL_LABELS[self.symbols[i * n + j]] if self.get_bit(self.flipped, i * n + j) else ''
+                 for j in range(n)] for i in range(n)]
+
+    # Method to subscribe a listener, which will be called with a ChangeSet after every change
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    # Method to unsubscribe a listener
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    # Method to send a ChangeSet to all listeners
+    def emit(self, changes):
+        for listener in self.listeners:
+            listener(changes)
 
     # Method to get the current state of the game board
     def get_board(self):
         return self.board  # Return the current state of the game board
 
     # Method to flip a card at a given position
+    # (this runs on every click, so the bit operations are written out here instead of calling get_bit/set_bit)
     def flip_card(self, i, j):
         # Check if the click is within the grid boundaries
-        if i < 0 or j < 0 or i >= self.grid_size or j >= self.grid_size:
+        n = self.grid_size
+        if i < 0 or j < 0 or i >= n or j >= n:
             return False  # Return False if the click is out of bounds
 
         # Check if the game is currently processing a move
         if self.is_processing:
             return False  # Return False if the game is processing
 
-        # Check if the tile is already flipped
-        if self.flipped_tiles[i][j]:
+        # Check if the tile is already flipped (byte k >> 3 of the bitset, bit k & 7)
+        k = i * n + j
+        flipped = self.flipped
+        byte, bit = k >> 3, 1 << (k & 7)
+        if flipped[byte] & bit:
             return False  # Return False if the tile is already flipped
 
         # If no tile is currently flipped, flip the first tile
         if self.first_click is None:
             self.first_click = (i, j)  # Record the first click
-            self.board[i][j] = self.answer_board[i][j]  # Reveal the symbol on the first click
-            self.flipped_tiles[i][j] = True  # Mark the first tile as flipped
-            return True  # Return True to indicate a successful flip
-
         # If a tile is already flipped, flip the second tile
         elif self.second_click is None:
             self.second_click = (i, j)  # Record the second click
-            self.board[i][j] = self.answer_board[i][j]  # Reveal the symbol on the second click
-            self.flipped_tiles[i][j] = True  # Mark the second tile as flipped
-            return True  # Return True to indicate a successful flip
+        else:
+            return False  # Both tiles of this turn are already flipped
+
+        flipped[byte] |= bit  # Mark the tile as flipped (this reveals its symbol)
+        if self.listeners:  # Only build a ChangeSet if someone is listening
+            self.emit(ChangeSet(revealed=[(i, j, SYMBOL_LABELS[self.symbols[k]])], moves=self.moves))
+        return True  # Return True to indicate a successful flip
 
     # Method to reset the first and second clicks and hide the symbols
     def reset_pair(self):
         # Reset the first and second clicks
         i1, j1 = self.first_click
         i2, j2 = self.second_click
-        # Hide the symbols on the first and second clicks
-        self.board[i1][j1] = ''
-        self.board[i2][j2] = ''
-        # Mark the first and second tiles as unflipped
-        self.flipped_tiles[i1][j1] = False
-        self.flipped_tiles[i2][j2] = False
+        # Mark the first and second tiles as unflipped (this hides their symbols)
+        n = self.grid_size
+        flipped = self.flipped
+        k1 = i1 * n + j1
+        k2 = i2 * n + j2
+        flipped[k1 >> 3] &= ~(1 << (k1 & 7))
+        flipped[k2 >> 3] &= ~(1 << (k2 & 7))
         # Reset the first and second click trackers
         self.first_click = None
         self.second_click = None
+        if self.listeners:  # Only build a ChangeSet if someone is listening
+            self.emit(ChangeSet(hidden=[(i1, j1), (i2, j2)], moves=self.moves))
 
     # Method to get the total number of moves made
     def get_moves(self):
@@ -101,34 +266,55 @@ class MemoryGame:
         # Get the positions of the first and second clicks
         i1, j1 = self.first_click
         i2, j2 = self.second_click
+        k1 = i1 * self.grid_size + j1
+        k2 = i2 * self.grid_size + j2
 
         # Set the game processing flag to True
         self.is_processing = True
         # Check if the symbols on the first and second clicks match
-        if self.answer_board[i1][j1] == self.answer_board[i2][j2]:
-            # If they match, reset the first and second clicks
+        if self.symbols[k1] == self.symbols[k2]:
+            # If they match, mark both tiles as matched and reset the first and second clicks
+            self.set_bit(self.matched, k1, True)
+            self.set_bit(self.matched, k2, True)
             self.first_click = None
             self.second_click = None
-            # Increment the moves counter
+            # Increment the moves and matched pairs counters
             self.moves += 1
+            self.matched_pairs += 1
             # Set the game processing flag to False
             self.is_processing = False
+            if self.listeners:  # Only build a ChangeSet if someone is listening
+                self.emit(ChangeSet(matched=[((i1, j1), (i2, j2))], finished=self.is_game_over(), moves=self.moves))
             return True  # Return True to indicate a match
         else:
             # If they don't match, increment the moves counter
             self.moves += 1
-            # Wait for a short time (0.5s) before resetting the pair
-            time.sleep(0.5)
-            # Reset the pair
-            self.reset_pair()
-            # Set the game processing flag to False
-            self.is_processing = False
+            # The pair stays visible for a short time (0.5s); advance() hides it after that
+            # The game processing flag stays True until then, so no other tile can be flipped
+            self.hide_deadline = self.clock.now() + self.hide_delay
+            if self.listeners:  # Only build a ChangeSet if someone is listening (only the moves changed)
+                self.emit(ChangeSet(moves=self.moves))
             return False  # Return False to indicate no match
 
+    # Method to get the number of seconds until the unmatched pair is hidden (0 if there is nothing to hide)
+    def time_until_hide(self):
+        if self.hide_deadline is None:
+            return 0.0
+        return max(0.0, self.hide_deadline - self.clock.now())
+
+    # Method to hide the unmatched pair once its deadline has passed
+    # Returns True if the pair was hidden
+    def advance(self):
+        if self.hide_deadline is None or self.clock.now() < self.hide_deadline:
+            return False
+        self.hide_deadline = None
+        # Reset the pair
+        self.reset_pair()
+        # Set the game processing flag to False
+        self.is_processing = False
+        return True
+
     # Method to check if the game is over
     def is_game_over(self):
-        # Check if all tiles have been flipped
-        for row in self.flipped_tiles:
-            if False in row:
-                return False  # Return False if any tile is unflipped
-        return True  # Return True if all tiles are flipped, indicating the game is over
+        # The game is over when all pairs have been matched
+        return self.matched_pairs == self.num_pairs
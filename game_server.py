@@ -0,0 +1,397 @@
+# Memory Game server.
+# Runs many games (e.g. one per classroom seat) in one process that decides every flip, instead of one
+# Tk app per machine. Clients talk to it over TCP or a Unix socket with JSON lines: one JSON object per
+# line for every request, answered by one JSON object per line, in the same order.
+#
+# Requests (an optional "id" is sent back in the answer, so many sessions can share one connection):
+#   {"op": "new", "grid": 4, "player": "Ann"}                 start a game (optional "seed", "hide_delay")
+#   {"op": "flip", "session": "...", "row": 0, "col": 1}      flip a card, the answer has what changed
+#   {"op": "state", "session": "..."}                         the whole board (to draw it again after reconnecting)
+#   {"op": "finish", "session": "..."}                        end the game (the score is saved if it was finished)
+# Every answer has "ok"; failed requests have "error". Flip answers hold the changes since the last answer:
+#   revealed [[row, col, symbol], ...], hidden [[row, col], ...], matched [[[row, col], [row, col]], ...],
+#   first (the card waiting for its pair, or null), moves, finished.
+# The server checks a pair as soon as its second card is flipped. An unmatched pair stays face up for
+# hide_delay seconds; flips during that time are refused with "busy" and the time left in "wait_ms".
+# Sessions nobody used for idle_timeout seconds are removed.
+#
+# Run "python game_server.py serve --port 8765" to start the server and
+# "python game_server.py load --port 8765 --sessions 1000" to measure flips per second and latency.
+
+import argparse                 # Import the argparse module to read command line options
+import asyncio                  # Import the asyncio module to serve many connections in one thread
+import json                     # Import the JSON module to read requests and write answers
+import random                   # Import the random module to deal new boards and for the load test players
+import secrets                  # Import the secrets module to make session ids that can't be guessed
+import socket                   # Import the socket module to check if Unix sockets are available
+import time                     # Import the time module to measure the load test
+from collections import OrderedDict  # Import OrderedDict to keep sessions from least to most recently used
+from game_logic import ChangeSet, MemoryGame, SystemClock, symbol_label  # Import the game logic
+from board_factory import deal_symbols, deal_token  # Import the board factory to deal boards from a seed
+from simulator import PLAYERS   # Import the computer players for the load test
+from instrumentation import Metric  # Import the Metric class for the latency percentiles
+
+MAX_GRID_SIZE = 64      # Largest board a client can ask for
+MAX_HIDE_DELAY = 5.0    # Longest time (seconds) a client can ask unmatched pairs to stay visible
+
+
+# Helper to get the card waiting for its pair as [row, col] (None if no card is, or a whole pair is face up)
+def waiting_card(game):
+    if game.first_click is None or game.second_click is not None:
+        return None
+    return list(game.first_click)
+
+
+# Define the GameSession class
+
+# One game on the server: the MemoryGame, who plays it, and the changes not sent to the client yet
+class GameSession:
+    def __init__(self, session_id, game, seed, player_name, now):
+        self.session_id = session_id
+        self.game = game
+        self.seed = seed
+        self.player_name = player_name
+        self.started = now
+        self.last_used = now
+        self.changes = []               # ChangeSets since the last answer
+        game.subscribe(self.changes.append)
+
+    # Method to get the changes since the last answer, as lists for JSON
+    def take_changes(self):
+        revealed, hidden, matched = [], [], []
+        for changes in self.changes:
+            revealed.extend([i, j, symbol] for i, j, symbol in changes.revealed)
+            hidden.extend([i, j] for i, j in changes.hidden)
+            matched.extend([[i1, j1], [i2, j2]] for (i1, j1), (i2, j2) in changes.matched)
+        self.changes.clear()
+        game = self.game
+        return {'revealed': revealed, 'hidden': hidden, 'matched': matched,
+                'first': waiting_card(game),
+                'moves': game.get_moves(), 'finished': game.is_game_over()}
+
+
+# Define the GameServer class
+
+# This class keeps the sessions and answers requests. handle() does the work and doesn't know about
+# sockets, so it can also be called directly; serve() puts it behind a TCP or Unix socket.
+# If a ScoreWriteQueue is given, finished games are saved with it (scores of many seats are written together).
+class GameServer:
+    def __init__(self, idle_timeout=600.0, max_sessions=100000, score_writer=None, clock=None):
+        self.idle_timeout = idle_timeout    # Seconds without requests before a session is removed
+        self.max_sessions = max_sessions    # Largest number of sessions at the same time
+        self.score_writer = score_writer
+        self.clock = clock or SystemClock()
+        self.sessions = OrderedDict()       # Session id -> GameSession, least recently used first
+        self.evicted = 0                    # Number of sessions removed because they were idle
+        self.operations = {'new': self.new_game, 'flip': self.flip, 'state': self.state, 'finish': self.finish}
+
+    # Method to answer one request (a dictionary), returns the answer
+    def handle(self, request):
+        try:
+            operation = self.operations.get(request.get('op'))
+            if operation is None:
+                answer = {'ok': False, 'error': f"unknown op {request.get('op')!r}"}
+            else:
+                answer = operation(request)
+        except (KeyError, TypeError, ValueError, OverflowError) as e:  # OverflowError: int() of a huge float like 1e400
+            answer = {'ok': False, 'error': f"bad request: {e}"}
+        if 'id' in request:
+            answer['id'] = request['id']
+        return answer
+
+    # Method to find the session of a request and mark it as used
+    def session(self, request):
+        session = self.sessions.get(request['session'])
+        if session is not None:
+            session.last_used = self.clock.now()
+            self.sessions.move_to_end(session.session_id)
+        return session
+
+    # Method to start a game
+    def new_game(self, request):
+        self.evict_idle()
+        if len(self.sessions) >= self.max_sessions:
+            return {'ok': False, 'error': "server full"}
+        grid_size = int(request.get('grid', 4))
+        if not 1 < grid_size <= MAX_GRID_SIZE:
+            return {'ok': False, 'error': f"grid must be between 2 and {MAX_GRID_SIZE}"}
+        seed = int(request['seed']) if 'seed' in request else random.getrandbits(63)
+        hide_delay = min(MAX_HIDE_DELAY, max(0.0, float(request.get('hide_delay', 0.5))))
+        game = MemoryGame(grid_size=grid_size, clock=self.clock, hide_delay=hide_delay,
+                          symbols=deal_symbols(grid_size, seed, 0))  # Raises ValueError for odd sizes
+        session_id = secrets.token_hex(8)
+        self.sessions[session_id] = GameSession(session_id, game, seed, str(request.get('player', "Player")),
+                                                self.clock.now())
+        return {'ok': True, 'session': session_id, 'grid': grid_size, 'deal': deal_token(grid_size, seed)}
+
+    # Method to flip a card; the pair is checked as soon as its second card is flipped
+    def flip(self, request):
+        session = self.session(request)
+        if session is None:
+            return {'ok': False, 'error': "no such session"}
+        game = session.game
+        game.advance()  # Hide the last unmatched pair if its time is up
+        if game.hide_deadline is not None:
+            return {'ok': False, 'error': "busy", 'wait_ms': int(game.time_until_hide() * 1000) + 1}
+        if not game.flip_card(int(request['row']), int(request['col'])):
+            answer = session.take_changes()
+            answer.update(ok=False, error="can't flip that card")
+            return answer
+        if game.second_click is not None:
+            game.check_match()
+        answer = session.take_changes()
+        answer['ok'] = True
+        return answer
+
+    # Method to get the whole board of a session
+    def state(self, request):
+        session = self.session(request)
+        if session is None:
+            return {'ok': False, 'error': "no such session"}
+        game = session.game
+        session.changes.clear()  # The client gets everything now
+        n = game.grid_size
+        face_up = [[i, j, symbol_label(game.symbol_at(i, j))] for i in range(n) for j in range(n)
+                   if game.is_flipped(i, j) and not game.is_matched(i, j)]
+        matched = [[i, j] for i in range(n) for j in range(n) if game.is_matched(i, j)]
+        return {'ok': True, 'grid': n, 'deal': deal_token(n, session.seed), 'face_up': face_up, 'matched': matched,
+                'first': waiting_card(game),
+                'moves': game.get_moves(), 'finished': game.is_game_over()}
+
+    # Method to end a game, its score is saved if it was finished
+    def finish(self, request):
+        session = self.sessions.pop(request['session'], None)
+        if session is None:
+            return {'ok': False, 'error': "no such session"}
+        game = session.game
+        time_taken = round(self.clock.now() - session.started, 2)
+        saved = game.is_game_over() and self.score_writer is not None
+        if saved:
+            self.score_writer.put(session.player_name, game.get_moves(), time_taken)
+        return {'ok': True, 'moves': game.get_moves(), 'time': time_taken, 'finished': game.is_game_over(), 'saved': saved}
+
+    # Method to remove the sessions nobody used for idle_timeout seconds, returns how many were removed
+    # The least recently used sessions come first, so it stops at the first session still in use
+    def evict_idle(self):
+        expired = self.clock.now() - self.idle_timeout
+        removed = 0
+        while self.sessions:
+            session = next(iter(self.sessions.values()))
+            if session.last_used > expired:
+                break
+            self.sessions.popitem(last=False)
+            removed += 1
+        self.evicted += removed
+        return removed
+
+    # Method to answer the requests of one connection
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    answer = self.handle(request) if isinstance(request, dict) else {'ok': False, 'error': "bad request"}
+                except ValueError:
+                    answer = {'ok': False, 'error': "bad JSON"}
+                writer.write(json.dumps(answer, separators=(',', ':')).encode() + b"\n")
+                # Only wait for the client to read when its buffer is full
+                if writer.transport.get_write_buffer_size() > 65536:
+                    await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass  # The client went away or sent a line that is too long
+        finally:
+            writer.close()
+
+    # Method to remove idle sessions every now and then
+    async def evict_loop(self):
+        while True:
+            await asyncio.sleep(min(30.0, self.idle_timeout / 4))
+            self.evict_idle()
+
+    # Method to run the server (on a Unix socket if a path is given, otherwise on TCP)
+    # ready (an asyncio.Event) is set once the server accepts connections
+    async def serve(self, host="127.0.0.1", port=8765, path=None, ready=None):
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        evictor = asyncio.ensure_future(self.evict_loop())
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            evictor.cancel()
+
+
+# Define the GameClient class
+
+# A connection to the server that many sessions can share: every request gets an id,
+# and a reader task hands each answer to the request with the same id
+class GameClient:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 0
+        self.pending = {}               # Request id -> future of the answer
+        self.reading = asyncio.ensure_future(self.read_answers())
+
+    # Method to connect to a server (on a Unix socket if a path is given, otherwise on TCP)
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    # Method to send a request and wait for its answer
+    async def request(self, **request):
+        self.next_id += 1
+        request['id'] = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.next_id] = future
+        self.writer.write(json.dumps(request, separators=(',', ':')).encode() + b"\n")
+        return await future
+
+    # Method run by the reader task
+    async def read_answers(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                answer = json.loads(line)
+                future = self.pending.pop(answer.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(answer)
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("connection to the game server closed"))
+
+    # Method to close the connection
+    async def close(self):
+        self.reading.cancel()
+        self.writer.close()
+
+
+# Define the RemoteGame class
+
+# What a computer player needs to know about a game played on the server (see simulator.py)
+class RemoteGame:
+    def __init__(self, grid_size):
+        self.grid_size = grid_size
+        self.first_click = None
+
+
+# Helper to play games on the server with a computer player until the deadline
+# Adds the time of every flip request to latency and returns (games finished, flips)
+async def play_sessions(client, player_name, grid_size, deadline, latency, rng):
+    games = flips = 0
+    while time.monotonic() < deadline:
+        created = await client.request(op="new", grid=grid_size, hide_delay=0, player="Load test")
+        if not created['ok']:
+            raise RuntimeError(f"Could not start a game: {created['error']}")
+        session = created['session']
+        view = RemoteGame(grid_size)
+        player = PLAYERS[player_name](rng=rng)
+        player.start(view)
+        finished = False
+        while not finished and time.monotonic() < deadline:
+            i, j = player.next_flip(view)
+            start = time.perf_counter()
+            answer = await client.request(op="flip", session=session, row=i, col=j)
+            latency.add(time.perf_counter() - start)
+            if not answer['ok'] and 'revealed' not in answer:
+                raise RuntimeError(f"Flip failed: {answer['error']}")
+            flips += 1
+            player.observe(ChangeSet(revealed=[tuple(cell) for cell in answer['revealed']],
+                                     hidden=[tuple(cell) for cell in answer['hidden']],
+                                     matched=[(tuple(first), tuple(second)) for first, second in answer['matched']]))
+            view.first_click = tuple(answer['first']) if answer['first'] is not None else None
+            finished = answer['finished']
+        await client.request(op="finish", session=session)
+        games += finished
+    return games, flips
+
+
+# Helper to run the load test: `sessions` games played at the same time over `connections` connections
+# Returns a dictionary with games, flips, flips per second and the p50/p99 flip latency
+async def load_test(sessions=1000, connections=50, seconds=10.0, grid_size=4, player_name="perfect",
+                    host="127.0.0.1", port=8765, path=None, seed=1):
+    clients = [await GameClient.connect(host, port, path) for _ in range(min(connections, sessions))]
+    latency = Metric(capacity=1 << 20)
+    rng = random.Random(seed)
+    start = time.monotonic()
+    deadline = start + seconds
+    results = await asyncio.gather(*(play_sessions(clients[n % len(clients)], player_name, grid_size, deadline,
+                                                   latency, random.Random(rng.getrandbits(64)))
+                                     for n in range(sessions)))
+    elapsed = time.monotonic() - start
+    for client in clients:
+        await client.close()
+    summary = latency.summary()
+    flips = sum(flips for _, flips in results)
+    return {
+        'sessions': sessions,
+        'connections': len(clients),
+        'games': sum(games for games, _ in results),
+        'flips': flips,
+        'flips_per_second': flips / elapsed if elapsed else 0.0,
+        'flip_p50_ms': summary['p50_ms'],
+        'flip_p99_ms': summary['p99_ms'],
+        'flip_max_ms': summary['max_ms'],
+    }
+
+
+# Helper to print the results of a load test
+def print_load_results(results):
+    print(f"{results['sessions']} sessions on {results['connections']} connections: {results['games']} games, "
+          f"{results['flips']} flips, {results['flips_per_second']:.0f} flips/s, "
+          f"latency p50 {results['flip_p50_ms']:.2f} ms, p99 {results['flip_p99_ms']:.2f} ms, "
+          f"max {results['flip_max_ms']:.2f} ms")
+
+
+# Helper to run a server until it is stopped (also used by the game-server benchmark in another process)
+def run_server(host="127.0.0.1", port=8765, path=None, idle_timeout=600.0, scores=None):
+    score_writer = None
+    if scores is not None:
+        from file_manager import ScoreManager, ScoreWriteQueue  # Only needed when scores are saved
+        score_writer = ScoreWriteQueue(ScoreManager(scores), journal=True)
+    try:
+        asyncio.run(GameServer(idle_timeout, score_writer=score_writer).serve(host, port, path))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if score_writer is not None:
+            score_writer.close(timeout=10)  # Scores not saved by then stay in the journal for the next start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory Game server and load test")
+    parser.add_argument("command", choices=["serve", "load"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="path of a Unix socket to use instead of TCP"
+                        + ("" if hasattr(socket, "AF_UNIX") else " (not available here)"))
+    parser.add_argument("--idle-timeout", type=float, default=600.0, help="seconds before an unused session is removed")
+    parser.add_argument("--scores", help="score file to save finished games to (e.g. scores.csv)")
+    parser.add_argument("--sessions", type=int, default=1000, help="load test: games played at the same time")
+    parser.add_argument("--connections", type=int, default=50, help="load test: connections shared by the sessions")
+    parser.add_argument("--seconds", type=float, default=10.0, help="load test: how long to run")
+    parser.add_argument("--grid", type=int, default=4, help="load test: grid size")
+    parser.add_argument("--player", choices=sorted(PLAYERS), default="perfect", help="load test: computer player")
+    arguments = parser.parse_args()
+
+    if arguments.command == "serve":
+        print(f"Serving on {arguments.unix or f'{arguments.host}:{arguments.port}'}")
+        run_server(arguments.host, arguments.port, arguments.unix, arguments.idle_timeout, arguments.scores)
+    else:
+        print_load_results(asyncio.run(load_test(arguments.sessions, arguments.connections, arguments.seconds,
+                                                 arguments.grid, arguments.player, arguments.host,
+                                                 arguments.port, arguments.unix)))
@@ -0,0 +1,196 @@
+import tkinter as tk                    # Import the tkinter library for the widgets
+from tkinter import ttk                 # Import ttk for the Treeview and Scrollbar widgets
+from collections import OrderedDict     # Import OrderedDict to keep the most recently used pages
+
+# Define the VirtualHistoryTable class
+
+# This class shows a very long table (the game history) without putting every row into the Treeview.
+# The Treeview only ever holds the rows that fit on the screen; when the user scrolls,
+# the values of those rows are replaced with the rows of the new position.
+# Rows are fetched from the score manager one page at a time, and a few pages are kept in a cache.
+# When a page is fetched we also fetch the pages just above and below it (the overscan),
+# so scrolling a little never has to wait for the file.
+# The total number of rows is known up front (from the score index), so the scrollbar
+# and the row counter are correct without loading the rows.
+class VirtualHistoryTable(tk.Frame):
+    def __init__(self, parent, columns, row_count, fetch_rows, page_size=200, overscan=20, cached_pages=8, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.columns = columns              # Column names of the table
+        self.row_count = row_count          # Total number of rows
+        self.fetch_rows = fetch_rows        # Function (offset, limit) -> list of rows
+        self.page_size = page_size          # Number of rows fetched at once
+        self.overscan = overscan            # Extra rows fetched above and below the visible rows
+        self.cached_pages = cached_pages    # Number of pages kept in memory
+        self.pages = OrderedDict()          # Page number -> rows of that page
+        self.top = 0                        # Row number of the first visible row
+        self.visible = 20                   # Number of rows that fit on the screen
+        self.items = []                     # Treeview item ids (one per visible row)
+
+        # Create the table and its scrollbar
+        self.table = ttk.Treeview(self, columns=columns, show="headings", height=self.visible)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.table.pack(side=tk.LEFT, fill="both", expand=True)
+
+        # Scroll with the mouse wheel and keyboard, and fit the rows to the size of the table
+        self.table.bind("<MouseWheel>", self.on_mousewheel)            # Windows and macOS
+        self.table.bind("<Button-4>", lambda event: self.scroll_to(self.top - 3))  # Linux
+        self.table.bind("<Button-5>", lambda event: self.scroll_to(self.top + 3))  # Linux
+        self.table.bind("<Prior>", lambda event: self.scroll_to(self.top - self.visible))
+        self.table.bind("<Next>", lambda event: self.scroll_to(self.top + self.visible))
+        self.table.bind("<Configure>", self.on_resize)
+
+        self.refresh()
+
+    # Method to show other rows in the table (e.g. after sorting), going back to the top
+    def set_source(self, row_count, fetch_rows):
+        self.row_count = row_count
+        self.fetch_rows = fetch_rows
+        self.pages.clear()
+        self.top = 0
+        self.refresh()
+
+    # Method to get one page of rows, from the cache or from the score manager
+    def get_page(self, page):
+        if page in self.pages:
+            self.pages.move_to_end(page)  # Mark the page as recently used
+            return self.pages[page]
+        rows = self.fetch_rows(page * self.page_size, self.page_size)
+        self.pages[page] = rows
+        # Forget the least recently used page if the cache is full
+        if len(self.pages) > self.cached_pages:
+            self.pages.popitem(last=False)
+        return rows
+
+    # Method to get `count` rows starting at row number `start`
+    def get_rows(self, start, count):
+        rows = []
+        end = min(start + count, self.row_count)
+        row = start
+        while row < end:
+            page, offset = divmod(row, self.page_size)
+            page_rows = self.get_page(page)[offset:offset + end - row]
+            if not page_rows:
+                break
+            rows.extend(page_rows)
+            row += len(page_rows)
+        return rows
+
+    # Method to scroll so that row number `top` is the first visible row
+    def scroll_to(self, top):
+        top = max(0, min(int(top), self.row_count - self.visible))
+        if top != self.top:
+            self.top = top
+            self.refresh()
+
+    # Method to fill the visible rows of the table with the rows at the current position
+    def refresh(self):
+        # Make sure there is one Treeview item per visible row
+        while len(self.items) < self.visible:
+            self.items.append(self.table.insert("", "end", values=()))
+        while len(self.items) > self.visible:
+            self.table.delete(self.items.pop())
+
+        # Fetch the rows around the visible rows (overscan), then show the visible ones
+        self.get_rows(max(0, self.top - self.overscan), self.visible + 2 * self.overscan)
+        rows = self.get_rows(self.top, self.visible)
+        for index, item in enumerate(self.items):
+            self.table.item(item, values=rows[index] if index < len(rows) else ())
+
+        # Move the scrollbar to show where we are in the table
+        if self.row_count:
+            self.scrollbar.set(self.top / self.row_count, min(1.0, (self.top + self.visible) / self.row_count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    # Method called when the scrollbar is dragged or its arrows are clicked
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(amount) * self.row_count)
+        elif action == "scroll":
+            step = self.visible if unit == "pages" else 1
+            self.scroll_to(self.top + int(amount) * step)
+
+    # Method called when the mouse wheel is turned (Windows and macOS)
+    def on_mousewheel(self, event):
+        if event.delta:
+            self.scroll_to(self.top - 3 if event.delta > 0 else self.top + 3)
+        return "break"
+
+    # Method called when the table changes size, to show as many rows as fit
+    def on_resize(self, event):
+        row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        visible = max(1, event.height // row_height - 1)  # One row is taken by the headings
+        if visible != self.visible:
+            self.visible = visible
+            self.top = max(0, min(self.top, self.row_count - self.visible))
+            self.refresh()
+
+
+# Define the ScoreTableModel class
+
+# This class sorts the game history without touching the Treeview.
+# The rows are loaded once, and for each column we build a list of sort keys (numbers for the
+# numeric columns) the first time that column is sorted.
+# A sort order is kept as a list of row numbers (a permutation), and every order we compute
+# is cached, so switching back to an earlier order (or between ascending and descending) is instant.
+# Sorting by several columns is done with Python's stable sort, one column at a time from the last
+# to the first, so rows that are equal in the first column keep the order of the next column.
+class ScoreTableModel:
+    # Columns that are sorted as numbers instead of text
+    NUMERIC_COLUMNS = ("Game", "Moves", "Time Taken")
+
+    def __init__(self, columns, rows):
+        self.columns = list(columns)    # Column names
+        self.rows = rows                # All rows of the table
+        self.keys = {}                  # Column -> list of sort keys (one per row)
+        self.orders = {}                # Tuple of (column, descending) -> list of row numbers
+        self.sort_by = ()               # The current sort order
+        self.order = range(len(rows))   # Row numbers in the current sort order
+
+    # Method to get the sort keys of a column, building them the first time
+    def column_keys(self, column):
+        if column not in self.keys:
+            index = self.columns.index(column)
+            if column in self.NUMERIC_COLUMNS:
+                self.keys[column] = [float(row[index]) for row in self.rows]
+            else:
+                self.keys[column] = [str(row[index]) for row in self.rows]
+        return self.keys[column]
+
+    # Method to sort the rows by a list of (column, descending) pairs, the first pair being the main one
+    def sort(self, sort_by):
+        sort_by = tuple(sort_by)
+        if sort_by not in self.orders:
+            order = list(range(len(self.rows)))
+            for column, descending in reversed(sort_by):
+                # reverse=True keeps equal rows in their order, so the sort stays stable
+                order.sort(key=self.column_keys(column).__getitem__, reverse=descending)
+            self.orders[sort_by] = order
+        self.sort_by = sort_by
+        self.order = self.orders[sort_by]
+
+    # Method to change the sort order when a column is picked:
+    # picking the main column again switches between ascending and descending,
+    # and with add=True the column is added as the next sort column (multi-column sort)
+    def toggle(self, column, add=False):
+        sort_by = list(self.sort_by)
+        current = dict(sort_by)
+        if add:
+            if column in current:
+                sort_by = [(name, not descending if name == column else descending) for name, descending in sort_by]
+            else:
+                sort_by.append((column, False))
+        elif sort_by and sort_by[0][0] == column and len(sort_by) == 1:
+            sort_by = [(column, not sort_by[0][1])]
+        else:
+            sort_by = [(column, False)]
+        self.sort(sort_by)
+
+    # Method to get `limit` rows starting at position `offset` of the current order
+    def get_rows(self, offset, limit):
+        return [self.rows[index] for index in self.order[offset:offset + limit]]
+
+    # Method to get the number of rows
+    def __len__(self):
+        return len(self.rows)
@@ -0,0 +1,182 @@
+# Instrumentation for the Memory Game.
+# Measures how long the important parts of the game take (clicks, redraws, checking a match, saving a score,
+# opening the statistics) and keeps the most recent times of each in a ring buffer, so we can see the
+# typical (p50) and slow (p95, p99) times on real data.
+#
+# Set the environment variable MEMORY_GAME_PROFILE=1 before starting the game to turn it on.
+# The timings are then shown in the side panel of the game, and saved to timings.json (or the file in
+# MEMORY_GAME_PROFILE_FILE) when the game is closed or the "Save timings" button is pressed.
+# When it is off, timed() gives back the function itself, so there is no cost at all.
+
+import json                     # Import the JSON module to save the timings
+import os                       # Import the OS module to read the environment variables
+import threading                # Import the threading module, times are added from the score writer thread too
+import time                     # Import the time module to measure how long things take
+from array import array         # Import the array module for a compact ring buffer
+from functools import wraps     # Import wraps to keep the name of timed functions
+
+ENABLED = os.environ.get("MEMORY_GAME_PROFILE", "") not in ("", "0")
+DUMP_FILE = os.environ.get("MEMORY_GAME_PROFILE_FILE", "timings.json")
+
+
+# Define the Metric class
+
+# This class keeps the last `capacity` times (in seconds) of one measured thing in a ring buffer,
+# plus the number and total of all times, and works out percentiles from the recent times
+# Times can be added from several threads (the Tk thread and the score writer thread), so a lock guards the buffer
+class Metric:
+    def __init__(self, capacity=1024):
+        self.lock = threading.Lock()
+        self.samples = array('d', bytes(8 * capacity))  # Ring buffer of the recent times
+        self.next = 0                   # Position of the next time in the ring buffer
+        self.count = 0                  # Number of times measured
+        self.total = 0.0                # Sum of all times
+        self.maximum = 0.0              # Slowest time
+
+    # Method to add one time
+    def add(self, seconds):
+        with self.lock:
+            self.samples[self.next] = seconds
+            self.next = (self.next + 1) % len(self.samples)
+            self.count += 1
+            self.total += seconds
+            if seconds > self.maximum:
+                self.maximum = seconds
+
+    # Method to get the recent times, sorted
+    def recent(self):
+        with self.lock:
+            recent = self.samples[:min(self.count, len(self.samples))]
+        return sorted(recent)
+
+    # Method to get a percentile (0-100) of the recent times (nearest rank)
+    def percentile(self, percent, recent=None):
+        recent = self.recent() if recent is None else recent
+        if not recent:
+            return 0.0
+        return recent[min(len(recent) - 1, max(0, int(len(recent) * percent / 100 + 0.5) - 1))]
+
+    # Method to get a summary in milliseconds
+    def summary(self):
+        with self.lock:
+            count, total, maximum = self.count, self.total, self.maximum
+            recent = sorted(self.samples[:min(count, len(self.samples))])
+        return {
+            'count': count,
+            'mean_ms': total / count * 1000 if count else 0.0,
+            'p50_ms': self.percentile(50, recent) * 1000,
+            'p95_ms': self.percentile(95, recent) * 1000,
+            'p99_ms': self.percentile(99, recent) * 1000,
+            'max_ms': maximum * 1000,
+        }
+
+
+# Define the Profiler class
+
+# This class keeps a Metric for every measured name and a simple counter for every counted name.
+# Use it as a decorator (@PROFILER.timed("name")), as a context manager (with PROFILER.timer("name"):)
+# or call add(name, seconds) with a time measured some other way.
+class Profiler:
+    def __init__(self, enabled=ENABLED, capacity=1024):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.metrics = {}               # Name -> Metric
+        self.counters = {}              # Name -> number
+        self.lock = threading.Lock()    # Guards the two dictionaries (each Metric has its own lock)
+
+    # Method to add a time (in seconds) to a metric
+    def add(self, name, seconds):
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.setdefault(name, Metric(self.capacity))
+        metric.add(seconds)
+
+    # Method to add to a counter
+    def count(self, name, amount=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    # Decorator to measure every call of a function
+    # When the profiler is off the function is returned as it is
+    def timed(self, name):
+        def decorator(function):
+            if not self.enabled:
+                return function
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.add(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    # Method to measure a block of code (with PROFILER.timer("name"): ...)
+    def timer(self, name):
+        return Timer(self, name) if self.enabled else NULL_TIMER
+
+    # Method to get the summary of every metric and the counters
+    def summary(self):
+        with self.lock:
+            metrics, counters = sorted(self.metrics.items()), sorted(self.counters.items())
+        return {
+            'metrics': {name: metric.summary() for name, metric in metrics},
+            'counters': dict(counters),
+        }
+
+    # Method to get a few lines of text with the p50/p95/p99 of every metric (for the on-screen overlay)
+    def report(self):
+        lines = []
+        for name, summary in self.summary()['metrics'].items():
+            lines.append(f"{name}: {summary['p50_ms']:.1f} / {summary['p95_ms']:.1f} / {summary['p99_ms']:.1f} ms")
+        return "\n".join(lines) if lines else "No timings yet"
+
+    # Method to save the summary (and the recent times) to a JSON file
+    def dump(self, file_name=DUMP_FILE):
+        data = self.summary()
+        with self.lock:
+            metrics = list(self.metrics.items())
+        data['recent_ms'] = {name: [seconds * 1000 for seconds in metric.recent()] for name, metric in metrics}
+        try:
+            with open(file_name, 'w') as file:
+                json.dump(data, file, indent=2)
+        except IOError as e:
+            print(f"Error saving timings: {e}")
+
+
+# Define the Timer class
+
+# Context manager that measures a block of code and adds the time to the profiler
+class Timer:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+
+
+# Define the NullTimer class
+
+# Context manager that does nothing, used when the profiler is off
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+# The profiler used by the game
+PROFILER = Profiler()
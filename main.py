@@ -1,30 +1,43 @@
 # Python Memory Game using Tkinter and Pygame.
 
+import sys                          # Import the sys module to check which modules were loaded
+import argparse                     # Import the argparse module to read the command line options
 import tkinter as tk                # Import the Tkinter module for the GUI
 from ui import MemoryGameUI         # Import the MemoryGameUI class from ui.py
-import pygame                       # Import the pygame module for sound effects
-import pandas as pd                 # Import the pandas module for data analysis
-import matplotlib.pyplot as plt     # Import the matplotlib module for plotting
+from instrumentation import PROFILER  # Import the profiler to save the timings when the game is closed
+# pygame and matplotlib are imported by the game when they are first needed, so the window opens faster
 
 # Function to handle cleanup when the window is closed
-def on_closing(root):
-    pygame.quit()       # Quit pygame
-    plt.close('all')    # Close all matplotlib windows (if any)
+def on_closing(root, game_ui):
+    game_ui.audio.close()  # Stop the audio thread
+    game_ui.score_writer.close(timeout=5)  # Save the scores still queued (a few seconds at most, the journal keeps the rest)
+    if PROFILER.enabled:
+        PROFILER.dump()    # Save the timings (MEMORY_GAME_PROFILE=1)
+    if "pygame" in sys.modules:
+        sys.modules["pygame"].quit()                   # Quit pygame
+    if "matplotlib.pyplot" in sys.modules:
+        sys.modules["matplotlib.pyplot"].close('all')  # Close all matplotlib windows (if any)
     root.destroy()      # Destroy the Tkinter window
 
 # Main function to run the game.
-def main():
-    # Initialize pygame
-    pygame.init()
+def main(argv=None):
+    # Read the command line options (e.g. `python main.py --grid 16` for a 16x16 board)
+    parser = argparse.ArgumentParser(description="Python Memory Game")
+    parser.add_argument("--grid", type=int, default=4, metavar="N", help="play on an N x N board (N must be even, default 4)")
+    args = parser.parse_args(argv)
+    if args.grid < 2 or args.grid % 2:
+        parser.error(f"a {args.grid}x{args.grid} board does not have an even number of tiles")
+
+    # pygame (and its sound mixer) is started by the audio engine in the background
     
     # Create the main window
     root = tk.Tk()
     
     # Initialize the game UI
-    game_ui = MemoryGameUI(root)
+    game_ui = MemoryGameUI(root, grid_size=args.grid)
     
     # Bind the on_closing function to the window close event
-    root.protocol("WM_DELETE_WINDOW", lambda: on_closing(root))
+    root.protocol("WM_DELETE_WINDOW", lambda: on_closing(root, game_ui))
     
     # Start the Tkinter event loop
     root.mainloop()
@@ -0,0 +1,309 @@
+# Replays of Memory Game sessions.
+# A replay log holds the deal of a game (grid size, seed and index, see board_factory.py) and every
+# card flip with the time it happened, so a real session can be played again exactly, as fast as
+# possible, through MemoryGame (replay_game) or through the whole user interface (replay_in_ui).
+# This turns real sessions into regression benchmarks: run "python replay.py replays/*.mgr".
+#
+# Layout of a log file (little-endian):
+#   header  magic "MGREPLAY", version, grid size, seed, deal index, hide delay (seconds)
+#   flips   for every flip: milliseconds since the previous flip, then the card number (row * grid + column),
+#           both written as varints (7 bits per byte, the high bit means "more bytes follow"),
+#           so a flip usually takes 3 or 4 bytes
+
+import argparse                 # Import the argparse module to read command line options
+import glob                     # Import the glob module to find the saved replays
+import heapq                    # Import the heapq module to run scheduled callbacks in time order
+import os                       # Import the OS module to read the environment variables and remove old replays
+import struct                   # Import the struct module to read and write the header
+import time                     # Import the time module to measure replay speed
+from board_factory import deal_symbols, deal_token  # Import the board factory to deal the same board again
+from game_logic import MemoryGame, SystemClock, VirtualClock  # Import the game logic and the clocks
+from instrumentation import Metric  # Import the Metric class for the latency percentiles
+
+MAGIC = b"MGREPLAY"
+VERSION = 1
+HEADER = struct.Struct("<8sBHQIf")  # magic, version, grid size, seed, deal index, hide delay
+CHECK_DELAY = 0.5                   # The user interface checks a pair 500ms after the second flip
+
+# The game saves the replay of every finished game to REPLAY_FOLDER and keeps the last REPLAYS_KEPT of them
+# Set the environment variable MEMORY_GAME_REPLAYS to the number of replays to keep (0 turns recording off)
+REPLAY_FOLDER = "replays"
+try:
+    REPLAYS_KEPT = max(0, int(os.environ.get("MEMORY_GAME_REPLAYS", "100")))
+except ValueError:
+    REPLAYS_KEPT = 100
+
+
+# Helper to write a number as a varint
+def write_varint(output, number):
+    while number >= 0x80:
+        output.append(number & 0x7F | 0x80)
+        number >>= 7
+    output.append(number)
+
+
+# Helper to read a varint at a position, returns (number, next position)
+def read_varint(data, position):
+    number = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, position
+        shift += 7
+
+
+# Define the ReplayLog class
+
+# The deal and the flips of one session. flips is a list of (milliseconds since the start, row, column)
+class ReplayLog:
+    def __init__(self, grid_size, seed, index=0, hide_delay=0.5, flips=None):
+        self.grid_size = grid_size
+        self.seed = seed
+        self.index = index
+        self.hide_delay = hide_delay
+        self.flips = flips if flips is not None else []
+
+    # Method to get the deal token of the board ("4x4-2a-0")
+    def token(self):
+        return deal_token(self.grid_size, self.seed, self.index)
+
+    # Method to start a game with the board of the log
+    def new_game(self, clock=None):
+        return MemoryGame(grid_size=self.grid_size, clock=clock, hide_delay=self.hide_delay,
+                          symbols=deal_symbols(self.grid_size, self.seed, self.index))
+
+    # Method to turn the log into bytes
+    def to_bytes(self):
+        output = bytearray(HEADER.pack(MAGIC, VERSION, self.grid_size, self.seed, self.index, self.hide_delay))
+        previous = 0
+        for milliseconds, i, j in self.flips:
+            write_varint(output, milliseconds - previous)
+            write_varint(output, i * self.grid_size + j)
+            previous = milliseconds
+        return bytes(output)
+
+    # Method to read a log from bytes
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, grid_size, seed, index, hide_delay = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a Memory Game replay log")
+        log = cls(grid_size, seed, index, round(hide_delay, 6))
+        position, milliseconds = HEADER.size, 0
+        while position < len(data):
+            delta, position = read_varint(data, position)
+            card, position = read_varint(data, position)
+            milliseconds += delta
+            log.flips.append((milliseconds, card // grid_size, card % grid_size))
+        return log
+
+    # Method to save the log to a file
+    def save(self, file_name):
+        with open(file_name, 'wb') as file:
+            file.write(self.to_bytes())
+
+    # Method to load a log from a file
+    @classmethod
+    def load(cls, file_name):
+        with open(file_name, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+
+# Define the ReplayRecorder class
+
+# This class listens to a game (it subscribes to its ChangeSets) and writes down every flip with its time
+class ReplayRecorder:
+    def __init__(self, game, seed, index=0, clock=None):
+        self.game = game
+        self.clock = clock or game.clock
+        self.start = self.clock.now()
+        self.log = ReplayLog(game.grid_size, seed, index, game.hide_delay)
+        game.subscribe(self.on_change)
+
+    # Method called by the game after every flip, match and reset
+    def on_change(self, changes):
+        for i, j, _ in changes.revealed:
+            self.log.flips.append((int((self.clock.now() - self.start) * 1000), i, j))
+
+    # Method to stop recording
+    def stop(self):
+        self.game.unsubscribe(self.on_change)
+        return self.log
+
+
+# Helper to remove the oldest replays of a folder, so only the newest `keep` are left
+# Returns the number of replays removed
+def prune_replays(folder=REPLAY_FOLDER, keep=REPLAYS_KEPT):
+    files = sorted(glob.glob(os.path.join(folder, "*.mgr")), key=os.path.getmtime)
+    removed = 0
+    for file_name in files[:max(0, len(files) - keep)]:
+        try:
+            os.remove(file_name)
+            removed += 1
+        except OSError:
+            pass  # Already removed (by another game)
+    return removed
+
+
+# Helper to play a log through MemoryGame as fast as possible, with a virtual clock that jumps from flip to flip
+# The pairs are checked and hidden at the same times as in the user interface
+# Returns the game and the number of flips the game refused (0 if the replay matches the session)
+def replay_game(log, check_delay=CHECK_DELAY, latency=None):
+    clock = VirtualClock()
+    game = log.new_game(clock)
+    check_at = None
+    refused = 0
+    for milliseconds, i, j in log.flips:
+        now = milliseconds / 1000
+        # Run what the user interface would have done before this flip
+        if check_at is not None and check_at <= now:
+            clock.time = max(clock.time, check_at)
+            game.check_match()
+            check_at = None
+        if game.hide_deadline is not None and game.hide_deadline <= now:
+            clock.time = max(clock.time, game.hide_deadline)
+            game.advance()
+        clock.time = max(clock.time, now)
+        start = time.perf_counter() if latency is not None else 0.0
+        if not game.flip_card(i, j):
+            refused += 1
+        elif game.second_click is not None:
+            check_at = now + check_delay
+        if latency is not None:
+            latency.add(time.perf_counter() - start)
+    # Check the last pair
+    if check_at is not None:
+        clock.time = max(clock.time, check_at)
+        game.check_match()
+    if game.hide_deadline is not None:
+        clock.time = max(clock.time, game.hide_deadline)
+        game.advance()
+    return game, refused
+
+
+# Define the VirtualScheduler class
+
+# Stands in for root.after and the clock of MemoryGameUI during a replay in the user interface:
+# callbacks are kept in time order and run when the virtual time reaches them, without waiting
+class VirtualScheduler(VirtualClock):
+    def __init__(self, start=0.0):
+        super().__init__(start)
+        self.queue = []     # Heap of (time, number, callback, arguments)
+        self.number = 0     # Keeps callbacks with the same time in the order they were added
+
+    # Method to run a callback after some milliseconds (like root.after)
+    def after(self, milliseconds, callback, *args):
+        self.number += 1
+        heapq.heappush(self.queue, (self.time + milliseconds / 1000, self.number, callback, args))
+        return self.number
+
+    # Method to run every callback due up to a time, and move the clock there
+    def run_until(self, until):
+        while self.queue and self.queue[0][0] <= until:
+            due, _, callback, args = heapq.heappop(self.queue)
+            self.time = max(self.time, due)
+            callback(*args)
+        self.time = max(self.time, until)
+
+    # Method to run every callback left
+    def run_all(self):
+        while self.queue:
+            self.run_until(self.queue[0][0])
+
+
+# Define the ClickEvent class
+
+# A stand-in for the Tkinter event of a mouse click, with the position in the canvas window
+class ClickEvent:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+# Helper to play a log through the user interface (MemoryGameUI), as fast as possible
+# The UI gets a virtual clock and scheduler, and every flip is a click in the middle of the card
+# Returns the game of the UI (the UI doesn't save the score or show the Game Over message of a replay)
+def replay_in_ui(ui, log, player_name="Replay", latency=None):
+    scheduler = VirtualScheduler()
+    ui.clock, ui.schedule, ui.replaying = scheduler, scheduler.after, True
+    try:
+        ui.player_name = player_name
+        ui.grid_size = log.grid_size
+        ui.start_game(log.seed, log.index, hide_delay=log.hide_delay)
+        game = ui.memory_game
+        for milliseconds, i, j in log.flips:
+            scheduler.run_until(milliseconds / 1000)
+            renderer, canvas = ui.board_renderer, ui.canvas
+            # Position of the middle of the card in the canvas window (the board may be scrolled)
+            x = (j + 0.5) * renderer.card_size - canvas.canvasx(0)
+            y = (i + 0.5) * renderer.card_size - canvas.canvasy(0)
+            start = time.perf_counter() if latency is not None else 0.0
+            ui.on_click(ClickEvent(x, y))
+            ui.root.update_idletasks()  # Let Tk repaint the card
+            if latency is not None:
+                latency.add(time.perf_counter() - start)
+        scheduler.run_all()
+        return game
+    finally:
+        ui.clock, ui.schedule, ui.replaying = SystemClock(), ui.root.after, False
+
+
+# Helper to replay logs many times and measure the speed and the time of each flip
+# Returns a dictionary with flips per second and p50/p95/p99 flip latency
+def benchmark_logs(logs, repeat=100):
+    latency = Metric(capacity=65536)
+    flips = refused = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for log in logs:
+            _, log_refused = replay_game(log, latency=latency)
+            flips += len(log.flips)
+            refused += log_refused
+    seconds = time.perf_counter() - start
+    summary = latency.summary()
+    return {
+        'logs': len(logs),
+        'flips': flips,
+        'refused': refused,
+        'flips_per_second': flips / seconds if seconds else 0.0,
+        'flip_p50_us': summary['p50_ms'] * 1000,
+        'flip_p95_us': summary['p95_ms'] * 1000,
+        'flip_p99_us': summary['p99_ms'] * 1000,
+    }
+
+
+# Helper to record a session played by a simulator player, with the timing of a person using the user interface
+# (think_time seconds between flips), for benchmarks when there are no real sessions
+def record_simulated_session(player, grid_size=4, seed=1, think_time=0.8):
+    clock = VirtualClock()
+    log_game = MemoryGame(grid_size=grid_size, clock=clock, symbols=deal_symbols(grid_size, seed, 0))
+    recorder = ReplayRecorder(log_game, seed, 0)
+    player.start(log_game)
+    log_game.subscribe(player.observe)
+    while not log_game.is_game_over():
+        clock.advance(think_time)
+        log_game.advance()
+        if log_game.flip_card(*player.next_flip(log_game)) and log_game.second_click is not None:
+            clock.advance(CHECK_DELAY)
+            if not log_game.check_match():
+                clock.advance(log_game.time_until_hide())
+                log_game.advance()
+    return recorder.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay Memory Game sessions as a benchmark")
+    parser.add_argument("logs", nargs="+", help="replay log files (.mgr)")
+    parser.add_argument("--repeat", type=int, default=100, help="number of times to replay every log")
+    arguments = parser.parse_args()
+
+    logs = [ReplayLog.load(file_name) for file_name in arguments.logs]
+    for file_name, log in zip(arguments.logs, logs):
+        game, refused = replay_game(log)
+        print(f"{file_name}: deal {log.token()}, {len(log.flips)} flips, {game.get_moves()} moves, "
+              f"{'finished' if game.is_game_over() else 'not finished'}" + (f", {refused} flips refused" if refused else ""))
+    results = benchmark_logs(logs, arguments.repeat)
+    print(f"{results['flips_per_second']:.0f} flips/s, flip latency p50 {results['flip_p50_us']:.2f} us, "
+          f"p95 {results['flip_p95_us']:.2f} us, p99 {results['flip_p99_us']:.2f} us")
@@ -0,0 +1,207 @@
+# Columnar score archive for the Memory Game.
+# The scores are stored column by column in one binary file (scores.csv.archive next to the score file),
+# so analysis code can memory-map the file and use the columns directly, without parsing any text.
+#
+# Layout of the file (all numbers little-endian, every part starts at a multiple of 8 bytes):
+#   header          magic "MGARCH01", number of rows, number of players, size of the player names
+#   game_number     int64   one per row
+#   moves           int32   one per row
+#   time_taken      float64 one per row (seconds)
+#   timestamp       int64   one per row (date and time of the game, seconds since 1970-01-01)
+#   player          int32   one per row (number of the player in the list of player names)
+#   name offsets    uint64  one per player + 1 (where each name starts in the names)
+#   names           the player names in UTF-8, one after the other
+# The position of each column only depends on the number of rows, so the archive is written
+# straight into a memory-mapped file, one batch of rows at a time.
+# Compacting again after new games only parses the new rows: the rows already in the archive are copied.
+# The rows already in the archive are checked against the score file first (the first, middle and last of them),
+# so an archive of scores that were rewritten (imported again, converted) is built again from the start.
+
+import mmap                     # Import the mmap module to map the archive into memory
+import os                       # Import the OS module to replace the archive safely
+import struct                   # Import the struct module to read and write the header
+import sys                      # Import the sys module to check the byte order
+from array import array         # Import the array module to turn numbers into bytes without NumPy
+from datetime import datetime   # Import the datetime module to convert dates and times
+
+MAGIC = b"MGARCH01"
+HEADER = struct.Struct("<8sQQQ")  # magic, rows, players, size of the names
+# Name and type (array/struct code) of each column, in the order they are stored
+COLUMNS = (("game_number", "q"), ("moves", "i"), ("time_taken", "d"), ("timestamp", "q"), ("player", "i"))
+NUMPY_TYPES = {"q": "<i8", "i": "<i4", "d": "<f8"}
+EPOCH = datetime(1970, 1, 1)
+
+
+# Helper to round a position up to a multiple of 8 bytes
+def align(position):
+    return (position + 7) // 8 * 8
+
+
+# Helper to get the position of every column for a number of rows, and the position where the player names start
+def column_offsets(rows):
+    offsets = {}
+    position = HEADER.size
+    for name, code in COLUMNS:
+        offsets[name] = position
+        position = align(position + rows * struct.calcsize(code))
+    return offsets, position
+
+
+# Helper to get the timestamp (seconds since 1970-01-01) of a date and time as saved in the scores
+def to_timestamp(date, time):
+    return int((datetime.fromisoformat(f"{date} {time}") - EPOCH).total_seconds())
+
+
+# Helper to turn an array into little-endian bytes
+def to_bytes(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+# Define the ScoreArchive class
+
+# This class reads an archive: the columns are memoryviews of the mapped file (nothing is copied),
+# to_numpy() gives them as NumPy arrays and to_pandas() as a DataFrame, also without copying the numbers.
+# Close the archive (or use it in a with block) once the columns are not used any more.
+class ScoreArchive:
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.file = open(file_name, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.rows, player_count, names_size = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{file_name} is not a score archive")
+        self.offsets, names_offset = column_offsets(self.rows)
+        # Read the player names (there are few of them, so they are decoded once)
+        name_offsets = array('Q', self.map[names_offset:names_offset + 8 * (player_count + 1)])
+        if sys.byteorder == "big":
+            name_offsets.byteswap()
+        names = self.map[names_offset + 8 * (player_count + 1):names_offset + 8 * (player_count + 1) + names_size]
+        self.players = [names[name_offsets[n]:name_offsets[n + 1]].decode('utf-8') for n in range(player_count)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def __len__(self):
+        return self.rows
+
+    # Method to get one column as a memoryview of numbers (no copy)
+    def column(self, name):
+        code = dict(COLUMNS)[name]
+        start = self.offsets[name]
+        return memoryview(self.map)[start:start + self.rows * struct.calcsize(code)].cast(code)
+
+    # Method to get the value of one column in one row
+    def value(self, name, row):
+        code = dict(COLUMNS)[name]
+        return struct.unpack_from("<" + code, self.map, self.offsets[name] + row * struct.calcsize(code))[0]
+
+    # Method to check that the rows of the archive are still the first rows of the scores of a backend
+    # Only the first, middle and last rows are compared, so it reads 3 rows whatever the size of the archive
+    def matches(self, backend):
+        for row_number in sorted({0, self.rows // 2, self.rows - 1} if self.rows else ()):
+            rows = backend.read_rows(row_number, 1)
+            if not rows:
+                return False
+            row = rows[0]
+            try:
+                if (int(row[0]) != self.value("game_number", row_number)
+                        or row[1] != self.players[self.value("player", row_number)]
+                        or int(row[2]) != self.value("moves", row_number)
+                        or float(row[3]) != self.value("time_taken", row_number)
+                        or to_timestamp(row[4], row[5]) != self.value("timestamp", row_number)):
+                    return False
+            except (ValueError, IndexError):
+                return False
+        return True
+
+    # Method to get all columns as NumPy arrays that use the mapped file directly (no copy)
+    def to_numpy(self):
+        import numpy as np  # NumPy is only needed for analysis
+        return {name: np.frombuffer(self.map, dtype=NUMPY_TYPES[code], count=self.rows, offset=self.offsets[name])
+                for name, code in COLUMNS}
+
+    # Method to get the scores as a pandas DataFrame (the number columns are not copied)
+    def to_pandas(self):
+        import pandas as pd  # pandas is only needed for analysis
+        columns = self.to_numpy()
+        return pd.DataFrame({
+            "Game Number": columns["game_number"],
+            "Player Name": pd.Categorical.from_codes(columns["player"], self.players),
+            "Moves": columns["moves"],
+            "Time Taken": columns["time_taken"],
+            "Played At": columns["timestamp"].view("datetime64[s]"),
+        }, copy=False)
+
+    # Method to close the archive
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    # Method to write (or update) the archive of the scores of a backend, returns the number of rows
+    # If the archive already has the first rows of the backend, only the new rows are read from the backend
+    # (otherwise, e.g. after the scores were imported again, the whole archive is written again)
+    @classmethod
+    def compact(cls, file_name, backend, batch_size=10000):
+        total = backend.count()
+        previous, players = None, []
+        if os.path.exists(file_name):
+            try:
+                previous = cls(file_name)
+                if previous.rows <= total and previous.matches(backend):
+                    players = list(previous.players)
+                else:
+                    previous.close()  # The scores were rewritten, start again
+                    previous = None
+            except (ValueError, OSError, struct.error):
+                previous = None
+        start = previous.rows if previous is not None else 0
+        codes = {name: code for code, name in enumerate(players)}
+        offsets, names_offset = column_offsets(total)
+
+        temporary = file_name + ".tmp"
+        with open(temporary, 'w+b') as file:
+            file.truncate(names_offset)
+            with mmap.mmap(file.fileno(), names_offset) as output:
+                # Copy the rows that are already in the archive
+                if previous is not None:
+                    for name, code in COLUMNS:
+                        size = start * struct.calcsize(code)
+                        output[offsets[name]:offsets[name] + size] = previous.map[previous.offsets[name]:previous.offsets[name] + size]
+                    previous.close()
+                # Convert the new rows, one batch at a time
+                for first in range(start, total, batch_size):
+                    rows = backend.read_rows(first, min(batch_size, total - first))
+                    columns = {name: array(code) for name, code in COLUMNS}
+                    for row in rows:
+                        if row[1] not in codes:
+                            codes[row[1]] = len(players)
+                            players.append(row[1])
+                        columns["game_number"].append(int(row[0]))
+                        columns["moves"].append(int(row[2]))
+                        columns["time_taken"].append(float(row[3]))
+                        columns["timestamp"].append(to_timestamp(row[4], row[5]))
+                        columns["player"].append(codes[row[1]])
+                    for name, code in COLUMNS:
+                        position = offsets[name] + first * struct.calcsize(code)
+                        data = to_bytes(columns[name])
+                        output[position:position + len(data)] = data
+            # Add the player names and the header
+            names = [player.encode('utf-8') for player in players]
+            name_offsets = array('Q', [0])
+            for name in names:
+                name_offsets.append(name_offsets[-1] + len(name))
+            file.seek(names_offset)
+            file.write(to_bytes(name_offsets))
+            file.write(b"".join(names))
+            file.seek(0)
+            file.write(HEADER.pack(MAGIC, total, len(players), name_offsets[-1]))
+        os.replace(temporary, file_name)
+        return total
+
@@ -0,0 +1,382 @@
+# Headless Memory Game simulator.
+# Plays many games of MemoryGame without Tkinter or pygame, using computer players.
+# Run "python simulator.py --games 10000 --player perfect" to see how a player does.
+
+import argparse                 # Import the argparse module to read command line options
+import hashlib                  # Import the hashlib module to derive the seed of each shard
+import multiprocessing          # Import the multiprocessing module to play games on every core
+import os                       # Import the OS module to build the shard file paths
+import random                   # Import the random module for the random players and shuffling
+import statistics               # Import the statistics module for the moves distribution
+import time                     # Import the time module to measure games per second
+import tracemalloc              # Import the tracemalloc module to measure memory per game
+from game_logic import MemoryGame, VirtualClock  # Import the game logic and the virtual clock
+
+
+# Define the CellPool class
+
+# A set of cells that supports adding, removing and picking a random cell in O(1)
+# (a list plus a dictionary of positions; removing swaps the last cell into the hole)
+class CellPool:
+    def __init__(self, cells=()):
+        self.cells = []
+        self.positions = {}
+        for cell in cells:
+            self.add(cell)
+
+    def add(self, cell):
+        if cell not in self.positions:
+            self.positions[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def remove(self, cell):
+        position = self.positions.pop(cell, None)
+        if position is None:
+            return
+        last = self.cells.pop()
+        if position < len(self.cells):
+            self.cells[position] = last
+            self.positions[last] = position
+
+    def choice(self, rng):
+        # Pick a random cell
+        return self.cells[rng.randrange(len(self.cells))]
+
+    def __contains__(self, cell):
+        return cell in self.positions
+
+    def __len__(self):
+        return len(self.cells)
+
+
+# Define the player classes
+
+# A player only learns about the board from the ChangeSets the game sends (like a person looking
+# at the cards), never from the answer board.
+# start(game) is called before the game, next_flip(game) returns the (row, column) to flip next,
+# and observe(changes) is subscribed to the game.
+
+# RandomPlayer has no memory at all: it flips random face-down cards
+class RandomPlayer:
+    name = "random"
+
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+
+    def start(self, game):
+        self.face_down = CellPool((i, j) for i in range(game.grid_size) for j in range(game.grid_size))
+
+    def observe(self, changes):
+        for i, j, _ in changes.revealed:
+            self.face_down.remove((i, j))
+        for cell in changes.hidden:
+            self.face_down.add(cell)
+
+    def next_flip(self, game):
+        return self.face_down.choice(self.rng)
+
+
+# PerfectMemoryPlayer remembers every card it has seen:
+# it matches a known pair when it has one, otherwise it flips an unknown card and,
+# if it already knows where that card's partner is, flips the partner
+class PerfectMemoryPlayer:
+    name = "perfect"
+
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+
+    def start(self, game):
+        self.unseen = CellPool((i, j) for i in range(game.grid_size) for j in range(game.grid_size))
+        self.known = {}         # Symbol -> list of remembered cells with that symbol (not matched yet)
+        self.symbols = {}       # Remembered cell -> its symbol
+
+    # Method to remember a card
+    def remember(self, cell, symbol):
+        if cell not in self.symbols:
+            self.symbols[cell] = symbol
+            self.known.setdefault(symbol, []).append(cell)
+
+    # Method to forget a card (because it was matched, or forgotten)
+    def forget(self, cell):
+        symbol = self.symbols.pop(cell, None)
+        if symbol is not None:
+            self.known[symbol].remove(cell)
+            if not self.known[symbol]:
+                del self.known[symbol]
+
+    def observe(self, changes):
+        for i, j, symbol in changes.revealed:
+            self.unseen.remove((i, j))
+            self.remember((i, j), symbol)
+        for first, second in changes.matched:
+            self.forget(first)
+            self.forget(second)
+
+    # Method to pick a card we know nothing about
+    def pick_unknown(self, game):
+        return self.unseen.choice(self.rng)
+
+    def next_flip(self, game):
+        first = game.first_click
+        if first is None:
+            # Match a pair we already know
+            for cells in self.known.values():
+                if len(cells) == 2:
+                    return cells[0]
+            return self.pick_unknown(game)
+        # Second card: flip the partner of the first card if we know it
+        for cell in self.known.get(self.symbols.get(first), ()):
+            if cell != first:
+                return cell
+        return self.pick_unknown(game)
+
+
+# LimitedMemoryPlayer plays like PerfectMemoryPlayer but only remembers the last `capacity` cards it saw
+class LimitedMemoryPlayer(PerfectMemoryPlayer):
+    name = "limited"
+
+    def __init__(self, capacity=6, rng=None):
+        super().__init__(rng)
+        self.capacity = capacity
+
+    def start(self, game):
+        super().start(game)
+        self.face_down = CellPool((i, j) for i in range(game.grid_size) for j in range(game.grid_size))
+        self.memory = []        # Remembered cells, oldest first
+
+    def remember(self, cell, symbol):
+        if cell in self.symbols:
+            self.memory.remove(cell)
+        self.memory.append(cell)
+        super().remember(cell, symbol)
+        # Forget the oldest card when the memory is full
+        if len(self.memory) > self.capacity:
+            super().forget(self.memory.pop(0))
+
+    def forget(self, cell):
+        if cell in self.symbols:
+            self.memory.remove(cell)
+        super().forget(cell)
+
+    def observe(self, changes):
+        for i, j, _ in changes.revealed:
+            self.face_down.remove((i, j))
+        for cell in changes.hidden:
+            self.face_down.add(cell)
+        super().observe(changes)
+
+    # Forgotten cards count as unknown again, so pick any face-down card we don't remember
+    def pick_unknown(self, game):
+        for _ in range(4 * len(self.face_down)):
+            cell = self.face_down.choice(self.rng)
+            if cell not in self.symbols:
+                return cell
+        return self.face_down.choice(self.rng)
+
+
+# Players by name
+PLAYERS = {
+    "random": RandomPlayer,
+    "perfect": PerfectMemoryPlayer,
+    "limited": LimitedMemoryPlayer,
+}
+
+
+# Method to play one game with a player, returns the number of moves
+def play_game(player, grid_size=4, rng=None):
+    clock = VirtualClock()
+    game = MemoryGame(grid_size=grid_size, clock=clock, rng=rng)
+    player.start(game)
+    game.subscribe(player.observe)
+    while not game.is_game_over():
+        game.flip_card(*player.next_flip(game))
+        if game.second_click is not None:
+            if not game.check_match():
+                # Skip the delay before the cards are hidden again
+                clock.advance(game.time_until_hide())
+                game.advance()
+    return game.get_moves()
+
+
+# Define the SimulationReport class
+
+# Results of a simulation: number of games, time taken, moves of every game and memory per game
+class SimulationReport:
+    def __init__(self, player, grid_size, moves, seconds, memory_per_game):
+        self.player = player                    # Name of the player
+        self.grid_size = grid_size              # Size of the board
+        self.moves = moves                      # Moves of every game
+        self.seconds = seconds                  # Time taken to play all games
+        self.memory_per_game = memory_per_game  # Peak memory (bytes) used by one game
+
+    # Method to get the number of games played per second
+    def games_per_second(self):
+        return len(self.moves) / self.seconds if self.seconds else 0.0
+
+    # Method to get a summary of the results as a dictionary
+    def summary(self):
+        moves = sorted(self.moves)
+        deciles = statistics.quantiles(moves, n=10) if len(moves) > 1 else moves * 9
+        return {
+            'player': self.player,
+            'grid_size': self.grid_size,
+            'games': len(moves),
+            'games_per_second': round(self.games_per_second(), 1),
+            'moves_mean': round(statistics.fmean(moves), 3),
+            'moves_stdev': round(statistics.pstdev(moves), 3),
+            'moves_min': moves[0],
+            'moves_p10': deciles[0],
+            'moves_median': statistics.median(moves),
+            'moves_p90': deciles[-1],
+            'moves_max': moves[-1],
+            'memory_per_game': self.memory_per_game,
+        }
+
+
+# Method to measure the peak memory used by one game
+def measure_game_memory(player_name, grid_size, seed):
+    tracemalloc.start()
+    rng = random.Random(seed)
+    play_game(PLAYERS[player_name](rng=rng), grid_size, rng)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+# Method to play many games with one kind of player
+def run_simulation(games, player_name="perfect", grid_size=4, seed=None):
+    rng = random.Random(seed)
+    moves = []
+    start = time.perf_counter()
+    for _ in range(games):
+        moves.append(play_game(PLAYERS[player_name](rng=rng), grid_size, rng))
+    seconds = time.perf_counter() - start
+    return SimulationReport(player_name, grid_size, moves, seconds, measure_game_memory(player_name, grid_size, seed))
+
+
+# Define the MovesAggregate class
+
+# Statistics of the moves of many games that can be merged: count, mean, variance (Welford),
+# minimum, maximum and a histogram (moves -> number of games), from which percentiles are read.
+# Each worker process builds one for its games and the main process merges them.
+class MovesAggregate:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.histogram = {}
+
+    # Method to add the moves of one game
+    def add(self, moves):
+        self.count += 1
+        delta = moves - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (moves - self.mean)
+        self.minimum = moves if self.minimum is None else min(self.minimum, moves)
+        self.maximum = moves if self.maximum is None else max(self.maximum, moves)
+        self.histogram[moves] = self.histogram.get(moves, 0) + 1
+
+    # Method to merge the games of another aggregate into this one (Chan's formula for the variance)
+    def merge(self, other):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+        self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        for moves, games in other.histogram.items():
+            self.histogram[moves] = self.histogram.get(moves, 0) + games
+
+    # Method to get the moves below which `fraction` of the games are
+    def percentile(self, fraction):
+        target = fraction * self.count
+        seen = 0
+        for moves in sorted(self.histogram):
+            seen += self.histogram[moves]
+            if seen >= target:
+                return moves
+        return self.maximum
+
+    # Method to get a summary as a dictionary
+    def summary(self):
+        return {
+            'games': self.count,
+            'moves_mean': round(self.mean, 3),
+            'moves_stdev': round((self.m2 / self.count) ** 0.5 if self.count else 0.0, 3),
+            'moves_min': self.minimum,
+            'moves_p10': self.percentile(0.1),
+            'moves_median': self.percentile(0.5),
+            'moves_p90': self.percentile(0.9),
+            'moves_max': self.maximum,
+        }
+
+
+# Helper to derive the seed of one shard from the seed of the batch
+# The seed only depends on the batch seed and the shard number (not on the worker that plays it,
+# nor on the global random module), so a batch gives the same results with any number of workers
+def shard_seed(seed, shard):
+    return int.from_bytes(hashlib.sha256(f"{seed}:{shard}".encode()).digest()[:8], "big")
+
+
+# Method run in a worker process: play the games of one shard, write the moves of each game
+# to the shard's file and return the aggregate of the shard
+def run_shard(task):
+    shard, first_game, games, player_name, grid_size, seed, output_dir = task
+    rng = random.Random(shard_seed(seed, shard))
+    aggregate = MovesAggregate()
+    file = open(os.path.join(output_dir, f"shard_{shard:05d}.csv"), "w") if output_dir else None
+    try:
+        for game_number in range(first_game, first_game + games):
+            moves = play_game(PLAYERS[player_name](rng=rng), grid_size, rng)
+            aggregate.add(moves)
+            if file:
+                file.write(f"{game_number},{moves}\n")
+    finally:
+        if file:
+            file.close()
+    return aggregate
+
+
+# Method to play a large number of games on several processes
+# The games are split into shards of `shard_size` games; each shard has its own seed and its own
+# results file in `output_dir` (one "game number,moves" line per game), and the shard aggregates
+# are merged as they come back. Returns the merged MovesAggregate and the time taken.
+def run_batch(games, player_name="perfect", grid_size=4, seed=0, workers=None, output_dir=None, shard_size=10000):
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    tasks = []
+    for shard, first_game in enumerate(range(0, games, shard_size)):
+        tasks.append((shard, first_game, min(shard_size, games - first_game), player_name, grid_size, seed, output_dir))
+
+    total = MovesAggregate()
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers or os.cpu_count()) as pool:
+        for aggregate in pool.imap_unordered(run_shard, tasks):
+            total.merge(aggregate)
+    return total, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play Memory Game games without the user interface")
+    parser.add_argument("--games", type=int, default=10000, help="number of games to play")
+    parser.add_argument("--player", choices=PLAYERS, default="perfect", help="kind of player")
+    parser.add_argument("--grid", type=int, default=4, help="size of the board")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible results")
+    parser.add_argument("--workers", type=int, default=None, help="play the games on this many processes (batch mode)")
+    parser.add_argument("--output", default=None, help="folder for the per-game results of batch mode")
+    arguments = parser.parse_args()
+
+    if arguments.workers:
+        aggregate, seconds = run_batch(arguments.games, arguments.player, arguments.grid, arguments.seed or 0,
+                                       arguments.workers, arguments.output)
+        summary = aggregate.summary()
+        summary['games_per_second'] = round(aggregate.count / seconds, 1)
+    else:
+        summary = run_simulation(arguments.games, arguments.player, arguments.grid, arguments.seed).summary()
+    for key, value in summary.items():
+        print(f"{key:>18}: {value}")
@@ -0,0 +1,168 @@
+# Solver for the Memory Game.
+# Works out the best expected number of moves a player with perfect memory can reach on a board,
+# so the moves of real players can be graded against it.
+# Run "python solver.py 4" to see the numbers for a 4x4 board.
+#
+# The state of a game (for a player with perfect memory) is described by two numbers:
+#   u = number of cards never seen yet
+#   k = number of seen cards whose partner has not been seen yet (their partners are among the u cards)
+# Pairs whose two cards have both been seen are matched straight away, so they are not part of the state.
+# Each turn the player flips an unseen card first (flipping a known card first never helps):
+#   - with probability k/u it is the partner of a known card, which is then flipped: 1 move, state (u-1, k-1)
+#   - otherwise it is a new card and the player either flips another unseen card:
+#       - its partner (probability 1/(u-1)): 1 move, state (u-2, k)
+#       - the partner of another known card (k/(u-1)): 1 move, then 1 more to match that pair, state (u-2, k)
+#       - another new card ((u-2-k)/(u-1)): 1 move, state (u-2, k+2)
+#     or flips a known card on purpose (to learn nothing new): 1 move, state (u-1, k+1)
+#     and the player picks whichever of the two gives fewer expected moves.
+# E(u, k) only depends on states with fewer unseen cards, so the table is filled from u = 0 upwards,
+# and can be extended later for bigger boards. The table is saved to solver_cache.bin (as 8-byte floats),
+# so asking again, even from another run, is instant.
+
+import argparse                 # Import the argparse module to read command line options
+import math                     # Import the math module for the approximation
+import os                       # Import the OS module to check for the cache file
+from array import array         # Import the array module to store the table compactly
+from simulator import PerfectMemoryPlayer, run_simulation  # Import the simulator for the heuristic estimate
+
+
+# Define the MemorySolver class
+class MemorySolver:
+    def __init__(self, cache_file="solver_cache.bin"):
+        self.cache_file = cache_file    # File the table is saved to (None to never save)
+        self.table = array('d')         # E(u, k) for every state, row by row (u = 0, 1, 2, ...)
+        self.offsets = [0]              # Position in the table of the first state of each u
+        self.max_cards = -1             # Largest u in the table
+        self.load()
+
+    # Method to get the position of state (u, k) in the table (k has the same parity as u)
+    def position(self, u, k):
+        return self.offsets[u] + k // 2
+
+    # Method to load the saved table
+    def load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        with open(self.cache_file, 'rb') as file:
+            data = file.read()
+        table = array('d')
+        table.frombytes(data[:len(data) // 8 * 8])
+        # Only keep complete rows of the table
+        offsets = [0]
+        while offsets[-1] + (len(offsets) - 1) // 2 + 1 <= len(table):
+            offsets.append(offsets[-1] + (len(offsets) - 1) // 2 + 1)
+        self.table = table[:offsets[-1]]
+        self.offsets = offsets
+        self.max_cards = len(offsets) - 2
+
+    # Method to save the table
+    def save(self):
+        if self.cache_file:
+            with open(self.cache_file, 'wb') as file:
+                self.table.tofile(file)
+
+    # Method to work out E(u, k) from the smaller states, returns (expected moves, flip known card second)
+    def solve_state(self, u, k):
+        table, position = self.table, self.position
+        if u == 0:
+            return 0.0, 0
+        expected = 0.0
+        if k:
+            expected += k / u * (1 + table[position(u - 1, k - 1)])
+        if u == k:
+            return expected, 0
+        # The first card is new, compare the two choices for the second card
+        unseen = 1 / (u - 1) * (1 + table[position(u - 2, k)])
+        unseen += k / (u - 1) * (2 + table[position(u - 2, k)])
+        if u - 2 - k > 0:
+            unseen += (u - 2 - k) / (u - 1) * (1 + table[position(u - 2, k + 2)])
+        known = 1 + table[position(u - 1, k + 1)] if k else math.inf
+        best = min(unseen, known)
+        return expected + (u - k) / u * best, int(known < unseen)
+
+    # Method to fill the table up to u = cards
+    def extend(self, cards):
+        if cards <= self.max_cards:
+            return
+        for u in range(self.max_cards + 1, cards + 1):
+            self.offsets.append(self.offsets[-1] + u // 2 + 1)
+            for k in range(u % 2, u + 1, 2):
+                self.table.append(self.solve_state(u, k)[0])
+        self.max_cards = cards
+        self.save()
+
+    # Method to get the best expected number of moves from state (u, k)
+    def expected_moves_from(self, u, k=0):
+        self.extend(u)
+        return self.table[self.position(u, k)]
+
+    # Method to get the best expected number of moves for a whole board
+    def expected_moves(self, grid_size):
+        return self.expected_moves_from(grid_size * grid_size, 0)
+
+    # Method to check if, in state (u, k) with a new first card, flipping a known card second is best
+    def flip_known_second(self, u, k):
+        self.extend(u)
+        return bool(self.solve_state(u, k)[1])
+
+
+# The fewest moves a game can possibly take (every pair found at the first try)
+def lower_bound_moves(grid_size):
+    return grid_size * grid_size // 2
+
+
+# Approximation of the best expected moves for n pairs, very close for big boards
+# (from the analysis of the one-player memory game: about (3 - 2 ln 2) n + 7/8 - 2 ln 2)
+def approximate_expected_moves(grid_size):
+    pairs = grid_size * grid_size // 2
+    return (3 - 2 * math.log(2)) * pairs + 7 / 8 - 2 * math.log(2)
+
+
+# Grade a game: the best expected moves divided by the player's moves (1.0 = as good as a perfect player)
+def grade(moves, grid_size, solver=None):
+    expected = (solver or MemorySolver()).expected_moves(grid_size)
+    return expected / moves if moves else 0.0
+
+
+# Define the OptimalPlayer class
+
+# A simulator player that follows the solver: like PerfectMemoryPlayer, but when the first card is new
+# it flips a known card second whenever the solver says that is better
+class OptimalPlayer(PerfectMemoryPlayer):
+    name = "optimal"
+
+    def __init__(self, rng=None, solver=None):
+        super().__init__(rng)
+        self.solver = solver or MemorySolver()
+
+    def next_flip(self, game):
+        first = game.first_click
+        if first is not None and len(self.known.get(self.symbols.get(first), ())) < 2:
+            # The first card is new: u and k count the cards before it was flipped
+            u = len(self.unseen) + 1
+            k = sum(1 for cells in self.known.values() if len(cells) == 1) - 1
+            if k > 0 and self.solver.flip_known_second(u, k):
+                for cells in self.known.values():
+                    if len(cells) == 1 and cells[0] != first:
+                        return cells[0]
+        return super().next_flip(game)
+
+
+# Estimate the expected moves of the (heuristic) perfect memory player by simulation,
+# for boards too big for the exact table
+def estimate_expected_moves(grid_size, games=200, seed=1):
+    return run_simulation(games, "perfect", grid_size, seed).summary()['moves_mean']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Best expected moves of the Memory Game")
+    parser.add_argument("grid", type=int, nargs="?", default=4, help="size of the board")
+    parser.add_argument("--simulate", type=int, default=0, help="also simulate this many games of the perfect memory player")
+    arguments = parser.parse_args()
+
+    solver = MemorySolver()
+    print(f"Fewest possible moves:     {lower_bound_moves(arguments.grid)}")
+    print(f"Best expected moves:       {solver.expected_moves(arguments.grid):.3f}")
+    print(f"Approximation:             {approximate_expected_moves(arguments.grid):.3f}")
+    if arguments.simulate:
+        print(f"Perfect memory (simulated): {estimate_expected_moves(arguments.grid, arguments.simulate):.3f}")
@@ -1,15 +1,45 @@
 import tkinter as tk                                             # Import the tkinter library for creating the user interface (GUI)
 from tkinter import messagebox, simpledialog, ttk                # Import messagebox, simpledialog, and ttk modules from tkinter
-from game_logic import MemoryGame                                # Import the MemoryGame class for game logic
-from file_manager import ScoreManager                            # Import the ScoreManager class for saving and retrieving scores
+from game_logic import MemoryGame, SystemClock, symbol_label     # Import the MemoryGame class for game logic
+from board_factory import deal_symbols                           # Import the board factory to deal boards from a seed
+from replay import ReplayRecorder, REPLAY_FOLDER, REPLAYS_KEPT, prune_replays  # Import the ReplayRecorder class to record every game
+from file_manager import ScoreManager, ScoreWriteQueue           # Import the ScoreManager class for saving and retrieving scores
+from board_renderer import BoardRenderer, fit_card_size, MIN_CARD_SIZE, MAX_CARD_SIZE  # Import the BoardRenderer class for drawing the game board
+from history_view import VirtualHistoryTable, ScoreTableModel    # Import the classes for the game history table and its sorting
+import os                                                        # Import the OS module to build the path of replay files
+import queue                                                     # Import the queue module to get saved scores back from the writer thread
 import time                                                      # Import the time module for tracking game time
-import pygame                                                    # Import the pygame library for sound effects
 import random                                                    # Import the random module for generating random messages
-import pandas as pd                                              # Import the pandas library for data manipulation and analysis
-import numpy as np                                               # Import the numpy library for numerical operations (e.g., interpolation)
-import matplotlib.pyplot as plt                                  # Import the matplotlib library for plotting graphs
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg  # Import the FigureCanvasTkAgg class for embedding plots in Tkinter
-from PIL import Image, ImageTk                                   # Import the Image and ImageTk modules from the PIL library for image processing
+import threading                                                 # Import the threading module to load matplotlib in the background
+from assets import AssetManager                                  # Import the AssetManager class for loading and caching images
+from audio import AudioEngine                                    # Import the AudioEngine class for playing sound effects
+from instrumentation import PROFILER                             # Import the profiler to measure how long the game takes to react
+# matplotlib is only imported when the player statistics are first shown (see load_matplotlib below),
+# because importing it takes longer than starting the rest of the game
+
+
+# Function to import matplotlib (only the first call takes time, Python keeps imported modules)
+def load_matplotlib():
+    import matplotlib.pyplot as plt                                  # Import the matplotlib library for plotting graphs
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg  # Import the FigureCanvasTkAgg class for embedding plots in Tkinter
+    return plt, FigureCanvasTkAgg
+
+
+# Function to get the color at step i of a gradient going from start_color to end_color in a number of steps
+def interpolate_color(start_color, end_color, i, steps):
+    # Linear interpolation (estimate values between two known values) of the red, green and blue parts
+    start_r, start_g, start_b = int(start_color[1:3], 16), int(start_color[3:5], 16), int(start_color[5:], 16)
+    end_r, end_g, end_b = int(end_color[1:3], 16), int(end_color[3:5], 16), int(end_color[5:], 16)
+
+    r = int(start_r + (end_r - start_r) * i / (steps - 1))
+    g = int(start_g + (end_g - start_g) * i / (steps - 1))
+    b = int(start_b + (end_b - start_b) * i / (steps - 1))
+
+    # Convert RGB to hexadecimal color
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+# Board sizes that can be chosen on the initial screen (larger boards scroll and can be zoomed)
+GRID_SIZES = (4, 6, 8, 12, 16, 24, 32, 48, 64)
 
 # Create a class for the Memory Game UI
 
@@ -24,29 +54,42 @@ from PIL import Image, ImageTk                                   # Import the Im
 
 # The MemoryGameUI class has the following attributes and methods:
 class MemoryGameUI:
-    def __init__(self, root):
-        # Initialize pygame mixer for sound effects
-        pygame.mixer.init() 
-        self.flip_sound = pygame.mixer.Sound(r'audio\switch.wav')
-        self.match_sound = pygame.mixer.Sound(r'audio\match.wav') 
-        self.error_sound = pygame.mixer.Sound(r'audio\error.mp3') 
-
-        # Set volume levels for sound effects
-        self.flip_sound.set_volume(0.7)
-        self.match_sound.set_volume(0.4)
-        self.error_sound.set_volume(1.0)
+    def __init__(self, root, warm_up=True, grid_size=4):
+        # Load the sound effects (with their volume levels and priorities) on the audio thread,
+        # so the window appears straight away and playing a sound never blocks the game
+        self.audio = AudioEngine()
+        self.audio.start({
+            'flip': (r'audio\switch.wav', 0.7, 1),
+            'match': (r'audio\match.wav', 0.4, 3),
+            'error': (r'audio\error.mp3', 1.0, 2)
+        })
+        self.assets = AssetManager()
 
         # Initialize main window properties
         self.root = root
+        # Clock and timer used by the game (a replay swaps them for virtual ones, see replay.replay_in_ui)
+        self.clock = SystemClock()
+        self.schedule = self.root.after
+        self.replaying = False
         self.root.title("Memory Game")
         self.root.iconbitmap('game.ico')  
         self.root.geometry("1000x600")  # Kept the window size as 1000x600
         self.root.state('zoomed')  # Make the main window full screen
+        # Screens with more dots per inch get bigger windows and cards, so they look the same size (1.0 at 96 DPI)
+        self.scale = max(1.0, self.root.winfo_fpixels('1i') / 96)
 
         # Initialize game components
         self.score_manager = ScoreManager()
-        self.grid_size = 4
-        self.card_size = 130  
+        # Scores are saved by a background thread (with a journal, so a crash doesn't lose them)
+        # and the results come back to the Tk thread through saved_scores (see check_saved_scores)
+        # The writer has its own ScoreManager, so the screens can read scores while it writes
+        self.score_writer = ScoreWriteQueue(ScoreManager(self.score_manager.file_name), journal=True)
+        self.saved_scores = queue.Queue()
+        self.scores_saving = 0
+        # Open windows that show scores, as (window, function to read the scores again)
+        self.score_views = []
+        self.grid_size = grid_size  # Chosen on the initial screen or with `python main.py --grid N`
+        self.card_size = MAX_CARD_SIZE  # Worked out for every game from the space for the board (see create_game_ui)
         self.player_name = None
 
         # Define color palette for UI elements
@@ -61,9 +104,16 @@ class MemoryGameUI:
             'border': '#FFFFFF' 
         }
 
+        # Headings of the columns of the history table
+        self.history_headings = {"Game": "Game", "Player": "Player", "Moves": "Moves", "Time Taken": "Time (sec)", "Date": "Date", "Time": "Time"}
+
         # Create the initial game screen
         self.create_initial_screen()
 
+        # Once the home screen is shown, import matplotlib in the background so the statistics open quickly
+        if warm_up:
+            self.root.after(500, lambda: threading.Thread(target=load_matplotlib, daemon=True).start())
+
     def center_window(self, window=None):
         # Center the window on the screen
 
@@ -75,12 +125,15 @@ class MemoryGameUI:
         screen_width = window.winfo_screenwidth()
         screen_height = window.winfo_screenheight()
 
+        # The windows are 1000x600 (more on high-DPI screens)
+        width, height = int(1000 * self.scale), int(600 * self.scale)
+
         # Calculate the x and y coordinates to center the window
-        x = (screen_width/2) - (1000/2)
-        y = (screen_height/2) - (600/2)
+        x = (screen_width/2) - (width/2)
+        y = (screen_height/2) - (height/2)
 
         # Set the window position
-        window.geometry(f'1000x600+{int(x)}+{int(y)}')
+        window.geometry(f'{width}x{height}+{int(x)}+{int(y)}')
 
     # Add a method to create the initial screen with game instructions and buttons
     def create_initial_screen(self):
@@ -96,11 +149,8 @@ class MemoryGameUI:
         # Fill the entire window with the frame and expand it to fill any extra space
     
         # Load and display the game title image
-        image = Image.open("memory_game_title.png")
-        image = image.resize((int(1930 / 4), int(984 / 4)), Image.Resampling.LANCZOS)
-        # LANCZOS is a resampling filter like ANTIALIAS that helps to maintain high picture quality despite decrement in dimesnions.  
-        
-        photo = ImageTk.PhotoImage(image)
+        # The asset manager resizes the image only once and keeps it (also on disk for the next launch)
+        photo = self.assets.image("memory_game_title.png", (int(1930 / 4), int(984 / 4)))
         title_label = tk.Label(self.initial_frame, image=photo, bg=self.colors['background'])
         title_label.image = photo  # Keep a reference beacuse Python's garbage collector will delete it otherwise
         title_label.pack(pady=(30, 15))  # Add some padding to the top and bottom respectively
@@ -122,6 +172,19 @@ class MemoryGameUI:
         good_luck_label = tk.Label(self.initial_frame, text="Good Luck and Have Fun!", font=("Arial", 17, "bold"), bg=self.colors['background'], fg=self.colors['text'])
         good_luck_label.pack(pady=15)
     
+        # Add a choice of board size for the next game
+        size_frame = tk.Frame(self.initial_frame, bg=self.colors['background'])
+        size_frame.pack(pady=(0, 5))
+
+        size_label = tk.Label(size_frame, text="Board size:", font=("Arial", 15), bg=self.colors['background'], fg=self.colors['text'])
+        size_label.pack(side=tk.LEFT, padx=5)
+
+        sizes = sorted(set(GRID_SIZES) | {self.grid_size})
+        size_choice = ttk.Combobox(size_frame, values=[f"{size} x {size}" for size in sizes], state="readonly", width=8, font=("Arial", 14))
+        size_choice.current(sizes.index(self.grid_size))
+        size_choice.bind("<<ComboboxSelected>>", lambda event: self.set_grid_size(sizes[size_choice.current()]))
+        size_choice.pack(side=tk.LEFT, padx=5)
+
         # Add buttons for starting a new game, viewing history, and showing stats
         button_frame = tk.Frame(self.initial_frame, bg=self.colors['background'])
         button_frame.pack(pady=15)
@@ -185,32 +248,7 @@ class MemoryGameUI:
                 start_color = colors[j] 
                 end_color = colors[j + 1] 
                 for i in range(steps): # Interpolate between the two colors
-
-                    # interp function from numpy library is used to linearly interpolate between two values 
-                    # (interpolate means to estimate values between two known values)
-
-                    r = int(np.interp(i, [0, steps - 1], [int(start_color[1:3], 16), int(end_color[1:3], 16)]))
-                    g = int(np.interp(i, [0, steps - 1], [int(start_color[3:5], 16), int(end_color[3:5], 16)]))
-                    b = int(np.interp(i, [0, steps - 1], [int(start_color[5:], 16), int(end_color[5:], 16)]))
-                    
-                    # Code without using numpy library:
-
-                        # start_r = int(start_color[1:3], 16)
-                        # start_g = int(start_color[3:5], 16)
-                        # start_b = int(start_color[5:], 16)
-
-                        # end_r = int(end_color[1:3], 16)
-                        # end_g = int(end_color[3:5], 16)
-                        # end_b = int(end_color[5:], 16)
-
-                        # r = int(start_r + (end_r - start_r) * i / (steps - 1))
-                        # g = int(start_g + (end_g - start_g) * i / (steps - 1))
-                        # b = int(start_b + (end_b - start_b) * i / (steps - 1))
-
-                    # Convert RGB to hexadecimal color
-                    color = f'#{r:02x}{g:02x}{b:02x}'
-
-                    gradient.append(color)
+                    gradient.append(interpolate_color(start_color, end_color, i, steps))
 
             return gradient
        
@@ -227,6 +265,12 @@ class MemoryGameUI:
         thank_you = "💕 Thank You for Playing! 💕"
         canvas.create_text(200, 50, text=thank_you, font=("Arial", 20, "bold"), fill="white")
 
+    def set_grid_size(self, grid_size):
+        # Use a grid_size x grid_size board for the next games (it must have an even number of tiles)
+        if grid_size < 2 or grid_size % 2:
+            raise ValueError(f"A {grid_size}x{grid_size} board does not have an even number of tiles")
+        self.grid_size = grid_size
+
     def start_new_game(self):
         # Close any existing game windows before starting a new game
         if hasattr(self, 'game_window'):
@@ -235,9 +279,28 @@ class MemoryGameUI:
         # Prompt for player name and start a new game
         self.player_name = simpledialog.askstring("Player Name", "Enter your name:", parent=self.root)
         if self.player_name:
-            self.memory_game = MemoryGame(grid_size=self.grid_size)
-            self.start_time = time.time()
-            self.create_game_ui()
+            # Every board is dealt from a random seed, so the game can be replayed exactly
+            self.start_game(random.SystemRandom().getrandbits(63))
+
+    def start_game(self, seed, index=0, hide_delay=0.5):
+        # Start a game with the board dealt from a seed and record its flips
+        self.memory_game = MemoryGame(grid_size=self.grid_size, clock=self.clock, hide_delay=hide_delay, symbols=deal_symbols(self.grid_size, seed, index))
+        self.recorder = ReplayRecorder(self.memory_game, seed, index) if REPLAYS_KEPT else None  # MEMORY_GAME_REPLAYS=0 turns it off
+        self.start_time = self.clock.now()
+        self.create_game_ui()
+
+    def save_replay(self):
+        # Save the flips of the game to the replays folder (run "python replay.py replays/*.mgr" to replay them)
+        # Only the last REPLAYS_KEPT replays are kept (MEMORY_GAME_REPLAYS, see replay.py)
+        if self.recorder is None:
+            return
+        log = self.recorder.stop()
+        try:
+            os.makedirs(REPLAY_FOLDER, exist_ok=True)
+            log.save(os.path.join(REPLAY_FOLDER, f"{log.token()}-{time.strftime('%Y%m%d-%H%M%S')}.mgr"))
+            prune_replays(REPLAY_FOLDER, REPLAYS_KEPT)
+        except IOError as e:
+            print(f"Error saving replay: {e}")
 
     def create_game_ui(self):
         # Create a new game window of size 1000x600
@@ -251,14 +314,27 @@ class MemoryGameUI:
         game_frame = tk.Frame(self.game_window, bg=self.colors['background'])
         game_frame.pack(fill="both", expand=True)
 
+        # Work out the size of the cards so the board fits in the window (the window minus the padding and border around the board)
+        # If the cards would be smaller than MIN_CARD_SIZE the board scrolls instead (and can be zoomed)
+        board_space = int(600 * self.scale) - 64
+        self.card_size = fit_card_size(board_space, board_space, self.grid_size, int(MIN_CARD_SIZE * self.scale), int(MAX_CARD_SIZE * self.scale))
+        view_size = min(board_space, self.grid_size * self.card_size)
+        scrolling = self.grid_size * self.card_size > view_size
+
         # Create game canvas with a white border
         canvas_frame = tk.Frame(game_frame, bg=self.colors['border'], padx=2, pady=2)
         canvas_frame.pack(side=tk.LEFT, padx=30, pady=30)
-        self.canvas = tk.Canvas(canvas_frame, width=self.grid_size * self.card_size, height=self.grid_size * self.card_size, bg=self.colors['background'], highlightthickness=0)
-        self.canvas.pack()
+        self.canvas = tk.Canvas(canvas_frame, width=view_size, height=view_size, bg=self.colors['background'], highlightthickness=0)
+        self.canvas.grid(row=0, column=0)
+        if scrolling:
+            # Scrollbars for boards bigger than the window, the renderer only draws the part that is visible
+            y_scrollbar = ttk.Scrollbar(canvas_frame, orient="vertical", command=self.canvas.yview)
+            y_scrollbar.grid(row=0, column=1, sticky="ns")
+            x_scrollbar = ttk.Scrollbar(canvas_frame, orient="horizontal", command=self.canvas.xview)
+            x_scrollbar.grid(row=1, column=0, sticky="ew")
 
         # Create side panel for moves and time
-        side_panel = tk.Frame(game_frame, bg=self.colors['panel'], width=400, height=self.grid_size * self.card_size)
+        side_panel = tk.Frame(game_frame, bg=self.colors['panel'], width=400, height=view_size)
         side_panel.pack(side=tk.LEFT, fill="both", expand=True, padx=(0, 30), pady=30)
         side_panel.pack_propagate(False)  # Prevent the frame from shrinking
 
@@ -306,13 +382,8 @@ class MemoryGameUI:
         gradient_colors = ["#8B00FF", "#FF0000"]
         gradient = []
         for i in range(300):
-            r = int(np.interp(i, [0, 299], [int(gradient_colors[0][1:3], 16), int(gradient_colors[-1][1:3], 16)]))
-            g = int(np.interp(i, [0, 299], [int(gradient_colors[0][3:5], 16), int(gradient_colors[-1][3:5], 16)]))
-            b = int(np.interp(i, [0, 299], [int(gradient_colors[0][5:], 16), int(gradient_colors[-1][5:], 16)]))
             # [0] means the first color and [-1] means the last color
-            
-            color = f'#{r:02x}{g:02x}{b:02x}'
-            gradient.append(color)
+            gradient.append(interpolate_color(gradient_colors[0], gradient_colors[-1], i, 300))
 
         for i, color in enumerate(gradient):
             design_canvas.create_line(i, 0, i, 100, fill=color)
@@ -335,10 +406,34 @@ class MemoryGameUI:
         fun_fact_label = tk.Label(side_panel, text=f'{fun_fact}', font=("Calibri", 12, "italic"), bg=self.colors['panel'], fg=self.colors['text'], wraplength=300, justify="left")
         fun_fact_label.pack(side=tk.BOTTOM, pady=15)
 
+        # Show the timings of the game when the profiler is on (MEMORY_GAME_PROFILE=1)
+        if PROFILER.enabled:
+            self.profile_label = tk.Label(side_panel, text="", font=("Consolas", 9), bg=self.colors['panel'], fg=self.colors['text'], justify="left")
+            self.profile_label.pack(side=tk.BOTTOM)
+            save_timings_button = tk.Button(side_panel, text="Save timings", font=("Arial", 9), bg=self.colors['button'], fg=self.colors['button_text'], command=PROFILER.dump)
+            save_timings_button.pack(side=tk.BOTTOM)
+            self.update_profile_overlay()
+
         # Bind click event and initialize game state
         self.canvas.bind("<Button-1>", self.on_click) # Bind the left mouse button click event to the on_click method
         self.first_card = None # Initialize the first card to None
+        # Create the canvas items of the cards once; later redraws only change the cards that changed
+        self.board_renderer = BoardRenderer(self.canvas, self.grid_size, self.card_size, self.colors)
+        if scrolling:
+            # When the board scrolls, the renderer moves the canvas items to the cards that come into view
+            self.canvas.config(xscrollcommand=lambda *view: self.on_board_scroll(x_scrollbar, *view),
+                               yscrollcommand=lambda *view: self.on_board_scroll(y_scrollbar, *view))
+            self.canvas.bind("<MouseWheel>", self.on_board_mousewheel)  # Windows and macOS
+            self.canvas.bind("<Button-4>", lambda event: self.canvas.yview_scroll(-3, "units"))  # Linux
+            self.canvas.bind("<Button-5>", lambda event: self.canvas.yview_scroll(3, "units"))  # Linux
+            self.canvas.config(xscrollincrement=self.card_size // 2, yscrollincrement=self.card_size // 2)
+        else:
+            # Draw the faces of all the symbols of this game now, so revealing a card is instant
+            # (big boards draw them the first time they are revealed)
+            self.board_renderer.preload(symbol_label(symbol) for symbol in range(self.memory_game.num_pairs))
         self.draw_board()
+        # Redraw only the cards the game tells us have changed
+        self.memory_game.subscribe(self.on_game_change)
 
         # Start updating the time
         self.update_time()
@@ -346,67 +441,89 @@ class MemoryGameUI:
     def update_time(self):
         # Check if the game window and time_label still exist
         if hasattr(self, 'game_window') and self.game_window.winfo_exists() and hasattr(self, 'time_label') and self.time_label.winfo_exists():
-            elapsed_time = time.time() - self.start_time
+            elapsed_time = self.clock.now() - self.start_time
             self.time_label.config(text=f"Time: {int(elapsed_time)} s")
             self.root.after(1000, self.update_time)  # Update every 1000ms = 1s
 
+    def update_profile_overlay(self):
+        # Show the p50 / p95 / p99 times of the game in the side panel, every 500ms while the game window is open
+        if self.profile_label.winfo_exists():
+            self.profile_label.config(text="p50 / p95 / p99\n" + PROFILER.report())
+            self.root.after(500, self.update_profile_overlay)
+
+    @PROFILER.timed("draw_board")
     def draw_board(self):
-        # Get current board state and draw it on the canvas
-        board = self.memory_game.get_board()
-        self.canvas.delete("all") # Clear the canvas
-        for i in range(self.grid_size):
-            for j in range(self.grid_size):
-                x1, y1 = j * self.card_size, i * self.card_size # Top-left corner of the card
-                x2, y2 = x1 + self.card_size, y1 + self.card_size # Bottom-right corner of the card
-                self.canvas.create_rectangle(x1, y1, x2, y2, fill=self.colors['card_back'], outline=self.colors['text'])
-                if board[i][j] != '':
-                    # Draw colorful shapes/emojis instead of alphabets
-                    if board[i][j] == 'A':
-                        self.canvas.create_text(x1 + self.card_size/2, y1 + self.card_size/2, text='👽', font=('Arial', 54), fill=self.colors['text'], anchor='center')
-                    # anchor is used to align the text to the center
-                    elif board[i][j] == 'B':
-                        self.canvas.create_text(x1 + self.card_size/2, y1 + self.card_size/2, text='💗', font=('Arial', 54), fill=self.colors['text'], anchor='center')
-                    elif board[i][j] == 'C':
-                        self.canvas.create_text(x1 + self.card_size/2, y1 + self.card_size/2, text='🦄', font=('Arial', 54), fill=self.colors['text'], anchor='center')
-                    elif board[i][j] == 'D':
-                        self.canvas.create_text(x1 + self.card_size/2, y1 + self.card_size/2, text='🍭', font=('Arial', 54), fill=self.colors['text'], anchor='center')
-                    elif board[i][j] == 'E':
-                        self.canvas.create_text(x1 + self.card_size/2, y1 + self.card_size/2, text='🌷', font=('Arial', 54), fill=self.colors['text'], anchor='center')
-                    elif board[i][j] == 'F':
-                        self.canvas.create_text(x1 + self.card_size/2, y1 + self.card_size/2, text='🧩', font=('Arial', 54), fill=self.colors['text'], anchor='center')
-                    elif board[i][j] == 'G':
-                        self.canvas.create_text(x1 + self.card_size/2, y1 + self.card_size/2, text='💡', font=('Arial', 54), fill=self.colors['text'], anchor='center')
-                    elif board[i][j] == 'H':
-                        self.canvas.create_text(x1 + self.card_size/2, y1 + self.card_size/2, text='💖', font=('Arial', 54), fill=self.colors['text'], anchor='center')
+        # Get current board state and draw the cards that changed on the canvas
+        self.board_renderer.render(self.memory_game.get_board())
+
+    @PROFILER.timed("render_changes")
+    def on_game_change(self, changes):
+        # Called by the game with a ChangeSet after every flip, match and reset
+        self.board_renderer.render_changes(changes)
+
+    def on_board_scroll(self, scrollbar, first, last):
+        # Called by the canvas when the board is scrolled, zoomed or resized
+        scrollbar.set(first, last)
+        self.board_renderer.update_viewport()
+
+    def on_board_mousewheel(self, event):
+        # Scroll the board with the mouse wheel (Shift: sideways, Control: zoom)
+        if event.state & 0x0004:  # Control key
+            size = self.board_renderer.card_size
+            size = int(size * 1.25) if event.delta > 0 else int(size / 1.25)
+            size = max(int(MIN_CARD_SIZE * self.scale) // 2, min(int(MAX_CARD_SIZE * self.scale), size))
+            self.board_renderer.zoom(size)
+            self.canvas.config(xscrollincrement=size // 2, yscrollincrement=size // 2)
+        elif event.state & 0x0001:  # Shift key
+            self.canvas.xview_scroll(-3 if event.delta > 0 else 3, "units")
+        else:
+            self.canvas.yview_scroll(-3 if event.delta > 0 else 3, "units")
+        return "break"
 
+    @PROFILER.timed("click")
     def on_click(self, event):
         # Handle card click events
-        x, y = event.x // self.card_size, event.y // self.card_size # Get the row and column of the clicked card
+        # The board is redrawn by on_game_change when the game tells us a card was flipped
+        # The renderer finds the clicked card from the position (and the scrolling) straight away, at any board size
+        cell = self.board_renderer.cell_at(event.x, event.y)
+        if cell is None:
+            return
+        y, x = cell # Get the row and column of the clicked card
         if self.first_card is None:
             if self.memory_game.flip_card(y, x):
-                self.flip_sound.play()
+                self.audio.play('flip')
                 self.first_card = (x, y)
-                self.draw_board() # Redraw the board after flipping the card to reflect the changes
+                self.measure_click_to_paint()
         else:
             if self.memory_game.flip_card(y, x):
-                self.flip_sound.play()
-                self.draw_board()
-                self.root.after(500, self.check_match, x, y) # Check for a match after 500ms
-
+                self.audio.play('flip')
+                self.measure_click_to_paint()
+                self.schedule(500, self.check_match, x, y) # Check for a match after 500ms
+
+    def measure_click_to_paint(self):
+        # Measure the time from the click to the card being painted: Tk repaints the canvas when it is idle,
+        # so a callback added now with after_idle runs just after the repaint
+        if PROFILER.enabled:
+            start = time.perf_counter()
+            PROFILER.count("flips")
+            self.root.after_idle(lambda: PROFILER.add("click_to_paint", time.perf_counter() - start))
+
+    @PROFILER.timed("check_match")
     def check_match(self, x, y):
         # Check if the two flipped cards match
         if self.memory_game.check_match():
-            self.match_sound.play()
+            self.audio.play('match')
         else:
-            self.error_sound.play()
+            self.audio.play('error')
+            # The game doesn't wait by itself: hide the cards when their time is up
+            self.schedule(int(self.memory_game.time_until_hide() * 1000), self.hide_unmatched_cards)
 
         self.first_card = None
-        self.draw_board()
         self.moves_label.config(text=f"Moves: {self.memory_game.get_moves()}")
 
         # Check if the game is over
         if self.memory_game.is_game_over():
-            end_time = time.time()
+            end_time = self.clock.now()
             time_taken = round(end_time - self.start_time, 2) # Round the time to 2 decimal places
             congratulation_messages = [
                 f"Congratulations {self.player_name}! You completed the game in {self.memory_game.get_moves()} moves.",
@@ -416,15 +533,56 @@ class MemoryGameUI:
                 f"Bravo, {self.player_name}! You solved the game in {self.memory_game.get_moves()} moves."
             ]
             self.game_window.destroy()
+            if self.replaying:
+                return  # A replay doesn't show the message or save the score
+            self.save_replay()
+            # Queue the score before showing the message, the writer thread saves it meanwhile
+            self.save_score(self.player_name, self.memory_game.get_moves(), time_taken)
             random_message = random.choice(congratulation_messages)
             messagebox.showinfo("Game Over", random_message)
-            self.score_manager.save_score(self.player_name, self.memory_game.get_moves(), time_taken)
-            
+
             self.create_initial_screen()
 
+    @PROFILER.timed("queue_score")
+    def save_score(self, player_name, moves, time_taken):
+        # Give the score to the writer thread, it calls back (on its own thread) with the game number
+        self.score_writer.put(player_name, moves, time_taken,
+                              callback=lambda game_number: self.saved_scores.put((player_name, game_number)))
+        self.scores_saving += 1
+        if self.scores_saving == 1:
+            self.root.after(100, self.check_saved_scores)
+
+    def check_saved_scores(self):
+        # Handle the scores the writer thread has finished with (Tkinter can only be used from this thread)
+        saved = False
+        while not self.saved_scores.empty():
+            player_name, game_number = self.saved_scores.get()
+            self.scores_saving -= 1
+            if game_number is None:
+                messagebox.showerror("Score Not Saved", f"The score of {player_name} could not be saved now. "
+                                                        "It will be saved the next time the game starts.")
+            else:
+                saved = True
+        # Show the new scores in the history and statistics windows that are open
+        if saved:
+            self.score_views = [(window, refresh) for window, refresh in self.score_views if window.winfo_exists()]
+            for _, refresh in self.score_views:
+                refresh()
+        # Keep checking while scores are being saved
+        if self.scores_saving > 0:
+            self.root.after(100, self.check_saved_scores)
+
+    def hide_unmatched_cards(self):
+        # Hide the two unmatched cards (the game redraws them through on_game_change)
+        # If the timer fired a little early, try again when the time is really up
+        if not self.memory_game.advance() and self.memory_game.hide_deadline is not None:
+            self.schedule(int(self.memory_game.time_until_hide() * 1000) + 1, self.hide_unmatched_cards)
+
     def show_history(self):
         # Display game history in a new window
-        history = self.score_manager.get_scores()
+        # Only the number of games is read here, the rows are read page by page while scrolling
+        # (a game that is still being saved is added when it is saved, see check_saved_scores)
+        total_games = self.score_manager.count_scores()
         history_window = tk.Toplevel(self.root)
         history_window.title("Score History")
         history_window.iconbitmap('game.ico') 
@@ -439,6 +597,14 @@ class MemoryGameUI:
                  bg=self.colors['background'], 
                  fg=self.colors['text']).pack(pady=(20, 10))
 
+        # Show the total number of games
+        total_label = tk.Label(history_window,
+                               text=f"{total_games} games played",
+                               font=("Arial", 14),
+                               bg=self.colors['background'],
+                               fg=self.colors['text'])
+        total_label.pack()
+
         # Add a feature to sort the results
         sort_frame = tk.Frame(history_window, bg=self.colors['background'])
         sort_frame.pack(pady=10)
@@ -456,7 +622,7 @@ class MemoryGameUI:
         # state="readonly" is used to prevent manual input in the text field.
         sort_menu.pack(side=tk.LEFT, padx=10)
 
-        sort_button = tk.Button(sort_frame, text="Sort", command=lambda: self.sort_table(table, sort_variable.get()),
+        sort_button = tk.Button(sort_frame, text="Sort", command=lambda: self.sort_table(history_table, sort_variable.get()),
                                 bg=self.colors['button'], fg=self.colors['button_text'], 
                                 font=("Arial", 14, "bold"), relief=tk.RAISED, bd=3)
         sort_button.pack(side=tk.LEFT, padx=10)
@@ -465,14 +631,22 @@ class MemoryGameUI:
         frame = tk.Frame(history_window, bg=self.colors['background'])
         frame.pack(padx=20, pady=20, fill="both", expand=True)
 
-        # Create the table
-        table = ttk.Treeview(frame, columns=("Game", "Player", "Moves", "Time Taken", "Date", "Time"), show="headings")
-        table.heading("Game", text="Game")
-        table.heading("Player", text="Player")
-        table.heading("Moves", text="Moves")
-        table.heading("Time Taken", text="Time (sec)")
-        table.heading("Date", text="Date")
-        table.heading("Time", text="Time")
+        # Create the table (only the visible rows are put into it)
+        history_table = VirtualHistoryTable(frame, ("Game", "Player", "Moves", "Time Taken", "Date", "Time"),
+                                            total_games, self.score_manager.get_scores_page, bg=self.colors['background'])
+        history_table.model = None # The sort model is only built when the user sorts for the first time
+        table = history_table.table
+        # Clicking a heading sorts by that column (click again for descending order)
+        for column in history_table.columns:
+            table.heading(column, text=self.history_headings[column], command=lambda column=column: self.sort_table(history_table, column))
+
+        # Shift + click on a heading adds that column as the next sort column
+        def add_sort_column(event):
+            if table.identify_region(event.x, event.y) == "heading":
+                column = history_table.columns[int(table.identify_column(event.x)[1:]) - 1]
+                self.sort_table(history_table, column, add=True)
+                return "break"
+        table.bind("<Shift-Button-1>", add_sort_column)
 
         # Configure column widths
         table.column("Game", width=100, anchor=tk.CENTER)
@@ -482,12 +656,22 @@ class MemoryGameUI:
         table.column("Date", width=150, anchor=tk.CENTER)
         table.column("Time", width=120, anchor=tk.CENTER)
 
-        # Insert data into the table
-        for score in history:
-            table.insert("", "end", values=score) # Insert a new row with the score data
-            # The first argument is the parent item (empty string means no parent)
-
-        table.pack(fill="both", expand=True) # Fill the entire frame with the table
+        history_table.pack(fill="both", expand=True) # Fill the entire frame with the table
+
+        # Read the scores again when a game is saved, keeping the sort order and the scroll position
+        def refresh_history():
+            total_games = self.score_manager.count_scores()
+            total_label.config(text=f"{total_games} games played")
+            top = history_table.top
+            if history_table.model is None:
+                history_table.set_source(total_games, self.score_manager.get_scores_page)
+            else:
+                model = ScoreTableModel(history_table.columns, self.score_manager.get_scores())
+                model.sort(history_table.model.sort_by)
+                history_table.model = model
+                history_table.set_source(len(model), model.get_rows)
+            history_table.scroll_to(top)
+        self.score_views.append((history_window, refresh_history))
 
         # Configure colors and fonts for the table
         style = ttk.Style()
@@ -504,22 +688,24 @@ class MemoryGameUI:
                         foreground=self.colors['button_text'])
 
     # Add a method to sort the table based on the selected option
-    def sort_table(self, table, sort_option):
-        # Sort the table based on the selected option
-        # Determine if the sort option requires numeric sorting
-        if sort_option == "Game" or sort_option == "Moves" or sort_option == "Time Taken":
-            # Convert the sort option values to float for numeric sorting
-            data = [(float(table.set(child, sort_option)), child) for child in table.get_children('')]
-        else:
-            # For non-numeric sorting options, use the string value directly
-            data = [(table.set(child, sort_option), child) for child in table.get_children('')]
-        
-        # Sort the data based on the sort option
-        data.sort()
-        # Reorder the table items based on the sorted data
-        for i, (val, child) in enumerate(data):
-            table.move(child, '', i)
-
+    def sort_table(self, history_table, sort_option, add=False):
+        # Sort the underlying score rows (not the Treeview items); the table then only
+        # shows the first page of the sorted rows
+        if history_table.model is None:
+            history_table.model = ScoreTableModel(history_table.columns, self.score_manager.get_scores())
+        model = history_table.model
+        model.toggle(sort_option, add)
+
+        # Show the sort order in the headings with arrows
+        sort_by = dict(model.sort_by)
+        for column in history_table.columns:
+            arrow = "" if column not in sort_by else (" ▼" if sort_by[column] else " ▲")
+            history_table.table.heading(column, text=self.history_headings[column] + arrow)
+
+        # Show the sorted rows in the table
+        history_table.set_source(len(model), model.get_rows)
+
+    @PROFILER.timed("player_stats")
     def show_player_stats(self):
         # Create a new window for player stats
         stats_window = tk.Toplevel(self.root)
@@ -529,43 +715,17 @@ class MemoryGameUI:
         stats_window.configure(bg=self.colors['background'])
         self.center_window(stats_window)
 
-        # Load and process the data using pandas
-        df = pd.read_csv('scores.csv')
-        df['Time Taken'] = pd.to_numeric(df['Time Taken'])
-        df['Moves'] = pd.to_numeric(df['Moves'])
-
-        # Calculate average and best statistics
-        avg_moves = df['Moves'].mean()
-        avg_time = df['Time Taken'].mean()
-        best_moves = df['Moves'].min()
-        best_time = df['Time Taken'].min()
+        # Get the average and best statistics from the score manager
+        # (the backend only reads what it needs, e.g. SQLite uses its indexes)
+        # A game that is still being saved is added when it is saved, see check_saved_scores
+        summary = self.score_manager.get_summary()
+        view = {'summary': summary, 'player': None}  # What the window shows
 
         # Create a figure with two subplots
+        plt, FigureCanvasTkAgg = load_matplotlib()
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 4))
         fig.patch.set_facecolor(self.colors['background'])
-
-        # Define a new color scheme for the bars
-        bar_colors = ['#FF69B4', '#00FFFF', '#FF1493', '#1E90FF'] # Pink, Cyan, Deep Pink, Dodger Blue
-
-        # Plot average and best moves
-        ax1.bar(['Average', 'Best'], [avg_moves, best_moves], color=bar_colors[:2])
-        ax1.set_ylabel('Moves', color=self.colors['text'])
-        ax1.set_title('Moves Comparison', color=self.colors['text'])
-        ax1.tick_params(colors=self.colors['text'])
-        ax1.set_facecolor(self.colors['panel'])
-
-        # Plot average and best time
-        ax2.bar(['Average', 'Best'], [avg_time, best_time], color=bar_colors[:2])
-        ax2.set_ylabel('Time (seconds)', color=self.colors['text'])
-        ax2.set_title('Time Comparison', color=self.colors['text'])
-        ax2.tick_params(colors=self.colors['text']) # Set the color of the ticks
-        ax2.set_facecolor(self.colors['panel']) # Set the background color of the subplot
-
-        # Add value labels on top of each bar
-        for ax in [ax1, ax2]: # Loop through both subplots
-            for i, v in enumerate(ax.containers[0]): # Loop through each bar in the plot
-                ax.text(v.get_x() + v.get_width()/2, v.get_height(), f'{v.get_height():.2f}',
-                        ha='center', va='bottom', color=self.colors['text']) # Add the value on top of the bar
+        self.plot_summary(ax1, ax2, summary)
 
         # Adjust layout and add the plot to the window
         plt.tight_layout()
@@ -580,18 +740,39 @@ class MemoryGameUI:
         player_label = tk.Label(player_frame, text="Select a player:", font=("Arial", 14), bg=self.colors['background'], fg=self.colors['text'])
         player_label.pack(side=tk.LEFT, padx=10)
 
-        players = df['Player Name'].unique().tolist() # Get the list of unique player names
+        players = self.score_manager.get_players() # Get the list of unique player names
         player_var = tk.StringVar(player_frame) # Create a variable to store the selected player
         player_var.set(players[0] if players else "No players")
 
         player_menu = ttk.Combobox(player_frame, textvariable=player_var, values=players, state="readonly", width=20, font=("Arial", 13))
         player_menu.pack(side=tk.LEFT, padx=10)
 
-        compare_button = tk.Button(player_frame, text="Compare", command=lambda: self.update_player_stats(fig, ax1, ax2, canvas, df, player_var.get()),
+        def compare():
+            view['player'] = player_var.get()
+            self.update_player_stats(fig, ax1, ax2, canvas, view['summary'], view['player'])
+
+        compare_button = tk.Button(player_frame, text="Compare", command=compare,
                                    bg=self.colors['button'], fg=self.colors['button_text'], 
                                    font=("Arial", 14, "bold"), relief=tk.RAISED, bd=3) # relief is used to set the border style
         compare_button.pack(side=tk.LEFT, padx=10)
 
+        # Read the statistics again when a game is saved, keeping the player that is compared
+        def refresh_stats():
+            view['summary'] = self.score_manager.get_summary()
+            players = self.score_manager.get_players()
+            player_menu.config(values=players)
+            if players and player_var.get() not in players:
+                player_var.set(players[0])
+            if view['player'] is not None:
+                self.update_player_stats(fig, ax1, ax2, canvas, view['summary'], view['player'])
+            else:
+                ax1.clear()
+                ax2.clear()
+                self.plot_summary(ax1, ax2, view['summary'])
+                plt.tight_layout()
+                canvas.draw()
+        self.score_views.append((stats_window, refresh_stats))
+
         # Add some quote for motivation at the bottom
         quote_frame = tk.Frame(stats_window, bg=self.colors['background'])
         quote_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=20)
@@ -607,23 +788,55 @@ class MemoryGameUI:
         quote_label = tk.Label(quote_frame, text=quote, font=("Arial", 13, "italic"), bg=self.colors['background'], fg=self.colors['text'], wraplength=800)
         quote_label.pack()
 
-    def update_player_stats(self, fig, ax1, ax2, canvas, df, selected_player):
+    def plot_summary(self, ax1, ax2, summary):
+        # Plot the average and best moves and time of all players
+        avg_moves = summary['avg_moves']
+        avg_time = summary['avg_time']
+        best_moves = summary['best_moves']
+        best_time = summary['best_time']
+
+        # Define a new color scheme for the bars
+        bar_colors = ['#FF69B4', '#00FFFF', '#FF1493', '#1E90FF'] # Pink, Cyan, Deep Pink, Dodger Blue
+
+        # Plot average and best moves
+        ax1.bar(['Average', 'Best'], [avg_moves, best_moves], color=bar_colors[:2])
+        ax1.set_ylabel('Moves', color=self.colors['text'])
+        ax1.set_title('Moves Comparison', color=self.colors['text'])
+        ax1.tick_params(colors=self.colors['text'])
+        ax1.set_facecolor(self.colors['panel'])
+
+        # Plot average and best time
+        ax2.bar(['Average', 'Best'], [avg_time, best_time], color=bar_colors[:2])
+        ax2.set_ylabel('Time (seconds)', color=self.colors['text'])
+        ax2.set_title('Time Comparison', color=self.colors['text'])
+        ax2.tick_params(colors=self.colors['text']) # Set the color of the ticks
+        ax2.set_facecolor(self.colors['panel']) # Set the background color of the subplot
+
+        # Add value labels on top of each bar
+        for ax in [ax1, ax2]: # Loop through both subplots
+            for i, v in enumerate(ax.containers[0]): # Loop through each bar in the plot
+                ax.text(v.get_x() + v.get_width()/2, v.get_height(), f'{v.get_height():.2f}',
+                        ha='center', va='bottom', color=self.colors['text']) # Add the value on top of the bar
+
+    def update_player_stats(self, fig, ax1, ax2, canvas, summary, selected_player):
+        plt, _ = load_matplotlib()
+
         # Clear previous plots
         ax1.clear()
         ax2.clear()
 
-        # Calculate average and best statistics
-        avg_moves = df['Moves'].mean()
-        avg_time = df['Time Taken'].mean()
-        best_moves = df['Moves'].min()
-        best_time = df['Time Taken'].min()
-
-        # Get player's stats
-        player_stats = df[df['Player Name'] == selected_player]
-        player_avg_moves = player_stats['Moves'].mean()
-        player_avg_time = player_stats['Time Taken'].mean()
-        player_best_moves = player_stats['Moves'].min()
-        player_best_time = player_stats['Time Taken'].min()
+        # Average and best statistics of all players
+        avg_moves = summary['avg_moves']
+        avg_time = summary['avg_time']
+        best_moves = summary['best_moves']
+        best_time = summary['best_time']
+
+        # Get player's stats (only this player's scores are read)
+        player_stats = self.score_manager.get_summary(selected_player)
+        player_avg_moves = player_stats['avg_moves']
+        player_avg_time = player_stats['avg_time']
+        player_best_moves = player_stats['best_moves']
+        player_best_time = player_stats['best_time']
 
 
         # Define a new color scheme for the new bars